@@ -1,36 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import cv2
-import numpy as np
-from PIL import Image, ImageTk, ImageGrab
+import collections
 import threading
-import time
 import os
-import sys
+import math
 import platform
+import queue
+import subprocess
 from datetime import datetime
+from importlib.util import find_spec
 
-# Platform-specific imports for window capture
-if platform.system() == "Windows":
-    try:
-        import pygetwindow as gw
-        import pyautogui
-        WINDOWS_CAPTURE = True
-    except ImportError:
-        WINDOWS_CAPTURE = False
-elif platform.system() == "Darwin":  # macOS
-    try:
-        import Quartz
-        from Quartz import CGWindowListCopyWindowInfo, kCGWindowListOptionOnScreenOnly, kCGNullWindowID
-        MACOS_CAPTURE = True
-    except ImportError:
-        MACOS_CAPTURE = False
-else:  # Linux
-    try:
-        import subprocess
-        LINUX_CAPTURE = True
-    except ImportError:
-        LINUX_CAPTURE = False
+# Only light modules here: OpenCV, NumPy and PIL are imported once the window
+# is up (see load_backend), and screen or stream backends when first used
+from metrics import METRICS
+from startup import STARTUP
 
 class PhoneCameraApp:
     def __init__(self, root):
@@ -41,20 +24,70 @@ class PhoneCameraApp:
         
         # Camera variables
         self.cap = None
+        self.grabber = None
+        self.preview = None
         self.is_running = False
-        self.current_frame = None
         self.captured_frame = None
+        self.captured_encoded = None
         
         # Default camera source (can be changed)
         self.camera_source = 0  # Default to first USB camera
         
-        # Create output directory
-        self.output_dir = "Captured_Images"
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
+        # Opening sources, grabbing and saving live in the engine; frames are
+        # encoded, written and indexed in the background by its save queue.
+        # They are created by load_backend once the window is showing.
+        self.engine = None
+        self.library = None
+        self.save_queue = None
+        self.discovery = None
+        self.renderer = None
+        self.save_results = queue.Queue()
         
         self.setup_ui()
+    
+    def load_backend(self):
+        """Import the capture stack and create the engine, discovery and preview renderer.
+        
+        This is where OpenCV, NumPy and PIL get imported, which takes longer
+        than building the whole UI, so main() calls it after the window is drawn.
+        """
+        from camera_discovery import CameraDiscovery
+        from engine import CaptureEngine
+        from frame_format import configure_threads
+        from library import CaptureLibrary
+        from preview import PreviewRenderer
+        from recorder import RECORD_FORMATS
+        from saver import SaveQueue
+        from spool import SPOOL_FORMAT
+        
+        configure_threads()
+        self.library = CaptureLibrary()
+        self.engine = CaptureEngine(output_dir="Captured_Images", save_queue=SaveQueue(library=self.library))
+        self.save_queue = self.engine.save_queue
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        self.quality_var.set(self.save_queue.options['jpeg_quality'])
+        self.png_level_var.set(self.save_queue.options['png_compression'])
+        self.record_format_combo['values'] = list(RECORD_FORMATS) + [SPOOL_FORMAT]
         
+        # Preview renderer reuses its buffers and PhotoImage between frames
+        self.renderer = PreviewRenderer(self.video_label, self.video_frame)
+        
+        # Camera discovery; start with devices known to work from earlier runs
+        self.discovery = CameraDiscovery()
+        cached = [str(d['index']) for d in self.discovery.cached_devices()]
+        if cached:
+            self.usb_combo['values'] = cached
+            self.usb_var.set(cached[0])
+        self.update_camera_modes()
+        self.usb_var.trace_add('write', lambda *args: self.update_camera_modes())
+        
+        self.root.after(250, self.poll_saves)
+        
+    @property
+    def output_dir(self):
+        return self.engine.output_dir
+    
     def setup_ui(self):
         # Main container
         main_frame = ttk.Frame(self.root, padding="10")
@@ -95,6 +128,18 @@ class PhoneCameraApp:
         self.detect_btn = ttk.Button(self.usb_frame, text="Detect Cameras", command=self.detect_cameras)
         self.detect_btn.grid(row=0, column=2, padx=(5, 0))
         
+        # Native camera modes; "Auto" picks the fastest one of at least 1280x720 at 30 FPS
+        ttk.Label(self.usb_frame, text="Mode:").grid(row=0, column=3, sticky=tk.W, padx=(10, 5))
+        self.mode_var = tk.StringVar(value="Auto")
+        self.mode_combo = ttk.Combobox(self.usb_frame, textvariable=self.mode_var, values=["Auto"],
+                                       width=24, state="readonly")
+        self.mode_combo.grid(row=0, column=4, sticky=tk.W)
+        self.mode_choices = {}
+        
+        # Camera discovery runs in the background; see load_backend for the cached list
+        self.detection_queue = queue.Queue()
+        self.detecting = False
+        
         # IP camera input
         self.ip_frame = ttk.Frame(source_frame)
         self.ip_frame.grid(row=2, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(5, 0))
@@ -124,13 +169,25 @@ class PhoneCameraApp:
         self.connect_btn = ttk.Button(source_frame, text="Connect", command=self.toggle_camera)
         self.connect_btn.grid(row=4, column=0, columnspan=4, pady=(10, 0))
         
-        # Initialize UI state
-        self.on_connection_type_change()
+        # Multi-camera sources, collected from the USB/IP selections above
+        self.multi_sources = []
+        multi_frame = ttk.Frame(source_frame)
+        multi_frame.grid(row=5, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(5, 0))
+        ttk.Button(multi_frame, text="Add to Multi-View",
+                   command=self.add_multi_source).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(multi_frame, text="Open Multi-View",
+                   command=self.open_multi_view).pack(side=tk.LEFT, padx=(0, 5))
+        self.multi_var = tk.StringVar(value="Multi-View: no sources")
+        ttk.Label(multi_frame, textvariable=self.multi_var).pack(side=tk.LEFT, padx=(5, 0))
         
-        # Initialize window list for screen capture
+        # Initialize UI state; windows are only enumerated once Screen Capture is selected
         self.window_list = []
-        if self.connection_type.get() == "screen":
-            self.refresh_windows()
+        self.window_labels = {}  # combobox label -> window id
+        self.window_registry = None
+        self.windows_version = -1
+        self.refreshing_windows = False
+        self.watching_windows = False
+        self.on_connection_type_change()
         
         # Video preview area
         self.video_frame = ttk.LabelFrame(main_frame, text="Live Preview", padding="5")
@@ -143,6 +200,13 @@ class PhoneCameraApp:
                                    background="black", foreground="white")
         self.video_label.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
+        # Per-stage timing overlay, drawn over the preview (toggle with F3)
+        self.overlay_var = tk.BooleanVar(value=False)
+        self.overlay_label = tk.Label(self.video_frame, font=("Courier", 9), background="black",
+                                      foreground="#00ff00", justify=tk.LEFT, anchor=tk.NW)
+        self.root.bind("<F3>", lambda event: (self.overlay_var.set(not self.overlay_var.get()),
+                                              self.toggle_overlay()))
+        
         # Control panel
         control_frame = ttk.LabelFrame(main_frame, text="Capture Controls", padding="10")
         control_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -154,9 +218,118 @@ class PhoneCameraApp:
         self.filename_entry = ttk.Entry(control_frame, textvariable=self.filename_var, width=30)
         self.filename_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(0, 10))
         
+        # Encoding options
+        ttk.Label(control_frame, text="Format:").grid(row=0, column=2, sticky=tk.W, padx=(0, 5))
+        self.format_var = tk.StringVar(value="jpg")
+        ttk.Combobox(control_frame, textvariable=self.format_var, values=["jpg", "png", "webp"],
+                     width=5, state="readonly").grid(row=0, column=3, sticky=tk.W)
+        
+        options_frame = ttk.Frame(control_frame)
+        options_frame.grid(row=2, column=0, columnspan=4, sticky=tk.W, pady=(10, 0))
+        ttk.Label(options_frame, text="JPEG/WebP quality:").pack(side=tk.LEFT, padx=(0, 5))
+        self.quality_var = tk.IntVar()
+        ttk.Spinbox(options_frame, from_=1, to=100, textvariable=self.quality_var, width=4).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(options_frame, text="PNG compression:").pack(side=tk.LEFT, padx=(0, 5))
+        self.png_level_var = tk.IntVar()
+        ttk.Spinbox(options_frame, from_=0, to=9, textvariable=self.png_level_var, width=3).pack(side=tk.LEFT)
+        
+        # Burst and interval (timelapse) capture
+        self.capture_run = None
+        run_frame = ttk.Frame(control_frame)
+        run_frame.grid(row=3, column=0, columnspan=4, sticky=tk.W, pady=(10, 0))
+        ttk.Label(run_frame, text="Burst frames:").pack(side=tk.LEFT, padx=(0, 5))
+        self.burst_count_var = tk.IntVar(value=30)
+        ttk.Spinbox(run_frame, from_=1, to=10000, textvariable=self.burst_count_var, width=6).pack(side=tk.LEFT, padx=(0, 5))
+        self.burst_btn = ttk.Button(run_frame, text="Burst", command=self.start_burst, state="disabled")
+        self.burst_btn.pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Label(run_frame, text="Every (s):").pack(side=tk.LEFT, padx=(0, 5))
+        self.interval_var = tk.DoubleVar(value=5.0)
+        ttk.Spinbox(run_frame, from_=0.1, to=3600, increment=0.5, textvariable=self.interval_var, width=6).pack(side=tk.LEFT, padx=(0, 5))
+        self.timelapse_btn = ttk.Button(run_frame, text="Start Timelapse", command=self.toggle_timelapse, state="disabled")
+        self.timelapse_btn.pack(side=tk.LEFT)
+        self.run_status_var = tk.StringVar(value="")
+        ttk.Label(control_frame, textvariable=self.run_status_var).grid(row=4, column=0, columnspan=4, sticky=tk.W)
+        
+        # Continuous recording
+        self.recorder = None
+        record_frame = ttk.Frame(control_frame)
+        record_frame.grid(row=5, column=0, columnspan=4, sticky=tk.W, pady=(10, 0))
+        ttk.Label(record_frame, text="Record as:").pack(side=tk.LEFT, padx=(0, 5))
+        self.record_format_var = tk.StringVar(value="MJPG")
+        self.record_format_combo = ttk.Combobox(record_frame, textvariable=self.record_format_var,
+                                                values=["MJPG"], width=14, state="readonly")
+        self.record_format_combo.pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Label(record_frame, text="Segment (min):").pack(side=tk.LEFT, padx=(0, 5))
+        self.segment_minutes_var = tk.DoubleVar(value=5.0)
+        ttk.Spinbox(record_frame, from_=0.5, to=600, increment=0.5, textvariable=self.segment_minutes_var,
+                    width=6).pack(side=tk.LEFT, padx=(0, 5))
+        self.record_btn = ttk.Button(record_frame, text="Start Recording", command=self.toggle_recording, state="disabled")
+        self.record_btn.pack(side=tk.LEFT)
+        self.record_status_var = tk.StringVar(value="")
+        ttk.Label(control_frame, textvariable=self.record_status_var).grid(row=6, column=0, columnspan=4, sticky=tk.W)
+        
+        # Pre-trigger buffer: keep the last few seconds so Capture can look back
+        self.pretrigger = None
+        pretrigger_frame = ttk.Frame(control_frame)
+        pretrigger_frame.grid(row=7, column=0, columnspan=4, sticky=tk.W, pady=(10, 0))
+        self.pretrigger_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(pretrigger_frame, text="Keep last", variable=self.pretrigger_var,
+                        command=self.toggle_pretrigger).pack(side=tk.LEFT, padx=(0, 5))
+        self.pretrigger_seconds_var = tk.DoubleVar(value=5.0)
+        ttk.Spinbox(pretrigger_frame, from_=0.5, to=120, increment=0.5, textvariable=self.pretrigger_seconds_var,
+                    width=5).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Label(pretrigger_frame, text="s, up to").pack(side=tk.LEFT, padx=(0, 5))
+        self.pretrigger_mb_var = tk.IntVar(value=256)
+        ttk.Spinbox(pretrigger_frame, from_=16, to=8192, increment=16, textvariable=self.pretrigger_mb_var,
+                    width=5).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Label(pretrigger_frame, text="MB").pack(side=tk.LEFT, padx=(0, 10))
+        self.pretrigger_compress_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(pretrigger_frame, text="Compress in memory",
+                        variable=self.pretrigger_compress_var).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(pretrigger_frame, text="Capture:").pack(side=tk.LEFT, padx=(0, 5))
+        self.capture_mode_var = tk.StringVar(value="Latest frame")
+        self.capture_mode_var.trace_add('write', lambda *args: self.update_stream_decoding())
+        ttk.Combobox(pretrigger_frame, textvariable=self.capture_mode_var,
+                     values=["Latest frame", "Sharpest frame", "Whole window"],
+                     width=13, state="readonly").pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(pretrigger_frame, text="Post (s):").pack(side=tk.LEFT, padx=(0, 5))
+        self.post_seconds_var = tk.DoubleVar(value=2.0)
+        ttk.Spinbox(pretrigger_frame, from_=0, to=60, increment=0.5, textvariable=self.post_seconds_var,
+                    width=5).pack(side=tk.LEFT)
+        self.pretrigger_status_var = tk.StringVar(value="")
+        ttk.Label(control_frame, textvariable=self.pretrigger_status_var).grid(row=8, column=0, columnspan=4, sticky=tk.W)
+        
+        # Frame quality: every grabbed frame is scored so Capture can pick a sharp one
+        self.quality = None
+        self.auto_results = queue.Queue()
+        quality_frame = ttk.Frame(control_frame)
+        quality_frame.grid(row=9, column=0, columnspan=4, sticky=tk.W, pady=(10, 0))
+        self.auto_capture_var = tk.BooleanVar(value=False)
+        self.auto_capture_var.trace_add('write', lambda *args: self.update_stream_decoding())
+        ttk.Checkbutton(quality_frame, text="Auto-capture when sharp and steady",
+                        variable=self.auto_capture_var).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(quality_frame, text="at most every (s):").pack(side=tk.LEFT, padx=(0, 5))
+        self.auto_cooldown_var = tk.DoubleVar(value=2.0)
+        ttk.Spinbox(quality_frame, from_=0.5, to=3600, increment=0.5, textvariable=self.auto_cooldown_var,
+                    width=6).pack(side=tk.LEFT)
+        self.quality_status_var = tk.StringVar(value="")
+        ttk.Label(control_frame, textvariable=self.quality_status_var).grid(row=10, column=0, columnspan=4, sticky=tk.W)
+        
+        # Re-streaming: other programs can watch the feed while the app holds the camera
+        serve_frame = ttk.Frame(control_frame)
+        serve_frame.grid(row=11, column=0, columnspan=4, sticky=tk.W, pady=(10, 0))
+        self.serve_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(serve_frame, text="Share stream on localhost port", variable=self.serve_var,
+                        command=self.toggle_serving).pack(side=tk.LEFT, padx=(0, 5))
+        self.serve_port_var = tk.IntVar(value=8090)
+        ttk.Spinbox(serve_frame, from_=1024, to=65535, textvariable=self.serve_port_var,
+                    width=6).pack(side=tk.LEFT)
+        self.serve_status_var = tk.StringVar(value="")
+        ttk.Label(control_frame, textvariable=self.serve_status_var).grid(row=12, column=0, columnspan=4, sticky=tk.W)
+        
         # Buttons frame
         btn_frame = ttk.Frame(control_frame)
-        btn_frame.grid(row=1, column=0, columnspan=2, pady=(10, 0))
+        btn_frame.grid(row=1, column=0, columnspan=4, pady=(10, 0))
         
         self.capture_btn = ttk.Button(btn_frame, text="Capture", command=self.capture_frame, state="disabled")
         self.capture_btn.pack(side=tk.LEFT, padx=(0, 5))
@@ -167,11 +340,25 @@ class PhoneCameraApp:
         self.browse_btn = ttk.Button(btn_frame, text="Browse Save Location", command=self.browse_save_location)
         self.browse_btn.pack(side=tk.LEFT, padx=(5, 0))
         
+        ttk.Checkbutton(btn_frame, text="Stats overlay", variable=self.overlay_var,
+                        command=self.toggle_overlay).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(btn_frame, text="Export Stats", command=self.export_stats).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(btn_frame, text="Gallery", command=self.open_gallery).pack(side=tk.LEFT, padx=(5, 0))
+        
+        # Background save progress
+        self.save_status_var = tk.StringVar(value="")
+        ttk.Label(btn_frame, textvariable=self.save_status_var).pack(side=tk.LEFT, padx=(10, 0))
+        
         # Status bar
         self.status_var = tk.StringVar(value="Ready - Enter camera URL and click Connect")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
         status_bar.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E))
         
+        # Preview statistics
+        self.preview_stats_var = tk.StringVar(value="")
+        stats_bar = ttk.Label(main_frame, textvariable=self.preview_stats_var, anchor=tk.W)
+        stats_bar.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        
         # Bind window close event
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
@@ -206,121 +393,162 @@ class PhoneCameraApp:
             self.refresh_windows()
     
     def detect_cameras(self):
-        """Detect available USB cameras"""
+        """Detect available USB cameras in the background"""
+        if self.detecting:
+            return
+        self.detecting = True
+        self.detected_cameras = []
+        self.detect_btn.config(state="disabled")
         self.status_var.set("Detecting cameras...")
-        self.root.update()
         
-        available_cameras = []
-        for i in range(10):  # Check first 10 camera indices
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                ret, _ = cap.read()
-                if ret:
-                    available_cameras.append(str(i))
-                cap.release()
+        def run():
+            try:
+                # An explicit Detect retries cameras that failed before (busy, or plugged in late)
+                self.discovery.discover(on_result=lambda entry: self.detection_queue.put(('found', entry)),
+                                        retry_failed=True)
+            except Exception as e:
+                print(f"Error detecting cameras: {e}")
+            self.detection_queue.put(('done', None))
+        
+        threading.Thread(target=run, daemon=True).start()
+        self.root.after(50, self.poll_detection)
+    
+    def poll_detection(self):
+        """Move detection results into the camera list as they arrive"""
+        done = False
+        try:
+            while True:
+                kind, entry = self.detection_queue.get_nowait()
+                if kind == 'done':
+                    done = True
+                    break
+                index = str(entry['index'])
+                if index not in self.detected_cameras:
+                    self.detected_cameras.append(index)
+                    self.detected_cameras.sort(key=int)
+                    self.usb_combo['values'] = self.detected_cameras
+                    if len(self.detected_cameras) == 1:
+                        self.usb_var.set(index)
+                    self.status_var.set(f"Detecting cameras... found {', '.join(self.detected_cameras)}")
+        except queue.Empty:
+            pass
+        
+        if not done:
+            self.root.after(50, self.poll_detection)
+            return
         
+        self.detecting = False
+        self.update_camera_modes()
+        if self.connection_type.get() == "usb" and not self.is_running:
+            self.detect_btn.config(state="normal")
+        available_cameras = self.detected_cameras
         if available_cameras:
-            self.usb_combo['values'] = available_cameras
-            self.usb_var.set(available_cameras[0])
             self.status_var.set(f"Found cameras: {', '.join(available_cameras)}")
         else:
             self.status_var.set("No USB cameras detected")
             messagebox.showinfo("Detection Result", "No USB cameras found. Make sure your phone is connected via USB and USB debugging/camera access is enabled.")
     
+    def update_camera_modes(self):
+        """List the native modes of the selected USB camera in the mode picker"""
+        from camera_modes import describe_mode
+        self.mode_choices = {}
+        try:
+            index = int(self.usb_var.get())
+        except ValueError:
+            index = None
+        if index is not None:
+            for mode in self.discovery.modes(index):
+                for rate in mode['rates']:
+                    choice = {'fourcc': mode['fourcc'], 'width': mode['width'], 'height': mode['height'], 'fps': rate}
+                    self.mode_choices[describe_mode(choice)] = choice
+        self.mode_combo['values'] = ["Auto"] + list(self.mode_choices)
+        if self.mode_var.get() not in self.mode_choices:
+            self.mode_var.set("Auto")
+    
     def get_windows_list(self):
         """Get list of open windows based on platform"""
-        windows = []
-        
-        try:
-            if platform.system() == "Windows" and WINDOWS_CAPTURE:
-                # Windows implementation
-                all_windows = gw.getAllWindows()
-                for window in all_windows:
-                    if window.title and window.title.strip() and window.visible:
-                        windows.append({
-                            'title': window.title,
-                            'id': window._hWnd,
-                            'bbox': (window.left, window.top, window.width, window.height)
-                        })
-            
-            elif platform.system() == "Darwin" and MACOS_CAPTURE:
-                # macOS implementation
-                window_list = CGWindowListCopyWindowInfo(kCGWindowListOptionOnScreenOnly, kCGNullWindowID)
-                for window in window_list:
-                    title = window.get('kCGWindowName', '')
-                    owner = window.get('kCGWindowOwnerName', '')
-                    if title and title.strip():
-                        windows.append({
-                            'title': f"{owner} - {title}",
-                            'id': window['kCGWindowNumber'],
-                            'bbox': window.get('kCGWindowBounds', {})
-                        })
-            
-            else:
-                # Linux/fallback - add full screen option
-                windows.append({
-                    'title': 'Full Screen',
-                    'id': 'fullscreen',
-                    'bbox': None
-                })
-                
-        except Exception as e:
-            print(f"Error getting windows: {e}")
-            # Fallback to full screen
-            windows.append({
-                'title': 'Full Screen',
-                'id': 'fullscreen',
-                'bbox': None
-            })
-        
-        return windows
+        return self.get_window_registry().windows()
+    
+    def get_window_registry(self):
+        """The shared window registry; screen capture modules load on first use"""
+        if self.window_registry is None:
+            from screen_grab import window_registry
+            self.window_registry = window_registry()
+        return self.window_registry
     
     def refresh_windows(self):
-        """Refresh the list of available windows"""
-        if self.connection_type.get() != "screen":
+        """Refresh the window registry in the background and keep it fresh while Screen Capture is selected.
+        
+        Switching back to Screen Capture shows the windows already known
+        straight away; the list is only rebuilt when a window appeared, went
+        away or was renamed.
+        """
+        if self.connection_type.get() != "screen" or self.refreshing_windows:
             return
-            
+        registry = self.get_window_registry()
+        if self.window_list:
+            self.show_windows()
+        self.refreshing_windows = True
+        self.refresh_windows_btn.config(state="disabled")
         self.status_var.set("Refreshing window list...")
-        self.root.update()
+        results = queue.Queue()
         
-        self.window_list = self.get_windows_list()
+        def run():
+            try:
+                registry.refresh()
+            except Exception as e:
+                print(f"Error listing windows: {e}")
+            results.put(True)
+            # Then keep watching in the background
+            registry.start()
         
-        if self.window_list:
-            window_titles = [w['title'] for w in self.window_list]
-            self.window_combo['values'] = window_titles
-            if window_titles:
-                self.window_var.set(window_titles[0])
-            self.status_var.set(f"Found {len(window_titles)} windows")
-        else:
-            self.window_combo['values'] = ["No windows found"]
-            self.status_var.set("No windows found")
+        threading.Thread(target=run, daemon=True).start()
+        self.root.after(50, self.poll_windows, results)
     
-    def capture_window(self, window_info):
-        """Capture a specific window or full screen"""
+    def poll_windows(self, results):
         try:
-            if window_info['id'] == 'fullscreen':
-                # Capture full screen
-                screenshot = ImageGrab.grab()
-            elif platform.system() == "Windows" and WINDOWS_CAPTURE:
-                # Windows specific window capture
-                import pyautogui
-                bbox = window_info['bbox']
-                screenshot = pyautogui.screenshot(region=(bbox[0], bbox[1], bbox[2], bbox[3]))
-            elif platform.system() == "Darwin" and MACOS_CAPTURE:
-                # macOS specific window capture would go here
-                screenshot = ImageGrab.grab()  # Fallback to full screen for now
-            else:
-                # Fallback to full screen
-                screenshot = ImageGrab.grab()
-            
-            # Convert PIL image to OpenCV format
-            cv_image = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-            return cv_image
-            
-        except Exception as e:
-            print(f"Error capturing window: {e}")
-            return None
+            results.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self.poll_windows, results)
+            return
+        self.refreshing_windows = False
+        if self.connection_type.get() == "screen" and not self.is_running:
+            self.refresh_windows_btn.config(state="normal")
+        self.show_windows(force=True)
+        if not self.watching_windows:
+            self.watching_windows = True
+            self.root.after(500, self.watch_windows)
+    
+    def watch_windows(self):
+        """Pick up background registry changes while Screen Capture is selected"""
+        if self.connection_type.get() != "screen":
+            self.watching_windows = False
+            self.window_registry.stop()
+            return
+        self.show_windows()
+        self.root.after(500, self.watch_windows)
+    
+    def show_windows(self, force=False):
+        """Rebuild the window list from the registry if it changed, keeping the selection"""
+        registry = self.window_registry
+        if not force and registry.version == self.windows_version:
+            return
+        self.windows_version = registry.version
+        self.window_list = registry.windows()
         
+        # Titles label the combobox; repeated ones get the window id so each maps to one window
+        counts = collections.Counter(w['title'] for w in self.window_list)
+        self.window_labels = {}
+        for w in self.window_list:
+            label = w['title'] if counts[w['title']] == 1 else f"{w['title']} [{w['id']}]"
+            self.window_labels[label] = w['id']
+        window_titles = list(self.window_labels)
+        self.window_combo['values'] = window_titles
+        if self.window_var.get() not in self.window_labels:
+            self.window_var.set(window_titles[0])
+        if force:
+            self.status_var.set(f"Found {len(window_titles)} windows")
+    
     def toggle_camera(self):
         if not self.is_running:
             self.start_camera()
@@ -328,6 +556,7 @@ class PhoneCameraApp:
             self.stop_camera()
     
     def start_camera(self):
+        STARTUP.mark('connect')
         try:
             self.status_var.set("Connecting...")
             self.root.update()
@@ -350,282 +579,901 @@ class PhoneCameraApp:
             
             self.root.update()
             
-            # Handle screen capture differently
             if self.connection_type.get() == "screen":
-                # No camera object needed for screen capture
-                self.cap = None
-                self.is_running = True
-                self.connect_btn.config(text="Disconnect")
-                self.capture_btn.config(state="normal")
-                
-                # Disable source selection while connected
-                for child in self.screen_frame.winfo_children():
-                    child.configure(state="disabled")
-                
-                # Start screen capture thread
-                self.video_thread = threading.Thread(target=self.update_screen_capture, daemon=True)
-                self.video_thread.start()
-                
-                selected_window = self.window_var.get()
-                self.status_var.set(f"Screen capture active: {selected_window}")
-                return
-            
-            # Regular camera setup
-            self.cap = cv2.VideoCapture(camera_source)
-            
-            # Set camera properties for better performance (USB cameras)
-            if self.connection_type.get() == "usb":
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-                self.cap.set(cv2.CAP_PROP_FPS, 30)
-                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer for lower latency
+                # Screen capture behaves like a camera that grabs the selected window
+                window_id = self.window_labels.get(self.window_var.get())
+                window_info = self.window_registry.get(window_id) if window_id is not None else None
+                if window_info is None:
+                    messagebox.showwarning("Warning", "No window selected")
+                    return
+                camera_source = window_info
             
-            # Test if camera is accessible
-            ret, frame = self.cap.read()
-            if not ret:
-                raise Exception("Cannot read from camera")
+            # The engine opens the source and hands it to a grabber thread
+            mode = self.mode_choices.get(self.mode_var.get()) if self.connection_type.get() == "usb" else None
+            self.engine.open(camera_source, mode)
+            self.cap = self.engine.cap
+            self.grabber = self.engine.grabber
             
             self.is_running = True
             self.connect_btn.config(text="Disconnect")
             self.capture_btn.config(state="normal")
+            self.burst_btn.config(state="normal")
+            self.timelapse_btn.config(state="normal")
+            self.record_btn.config(state="normal")
             
             # Disable source selection while connected
             for child in self.usb_frame.winfo_children():
                 child.configure(state="disabled")
             for child in self.ip_frame.winfo_children():
                 child.configure(state="disabled")
+            for child in self.screen_frame.winfo_children():
+                child.configure(state="disabled")
             
-            # Start video thread
-            self.video_thread = threading.Thread(target=self.update_video, daemon=True)
-            self.video_thread.start()
+            # Render from the grabber's ring buffer on the Tk main loop; screen
+            # content is mostly static, so only changed tiles are redrawn
+            self.renderer.set_change_detection(self.connection_type.get() == "screen")
+            self.start_preview(source=self.pull_grabber_frame,
+                               is_active=lambda: self.grabber is not None and self.grabber.is_running,
+                               nominal_fps=self.grabber.nominal_fps)
+            if self.pretrigger_var.get():
+                self.start_pretrigger()
+            self.start_quality()
             
             if self.connection_type.get() == "usb":
-                self.status_var.set(f"Connected to USB camera {camera_source}")
+                from camera_modes import describe_mode
+                self.status_var.set(f"Connected to USB camera {camera_source} ({describe_mode(self.engine.mode)})")
+            elif self.connection_type.get() == "screen":
+                self.status_var.set(f"Screen capture active: {self.window_var.get()}")
             else:
                 self.status_var.set(f"Connected to: {camera_source}")
             
         except Exception as e:
             self.status_var.set(f"Connection failed: {str(e)}")
             messagebox.showerror("Connection Error", f"Failed to connect:\n{str(e)}")
-            if self.cap:
-                self.cap.release()
+            if self.connection_type.get() == "usb" and self.discovery is not None:
+                # A cached "known good" verdict was wrong; probe this index on the next detection
+                try:
+                    self.discovery.forget(int(self.usb_var.get()))
+                except ValueError:
+                    pass
+            self.engine.close()
+            self.cap = None
+            self.grabber = None
     
     def stop_camera(self):
         self.is_running = False
-        if self.cap:
-            self.cap.release()
+        self.stop_capture_run()
+        self.stop_recording()
+        self.stop_pretrigger()
+        self.stop_quality()
+        if self.preview:
+            self.preview.stop()
+            self.preview = None
+        self.engine.close()
+        self.grabber = None
+        self.cap = None
         
         self.connect_btn.config(text="Connect")
         self.capture_btn.config(state="disabled")
         self.save_btn.config(state="disabled")
+        self.burst_btn.config(state="disabled")
+        self.timelapse_btn.config(state="disabled", text="Start Timelapse")
+        self.record_btn.config(state="disabled", text="Start Recording")
         
         # Re-enable source selection
         self.on_connection_type_change()
         
         # Clear video display
         self.video_label.config(image="", text="Camera disconnected")
+        self.video_label.image = None
+        self.renderer.reset()
         self.status_var.set("Camera disconnected")
+        self.preview_stats_var.set("")
     
-    def update_video(self):
-        while self.is_running and self.cap and self.cap.isOpened():
-            try:
-                ret, frame = self.cap.read()
-                if ret:
-                    self.current_frame = frame.copy()
-                    
-                    # Resize frame to fit the display area
-                    display_frame = self.resize_frame_for_display(frame)
-                    
-                    # Convert BGR to RGB
-                    rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-                    
-                    # Convert to PIL Image and then to PhotoImage
-                    pil_image = Image.fromarray(rgb_frame)
-                    photo = ImageTk.PhotoImage(pil_image)
-                    
-                    # Update the label with the new frame
-                    self.video_label.config(image=photo, text="")
-                    self.video_label.image = photo  # Keep a reference
-                    
-                else:
-                    break
-                    
-            except Exception as e:
-                print(f"Error in video update: {e}")
-                break
-            
-            time.sleep(0.016)  # ~60 FPS for USB, lower latency
-        
-        # Cleanup when thread ends
-        if self.is_running:
-            self.root.after(0, self.stop_camera)
+    def start_preview(self, source=None, is_active=None, nominal_fps=None):
+        """Start rendering preview frames on the Tk main loop"""
+        from preview import PreviewScheduler
+        self.preview = PreviewScheduler(self.root, self.show_frame, source=source,
+                                        is_active=is_active, on_stopped=self.on_source_stopped,
+                                        nominal_fps=nominal_fps)
+        self.preview.start()
+        self.root.after(1000, self.update_preview_stats, self.preview)
     
-    def update_screen_capture(self):
-        """Update screen capture preview"""
-        while self.is_running:
-            try:
-                # Get selected window info
-                selected_title = self.window_var.get()
-                window_info = None
-                for w in self.window_list:
-                    if w['title'] == selected_title:
-                        window_info = w
-                        break
-                
-                if window_info:
-                    # Capture the window
-                    frame = self.capture_window(window_info)
-                    if frame is not None:
-                        self.current_frame = frame.copy()
-                        
-                        # Resize frame to fit the display area
-                        display_frame = self.resize_frame_for_display(frame)
-                        
-                        # Convert BGR to RGB
-                        rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-                        
-                        # Convert to PIL Image and then to PhotoImage
-                        pil_image = Image.fromarray(rgb_frame)
-                        photo = ImageTk.PhotoImage(pil_image)
-                        
-                        # Update the label with the new frame
-                        self.video_label.config(image=photo, text="")
-                        self.video_label.image = photo  # Keep a reference
-                    
-            except Exception as e:
-                print(f"Error in screen capture update: {e}")
-                break
-            
-            time.sleep(0.1)  # 10 FPS for screen capture (less intensive)
-        
-        # Cleanup when thread ends
+    def on_source_stopped(self):
+        """Called on the main loop when the grabber or capture thread has ended"""
         if self.is_running:
-            self.root.after(0, self.stop_camera)
+            self.stop_camera()
     
-    def resize_frame_for_display(self, frame):
-        # Get the current size of the video frame widget
-        self.root.update_idletasks()
-        
-        # Get widget dimensions (with some padding)
-        widget_width = max(640, self.video_frame.winfo_width() - 20)
-        widget_height = max(480, self.video_frame.winfo_height() - 40)
-        
-        # Get frame dimensions
-        frame_height, frame_width = frame.shape[:2]
+    def pull_grabber_frame(self, last_seq):
+        """Preview source: the newest grabbed frame if it is newer than last_seq"""
+        grabber = self.grabber
+        if grabber is None or grabber.seq == last_seq:
+            return last_seq, None
+        seq, _, self._preview_buf = grabber.latest(getattr(self, '_preview_buf', None))
+        return seq, self._preview_buf
+    
+    def show_frame(self, frame):
+        """Render a BGR frame into the preview label (main thread only)"""
+        self.renderer.render(frame)
+        STARTUP.mark('first_frame')
+    
+    def update_preview_stats(self, preview):
+        """Show rendered FPS, dropped frames and render time under the status bar"""
+        if not self.is_running or self.preview is not preview:
+            return
+        stats = preview.stats()
+        text = (f"Preview: {stats['fps']:.1f} FPS (target {stats['target_fps']:.0f}) | dropped {stats['dropped']} | "
+                f"render {stats['render_ms']:.1f} ms (max {stats['max_render_ms']:.1f} ms) | CPU {stats['cpu_load'] * 100:.0f}%")
+        self.update_stream_decoding()
+        source_stats = getattr(self.cap, 'stats', None)
+        if source_stats is not None and self.connection_type.get() == "ip":
+            # Network source health: reconnects, and flushed backlog and lag or skipped decodes
+            source = source_stats()
+            text += f" | stream {source['state']}, {source['reconnects']} reconnect(s)"
+            if 'flushed' in source:
+                latency = f"{source['latency_ms']:.0f} ms" if source['latency_ms'] is not None else "-"
+                text += f", {source['flushed']} stale flushed, lag {latency}"
+            else:
+                text += (f", decoded {source['decoded']} of {source['received']} "
+                         f"at 1/{source['reduction']} size ({source['decode_ms']:.1f} ms)")
+            if source['state'] == 'reconnecting':
+                self.status_var.set(f"Connection lost - reconnecting ({source['last_error']})")
+            elif self.status_var.get().startswith("Connection lost"):
+                self.status_var.set(f"Reconnected to: {self.url_var.get().strip()}")
+        self.preview_stats_var.set(text)
+        self.root.after(1000, self.update_preview_stats, preview)
+    
+    def update_stream_decoding(self):
+        """Decode MJPEG streams at preview size, and let screen sources repeat unchanged frames,
+        unless something needs every full frame"""
+        if self.engine is None:
+            return
+        full = ((self.capture_run is not None and self.capture_run.is_running) or
+                (self.recorder is not None and self.recorder.is_running) or
+                self.pretrigger is not None or
+                self.capture_mode_var.get() == "Sharpest frame" or self.auto_capture_var.get())
+        self.engine.use_full_frames(full, display_size=self.renderer.widget_size)
+    
+    def capture_frame(self):
+        mode = self.capture_mode_var.get()
+        if mode == "Whole window" and self.pretrigger is None:
+            self.status_var.set("Enable 'Keep last' to capture from the pre-trigger buffer - using latest frame")
+            mode = "Latest frame"
+        if mode == "Whole window":
+            self.capture_window_frames()
+            return
         
-        # Calculate scaling factor to maintain aspect ratio
-        scale_width = widget_width / frame_width
-        scale_height = widget_height / frame_height
-        scale = min(scale_width, scale_height)
+        frame = encoded = None
+        if mode == "Sharpest frame":
+            # The pre-trigger buffer reaches further back than the quality monitor's window
+            if self.pretrigger is not None:
+                _, frame = self.pretrigger.best_frame()
+            elif self.quality is not None:
+                _, frame = self.quality.best()
+        if frame is None and self.grabber:
+            # Capture the newest frame; MJPEG streams also keep the camera's own JPEG
+            _, encoded, frame = self.engine.capture_original()
+        if frame is not None:
+            self.captured_frame = frame
+            self.captured_encoded = encoded
+            self.save_btn.config(state="normal")
+            if self.connection_type.get() == "screen":
+                self.status_var.set("Window captured! Enter filename and click Save")
+            else:
+                self.status_var.set("Frame captured! Enter filename and click Save")
+            
+            # Flash effect
+            self.video_label.config(background="white")
+            self.root.after(100, lambda: self.video_label.config(background=self.root.cget('bg')))
+        else:
+            messagebox.showwarning("Warning", "No frame available to capture")
+    
+    def capture_window_frames(self):
+        """Save everything in the pre-trigger buffer plus the next few seconds"""
+        try:
+            post_seconds = max(0.0, float(self.post_seconds_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Please enter a valid post-trigger time in seconds")
+            return
+        self.save_queue.options.update(self.get_save_options())
+        folder = os.path.join(self.output_dir, f"trigger_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}")
+        extension = self.format_var.get()
         
-        # Calculate new dimensions
-        new_width = int(frame_width * scale)
-        new_height = int(frame_height * scale)
+        def save_frames(trigger_time, frames):
+            # Runs on the buffer's trigger thread; the save queue applies back-pressure
+            try:
+                os.makedirs(folder, exist_ok=True)
+                for i, buffered in enumerate(frames):
+                    offset_ms = int(round((buffered.timestamp - trigger_time) * 1000))
+                    path = os.path.join(folder, f"frame_{i:04d}_{offset_ms:+06d}ms.{extension}")
+                    self.save_queue.submit(buffered.decode(), path, on_done=self.save_results.put)
+            except Exception as e:
+                print(f"Error saving pre-trigger window: {e}")
         
-        # Resize frame
-        resized_frame = cv2.resize(frame, (new_width, new_height))
-        return resized_frame
+        self.pretrigger.trigger(post_seconds, on_done=save_frames)
+        self.status_var.set(f"Saving last {self.pretrigger.seconds:g} s + next {post_seconds:g} s to {folder}")
+        self.video_label.config(background="white")
+        self.root.after(100, lambda: self.video_label.config(background=self.root.cget('bg')))
     
-    def capture_frame(self):
-        if self.connection_type.get() == "screen":
-            # For screen capture, take a fresh screenshot
-            selected_title = self.window_var.get()
-            window_info = None
-            for w in self.window_list:
-                if w['title'] == selected_title:
-                    window_info = w
-                    break
-            
-            if window_info:
-                self.captured_frame = self.capture_window(window_info)
-                if self.captured_frame is not None:
-                    self.save_btn.config(state="normal")
-                    self.status_var.set("Window captured! Enter filename and click Save")
-                    
-                    # Flash effect
-                    self.video_label.config(background="white")
-                    self.root.after(100, lambda: self.video_label.config(background=self.root.cget('bg')))
+    def start_quality(self):
+        """Score every grabbed frame, keeping the sharpest recent ones for Capture and auto-capture"""
+        from quality import QualityMonitor
+        self.stop_quality()
+        self.quality = QualityMonitor(self.grabber, on_auto_capture=self.on_auto_capture)
+        self.quality.start()
+        # Sharpest-frame capture and auto-capture score full frames from the start
+        self.update_stream_decoding()
+        self.root.after(500, self.update_quality_status, self.quality)
+    
+    def stop_quality(self):
+        if self.quality is not None:
+            self.quality.stop()
+            self.quality = None
+        self.quality_status_var.set("")
+    
+    def on_auto_capture(self, quality, frame):
+        """Called on the quality monitor's thread with a sharp, steady frame"""
+        if self.auto_capture_var.get():
+            self.auto_results.put((quality, frame))
+    
+    def save_auto_captures(self):
+        """Queue frames picked by auto-capture for saving (main thread)"""
+        from engine import timestamped_filename
+        try:
+            while True:
+                quality, frame = self.auto_results.get_nowait()
+                if not self.auto_capture_var.get():
+                    continue
+                self.save_queue.options.update(self.get_save_options())
+                filename = timestamped_filename(prefix="auto", extension=self.format_var.get())
+                if self.engine.save(frame, filename, block=False, on_done=self.save_results.put) is None:
+                    self.status_var.set("Save queue is full - auto-capture skipped a frame")
                 else:
-                    messagebox.showwarning("Warning", "Failed to capture window")
-            else:
-                messagebox.showwarning("Warning", "No window selected")
+                    self.status_var.set(f"Auto-captured a sharp frame (sharpness {quality.sharpness:.0f})")
+        except queue.Empty:
+            pass
+    
+    def update_quality_status(self, monitor):
+        """Show the current frame's scores and what scoring costs"""
+        if monitor is not self.quality:
+            return
+        try:
+            monitor.cooldown = max(0.5, float(self.auto_cooldown_var.get()))
+        except (tk.TclError, ValueError):
+            pass
+        stats = monitor.stats()
+        if stats['sharpness'] is not None:
+            motion = f"{stats['motion']:.1f}" if stats['motion'] is not None else "-"
+            steady = "steady" if stats['steady'] else "moving"
+            self.quality_status_var.set(
+                f"Sharpness {stats['sharpness']:.0f} (best {stats['best_score']:.0f}), motion {motion} ({steady}), "
+                f"brightness {stats['brightness']:.0f} | scoring {stats['process_ms']:.1f} ms/frame, "
+                f"{stats['load'] * 100:.0f}% CPU, {stats['skipped']} skipped, {stats['auto_captures']} auto")
+        if monitor.error is not None:
+            self.quality_status_var.set(f"Frame scoring failed: {monitor.error}")
+            return
+        self.root.after(500, self.update_quality_status, monitor)
+    
+    def toggle_serving(self):
+        """Start or stop re-serving the grabbed frames over HTTP"""
+        if not self.serve_var.get():
+            self.engine.stop_serving()
+            self.serve_status_var.set("")
+            return
+        try:
+            server = self.engine.serve(int(self.serve_port_var.get()))
+        except (OSError, ValueError, tk.TclError) as e:
+            self.serve_var.set(False)
+            messagebox.showerror("Error", f"Could not start the stream server:\n{e}")
+            return
+        self.root.after(0, self.update_serving_status, server)
+    
+    def update_serving_status(self, server):
+        """Show the stream address and how many viewers it feeds"""
+        if server is not self.engine.server:
+            return
+        stats = server.stats()
+        if self.grabber is None:
+            source = "waiting for a source"
+        elif stats['passed_through']:
+            source = f"{stats['passed_through']} camera JPEGs passed through"
         else:
-            # Regular camera capture
-            if self.current_frame is not None:
-                self.captured_frame = self.current_frame.copy()
-                self.save_btn.config(state="normal")
-                self.status_var.set("Frame captured! Enter filename and click Save")
-                
-                # Flash effect
-                self.video_label.config(background="white")
-                self.root.after(100, lambda: self.video_label.config(background=self.root.cget('bg')))
-            else:
-                messagebox.showwarning("Warning", "No frame available to capture")
+            source = f"encode {stats['encode_ms']:.1f} ms/frame"
+        self.serve_status_var.set(
+            f"{server.url}video | {stats['clients']} viewer(s), {stats['sent']} frames sent, "
+            f"{stats['dropped']} dropped for slow viewers | {source}")
+        self.root.after(1000, self.update_serving_status, server)
+    
+    def toggle_pretrigger(self):
+        if self.pretrigger_var.get():
+            if self.grabber is not None:
+                self.start_pretrigger()
+        else:
+            self.stop_pretrigger()
+    
+    def start_pretrigger(self):
+        """Start buffering the last N seconds of frames within the memory budget"""
+        from pretrigger import PreTriggerBuffer
+        self.stop_pretrigger()
+        try:
+            seconds = max(0.5, float(self.pretrigger_seconds_var.get()))
+            max_bytes = max(16, int(self.pretrigger_mb_var.get())) * 1024 * 1024
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Please enter a valid pre-trigger time and memory limit")
+            self.pretrigger_var.set(False)
+            return
+        self.engine.use_full_frames()
+        self.pretrigger = PreTriggerBuffer(self.grabber, seconds=seconds, max_bytes=max_bytes,
+                                           compress=self.pretrigger_compress_var.get(),
+                                           jpeg_quality=self.get_save_options().get('jpeg_quality', 90))
+        self.pretrigger.start()
+        self.root.after(1000, self.update_pretrigger_status, self.pretrigger)
+    
+    def stop_pretrigger(self):
+        if self.pretrigger is not None:
+            self.pretrigger.stop()
+            self.pretrigger = None
+        self.pretrigger_status_var.set("")
+    
+    def update_pretrigger_status(self, pretrigger):
+        """Show how much history the buffer holds and what it costs"""
+        if pretrigger is not self.pretrigger:
+            return
+        stats = pretrigger.stats()
+        self.pretrigger_status_var.set(
+            f"Pre-trigger: {stats['seconds']:.1f} s held ({stats['frames']} frames), "
+            f"{stats['bytes'] / 2**20:.0f} of {stats['max_bytes'] / 2**20:.0f} MB, "
+            f"{stats['process_ms']:.1f} ms/frame")
+        if pretrigger.error is not None:
+            self.pretrigger_status_var.set(f"Pre-trigger buffer failed: {pretrigger.error}")
+            return
+        self.root.after(1000, self.update_pretrigger_status, pretrigger)
     
     def save_image(self):
         if self.captured_frame is None:
             messagebox.showwarning("Warning", "No frame captured yet")
             return
         
-        # Get filename
+        # An empty filename gets a timestamp; the selected format's extension is added if missing
         filename = self.filename_var.get().strip()
-        if not filename:
-            # Generate timestamp-based filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"capture_{timestamp}"
         
-        # Ensure .jpg extension
-        if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            filename += '.jpg'
+        try:
+            self.save_queue.options.update(self.get_save_options())
+            job = self.engine.save(self.captured_frame, filename, extension=self.format_var.get(),
+                                   block=False, on_done=self.save_results.put,
+                                   encoded=self.captured_encoded)
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Failed to save image:\n{str(e)}")
+            return
+        
+        if job is None:
+            self.status_var.set("Save queue is full - wait for pending saves to finish")
+            return
         
-        # Full path
-        filepath = os.path.join(self.output_dir, filename)
+        self.status_var.set(f"Saving: {job.path}")
         
+        # Clear the filename entry for next capture
+        self.filename_var.set("")
+        self.save_btn.config(state="disabled")
+    
+    def get_save_options(self):
+        """Encoding options from the capture controls"""
         try:
-            # Save the image
-            cv2.imwrite(filepath, self.captured_frame)
-            self.status_var.set(f"Image saved: {filepath}")
-            messagebox.showinfo("Success", f"Image saved successfully:\n{filepath}")
-            
-            # Clear the filename entry for next capture
-            self.filename_var.set("")
-            self.save_btn.config(state="disabled")
-            
+            quality = min(100, max(1, int(self.quality_var.get())))
+            png_level = min(9, max(0, int(self.png_level_var.get())))
+        except (tk.TclError, ValueError):
+            return {}
+        return {'jpeg_quality': quality, 'webp_quality': quality, 'png_compression': png_level}
+    
+    def poll_saves(self):
+        """Report finished background saves without blocking the UI"""
+        self.save_auto_captures()
+        try:
+            while True:
+                job = self.save_results.get_nowait()
+                if job.error is None:
+                    duplicate = ""
+                    if job.entry is not None and job.entry['duplicate_of'] is not None:
+                        original = self.library.get(job.entry['duplicate_of'])
+                        if original is not None:
+                            duplicate = f" (near-duplicate of {os.path.basename(original['path'])})"
+                    self.status_var.set(f"Image saved: {job.path}{duplicate}")
+                else:
+                    self.status_var.set(f"Failed to save {os.path.basename(job.path)}: {job.error}")
+        except queue.Empty:
+            pass
+        
+        stats = self.save_queue.stats()
+        if stats['pending']:
+            self.save_status_var.set(f"Saving {stats['pending']} image(s) "
+                                     f"({stats['pending_bytes'] / 1e6:.0f} MB queued)")
+        elif stats['completed'] or stats['failed']:
+            failed = f", {stats['failed']} failed" if stats['failed'] else ""
+            self.save_status_var.set(f"Saved {stats['completed']}{failed}")
+        self.root.after(250, self.poll_saves)
+    
+    def start_burst(self):
+        """Capture N consecutive frames at the full camera rate"""
+        if self.capture_run is not None and self.capture_run.is_running:
+            return
+        try:
+            count = max(1, int(self.burst_count_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Please enter a valid number of burst frames")
+            return
+        self.save_queue.options.update(self.get_save_options())
+        try:
+            self.capture_run = self.engine.capture_series(count, extension=self.format_var.get())
         except Exception as e:
-            messagebox.showerror("Save Error", f"Failed to save image:\n{str(e)}")
+            messagebox.showwarning("Warning", str(e))
+            return
+        self.burst_btn.config(state="disabled")
+        self.timelapse_btn.config(state="disabled")
+        self.root.after(250, self.update_run_status, self.capture_run)
+    
+    def toggle_timelapse(self):
+        """Start or stop capturing one frame every K seconds"""
+        if self.capture_run is not None and self.capture_run.is_running:
+            self.stop_capture_run()
+            return
+        try:
+            interval = max(0.05, float(self.interval_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Please enter a valid interval in seconds")
+            return
+        self.save_queue.options.update(self.get_save_options())
+        try:
+            # A screen timelapse only saves frames that differ from the last one saved
+            self.capture_run = self.engine.capture_series(rate=1.0 / interval, extension=self.format_var.get(),
+                                                          skip_unchanged=self.connection_type.get() == "screen")
+        except Exception as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        self.burst_btn.config(state="disabled")
+        self.timelapse_btn.config(text="Stop Timelapse")
+        self.root.after(250, self.update_run_status, self.capture_run)
+    
+    def stop_capture_run(self):
+        if self.capture_run is not None:
+            self.capture_run.stop()
+    
+    def update_run_status(self, run):
+        """Show achieved vs requested capture rate for a burst or timelapse"""
+        from burst import BurstCapture
+        stats = run.stats()
+        kind = "Burst" if isinstance(run, BurstCapture) else "Timelapse"
+        requested = f"{stats['requested_fps']:.2f}" if stats['requested_fps'] else "-"
+        self.run_status_var.set(
+            f"{kind}: {stats['captured']} captured, {stats['written']} written, {stats['missed']} missed | "
+            f"{stats['achieved_fps']:.2f} of {requested} FPS requested, writing {stats['written_fps']:.2f} FPS"
+            + (f" | {stats['unchanged']} unchanged" if stats.get('unchanged') else ""))
+        if run.is_running or stats['written'] + stats['failed'] < stats['captured']:
+            self.root.after(250, self.update_run_status, run)
+        elif run is self.capture_run:
+            if self.is_running:
+                self.burst_btn.config(state="normal")
+                self.timelapse_btn.config(state="normal", text="Start Timelapse")
+    
+    def toggle_recording(self):
+        """Start or stop streaming the live source to video segments"""
+        if self.recorder is not None and self.recorder.is_running:
+            self.stop_recording()
+            return
+        if self.grabber is None:
+            return
+        try:
+            segment_seconds = max(1.0, float(self.segment_minutes_var.get()) * 60)
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Please enter a valid segment length in minutes")
+            return
+        
+        from recorder import VideoRecorder
+        from spool import SPOOL_FORMAT, SpoolRecorder
+        self.engine.use_full_frames()
+        if self.record_format_var.get() == SPOOL_FORMAT:
+            # Raw frames straight to disk; export them later with spool.py
+            self.recorder = SpoolRecorder(self.grabber, self.output_dir)
+        else:
+            self.recorder = VideoRecorder(self.grabber, self.output_dir, self.record_format_var.get(),
+                                          segment_seconds=segment_seconds,
+                                          jpeg_quality=self.get_save_options().get('jpeg_quality', 90))
+        try:
+            self.recorder.start()
+        except Exception as e:
+            messagebox.showerror("Recording Error", f"Failed to start recording:\n{str(e)}")
+            self.recorder = None
+            return
+        self.record_btn.config(text="Stop Recording")
+        self.root.after(500, self.update_record_status, self.recorder)
+    
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.stop()
+    
+    def update_record_status(self, recorder):
+        """Show recording progress, including frames dropped by a slow encoder or disk"""
+        stats = recorder.stats()
+        state = "Recording" if stats['running'] else "Recorded"
+        self.record_status_var.set(
+            f"{state}: {stats['recorded']} frames ({stats['fps']:.1f} FPS), {stats['dropped']} dropped, "
+            f"{stats['segments']} segment(s), {stats['bytes_written'] / 1e6:.1f} MB"
+            + (f", {stats['repeated']} repeated to keep time" if stats.get('repeated') else ""))
+        if recorder.error is not None:
+            self.record_status_var.set(f"Recording failed: {recorder.error}")
+        if stats['running']:
+            self.root.after(500, self.update_record_status, recorder)
+        elif recorder is self.recorder and self.is_running:
+            self.record_btn.config(text="Start Recording")
+    
+    def add_multi_source(self):
+        """Add the selected USB camera or IP URL to the multi-camera list"""
+        if self.connection_type.get() == "usb":
+            source = int(self.usb_var.get())
+        elif self.connection_type.get() == "ip":
+            source = self.url_var.get().strip()
+            if not source:
+                messagebox.showerror("Error", "Please enter a valid camera URL")
+                return
+        else:
+            messagebox.showinfo("Multi-View", "Only USB and IP cameras can be added to the multi-camera view")
+            return
+        
+        if source not in self.multi_sources:
+            self.multi_sources.append(source)
+        self.multi_var.set(f"Multi-View: {len(self.multi_sources)} source(s)")
+    
+    def open_multi_view(self):
+        """Open all multi-camera sources in a tiled preview window"""
+        if not self.multi_sources:
+            messagebox.showinfo("Multi-View", "Add USB or IP cameras with 'Add to Multi-View' first")
+            return
+        if self.is_running and self.connection_type.get() == "usb" and int(self.usb_var.get()) in self.multi_sources:
+            # A USB device can only be opened once
+            self.stop_camera()
+        MultiCameraWindow(self.root, list(self.multi_sources), lambda: self.output_dir, self.save_queue)
+    
+    def toggle_overlay(self):
+        """Show or hide the per-stage timing overlay on the preview"""
+        if self.overlay_var.get():
+            self.overlay_label.place(x=8, y=8)
+            self.update_overlay()
+        else:
+            self.overlay_label.place_forget()
+    
+    def update_overlay(self):
+        if not self.overlay_var.get():
+            return
+        self.overlay_label.config(text=METRICS.format_overlay())
+        self.root.after(500, self.update_overlay)
+    
+    def export_stats(self):
+        """Write the current timing histograms, counters and memory to JSON or CSV"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = filedialog.asksaveasfilename(title="Export Stats", initialdir=self.output_dir,
+                                            initialfile=f"stats_{timestamp}.json", defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+        if not path:
+            return
+        try:
+            METRICS.export(path)
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Failed to export stats:\n{str(e)}")
+            return
+        self.status_var.set(f"Stats exported: {path}")
+    
+    def open_gallery(self):
+        """Browse thumbnails of the captures in the save location"""
+        GalleryWindow(self.root, self.library, self.output_dir)
     
     def browse_save_location(self):
         new_dir = filedialog.askdirectory(title="Select Save Location", initialdir=self.output_dir)
         if new_dir:
-            self.output_dir = new_dir
+            self.engine.output_dir = new_dir
             self.status_var.set(f"Save location: {self.output_dir}")
     
     def on_closing(self):
         self.stop_camera()
+        self.engine.stop_serving()
+        if self.window_registry is not None:
+            self.window_registry.stop()
+        # Let queued saves finish writing before exiting
+        self.save_queue.shutdown(wait=True)
+        self.library.close()
         self.root.destroy()
 
+class MultiCameraWindow:
+    """Tiled live preview of several sources with a synchronized 'Capture All'"""
+    
+    def __init__(self, parent, sources, get_output_dir, save_queue):
+        from sessions import CaptureSession
+        self.get_output_dir = get_output_dir
+        self.save_queue = save_queue
+        self.session = CaptureSession()
+        self.tiles = []
+        self.is_running = True
+        
+        self.window = tk.Toplevel(parent)
+        self.window.title("Multi-Camera View")
+        self.window.geometry("1000x750")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.window.columnconfigure(0, weight=1)
+        self.window.rowconfigure(0, weight=1)
+        
+        self.grid_frame = ttk.Frame(self.window, padding="5")
+        self.grid_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        controls = ttk.Frame(self.window, padding="5")
+        controls.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        self.capture_all_btn = ttk.Button(controls, text="Capture All", command=self.capture_all, state="disabled")
+        self.capture_all_btn.pack(side=tk.LEFT)
+        
+        self.status_var = tk.StringVar(value=f"Opening {len(sources)} source(s)...")
+        ttk.Label(self.window, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W).grid(
+            row=2, column=0, sticky=(tk.W, tk.E))
+        
+        # Open sources off the UI thread, then build the grid on the main loop
+        self.open_errors = None
+        threading.Thread(target=self.open_sources, args=(sources,), daemon=True).start()
+        self.window.after(100, self.wait_for_sources)
+    
+    def open_sources(self, sources):
+        self.open_errors = self.session.open_all(sources)
+    
+    def wait_for_sources(self):
+        if not self.is_running:
+            return
+        if self.open_errors is None:
+            self.window.after(100, self.wait_for_sources)
+            return
+        
+        from preview import PreviewRenderer
+        handles = list(self.session.sources)
+        columns = max(1, math.ceil(math.sqrt(len(handles))))
+        for i, handle in enumerate(handles):
+            row, column = divmod(i, columns)
+            self.grid_frame.columnconfigure(column, weight=1)
+            self.grid_frame.rowconfigure(row, weight=1)
+            tile = ttk.LabelFrame(self.grid_frame, text=handle.name, padding="2")
+            tile.grid(row=row, column=column, sticky=(tk.W, tk.E, tk.N, tk.S), padx=2, pady=2)
+            tile.columnconfigure(0, weight=1)
+            tile.rowconfigure(0, weight=1)
+            label = ttk.Label(tile, background="black")
+            label.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+            renderer = PreviewRenderer(label, tile, min_size=(160, 120), padding=(8, 24))
+            self.tiles.append({'handle': handle, 'renderer': renderer, 'seq': 0, 'buf': None})
+        
+        if self.open_errors:
+            failed = ", ".join(str(s) for s in self.open_errors)
+            self.status_var.set(f"Opened {len(handles)} source(s); failed: {failed}")
+        else:
+            self.status_var.set(f"Opened {len(handles)} source(s)")
+        if handles:
+            self.capture_all_btn.config(state="normal")
+        self.window.after(16, self.render_tiles)
+        self.window.after(1000, self.update_stats)
+    
+    def render_tiles(self):
+        """Render the newest frame of every tile that has one, one pass per display tick"""
+        if not self.is_running:
+            return
+        for tile in self.tiles:
+            grabber = tile['handle'].grabber
+            if grabber.seq == tile['seq']:
+                continue
+            try:
+                tile['seq'], _, tile['buf'] = grabber.latest(tile['buf'])
+                tile['renderer'].render(tile['buf'])
+            except Exception as e:
+                print(f"Error rendering tile {tile['handle'].name}: {e}")
+        self.window.after(16, self.render_tiles)
+    
+    def update_stats(self):
+        if not self.is_running:
+            return
+        parts = []
+        for stats in self.session.stats():
+            age = f"{stats['age_ms']:.0f}" if stats['age_ms'] is not None else "-"
+            state = "" if stats['running'] else " (stopped)"
+            if stats.get('state') == 'reconnecting':
+                state = f" (reconnecting, {stats['reconnects']} so far)"
+            parts.append(f"{stats['name']}: {stats['fps']:.1f} FPS, {age} ms{state}")
+        self.status_var.set(" | ".join(parts))
+        self.window.after(1000, self.update_stats)
+    
+    def capture_all(self):
+        """Save the frame from every source closest to a common timestamp"""
+        timestamp, frames = self.session.capture_all()
+        output_dir = self.get_output_dir()
+        stamp = datetime.fromtimestamp(timestamp).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        skew = 0.0
+        queued = 0
+        for name, (frame_timestamp, frame) in frames.items():
+            skew = max(skew, abs(frame_timestamp - timestamp))
+            path = os.path.join(output_dir, f"capture_{stamp}_{name}.jpg")
+            if self.save_queue.submit(frame, path, block=False, source=name) is not None:
+                queued += 1
+        
+        dropped = f", {len(frames) - queued} dropped (save queue full)" if queued < len(frames) else ""
+        self.status_var.set(f"Saving {queued} frame(s) to {output_dir} (max skew {skew * 1000:.0f} ms){dropped}")
+    
+    def close(self):
+        self.is_running = False
+        self.session.close()
+        self.window.destroy()
+
+class GalleryWindow:
+    """Scrollable thumbnail grid of one directory's captures, from the capture library.
+
+    Only the rows in view get PhotoImages, so the grid stays light however
+    many captures there are. The directory is scanned for files saved
+    elsewhere in the background, and the grid reloads when that finishes.
+    """
+    
+    CELL_PADDING = 8
+    LABEL_HEIGHT = 18
+    
+    def __init__(self, parent, library, directory):
+        self.library = library
+        self.directory = directory
+        self.entries = []
+        self.photos = {}  # entry index -> PhotoImage, for visible cells only
+        self.columns = 1
+        self.scanned = None
+        self.is_open = True
+        
+        width, height = library.thumbnails.size
+        self.cell_width = width + self.CELL_PADDING
+        self.cell_height = height + self.LABEL_HEIGHT + self.CELL_PADDING
+        
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Gallery - {directory}")
+        self.window.geometry("900x650")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.window.columnconfigure(0, weight=1)
+        self.window.rowconfigure(1, weight=1)
+        
+        controls = ttk.Frame(self.window, padding="5")
+        controls.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        self.duplicates_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controls, text="Near-duplicates only", variable=self.duplicates_var,
+                        command=self.reload).pack(side=tk.LEFT)
+        ttk.Button(controls, text="Refresh", command=self.start_scan).pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.canvas = tk.Canvas(self.window, background="gray20", highlightthickness=0)
+        self.canvas.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar = ttk.Scrollbar(self.window, orient=tk.VERTICAL, command=self.on_scroll)
+        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.bind("<Configure>", lambda event: self.layout())
+        self.canvas.bind("<MouseWheel>", lambda event: self.on_scroll("scroll", -event.delta // 120, "units"))
+        self.canvas.bind("<Button-4>", lambda event: self.on_scroll("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.on_scroll("scroll", 1, "units"))
+        self.canvas.bind("<Double-Button-1>", self.open_entry)
+        
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self.window, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W).grid(
+            row=2, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        
+        self.reload()
+        self.start_scan()
+    
+    def start_scan(self):
+        """Index files in the directory the library doesn't know about yet"""
+        self.scanned = None
+        self.status_var.set(f"Scanning {self.directory}...")
+        
+        def run():
+            try:
+                self.scanned = self.library.scan(self.directory)
+            except Exception as e:
+                print(f"Error scanning {self.directory}: {e}")
+                self.scanned = 0
+        
+        threading.Thread(target=run, daemon=True).start()
+        self.window.after(200, self.wait_for_scan)
+    
+    def wait_for_scan(self):
+        if not self.is_open:
+            return
+        if self.scanned is None:
+            self.window.after(200, self.wait_for_scan)
+            return
+        self.reload()
+    
+    def reload(self):
+        self.entries = self.library.captures(self.directory, duplicates_only=self.duplicates_var.get())
+        duplicates = sum(1 for entry in self.entries if entry['duplicate_of'] is not None)
+        self.status_var.set(f"{len(self.entries)} capture(s), {duplicates} near-duplicate(s)")
+        self.layout(force=True)
+    
+    def layout(self, force=False):
+        columns = max(1, self.canvas.winfo_width() // self.cell_width)
+        if columns != self.columns or force:
+            self.columns = columns
+            self.canvas.delete("all")
+            self.photos.clear()
+        rows = -(-len(self.entries) // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, self.columns * self.cell_width, rows * self.cell_height),
+                              yscrollincrement=self.cell_height // 4)
+        self.draw_visible()
+    
+    def on_scroll(self, *args):
+        self.canvas.yview(*args)
+        self.draw_visible()
+    
+    def draw_visible(self):
+        """Create cells for the rows in view and drop the PhotoImages of the rest"""
+        top = self.canvas.canvasy(0)
+        first_row = int(top // self.cell_height)
+        last_row = int((top + self.canvas.winfo_height()) // self.cell_height)
+        visible = range(first_row * self.columns, min(len(self.entries), (last_row + 1) * self.columns))
+        
+        for index in list(self.photos):
+            if index not in visible:
+                self.canvas.delete(f"cell{index}")
+                del self.photos[index]
+        for index in visible:
+            if index not in self.photos:
+                self.draw_cell(index)
+    
+    def draw_cell(self, index):
+        from PIL import Image, ImageTk
+        entry = self.entries[index]
+        row, column = divmod(index, self.columns)
+        x = column * self.cell_width + self.CELL_PADDING // 2
+        y = row * self.cell_height + self.CELL_PADDING // 2
+        image = self.library.thumbnail(entry)
+        self.photos[index] = ImageTk.PhotoImage(Image.fromarray(image)) if image is not None else None
+        tags = ("cell", f"cell{index}")
+        if self.photos[index] is not None:
+            self.canvas.create_image(x, y, image=self.photos[index], anchor=tk.NW, tags=tags)
+        label = os.path.basename(entry['path'])
+        color = "white"
+        if entry['duplicate_of'] is not None:
+            label = "≈ " + label
+            color = "orange"
+        width = self.cell_width - self.CELL_PADDING
+        self.canvas.create_text(x, y + self.cell_height - self.LABEL_HEIGHT - self.CELL_PADDING // 2,
+                                text=label, anchor=tk.NW, fill=color, width=width, tags=tags)
+    
+    def open_entry(self, event):
+        """Open the double-clicked capture in the system image viewer"""
+        column = int(self.canvas.canvasx(event.x) // self.cell_width)
+        index = int(self.canvas.canvasy(event.y) // self.cell_height) * self.columns + column
+        if column >= self.columns or not 0 <= index < len(self.entries):
+            return
+        path = self.entries[index]['path']
+        try:
+            if platform.system() == "Windows":
+                os.startfile(path)
+            elif platform.system() == "Darwin":
+                subprocess.Popen(["open", path])
+            else:
+                subprocess.Popen(["xdg-open", path])
+        except Exception as e:
+            messagebox.showerror("Error", f"Cannot open {path}:\n{str(e)}")
+    
+    def close(self):
+        self.is_open = False
+        self.photos.clear()
+        self.window.destroy()
+
 def main():
-    # Check if required packages are available
-    try:
-        import cv2
-        import PIL
-    except ImportError as e:
+    STARTUP.mark('imports')
+    # Check if required packages are available, without paying for importing them yet
+    missing = [package for module, package in (("cv2", "opencv-python"), ("PIL", "pillow"), ("numpy", "numpy"))
+               if find_spec(module) is None]
+    if missing:
         print("Missing required packages. Please install them using:")
-        print("pip install opencv-python pillow")
+        print(f"pip install {' '.join(missing)}")
         return
     
     # Check for optional screen capture packages
     missing_packages = []
     if platform.system() == "Windows":
-        try:
-            import pygetwindow
-            import pyautogui
-        except ImportError:
-            missing_packages.extend(["pygetwindow", "pyautogui"])
+        missing_packages = [package for package in ("pygetwindow", "pyautogui") if find_spec(package) is None]
     elif platform.system() == "Darwin":  # macOS
-        try:
-            import Quartz
-        except ImportError:
+        if find_spec("Quartz") is None:
             missing_packages.append("pyobjc-framework-Quartz")
     
     if missing_packages:
@@ -642,6 +1490,12 @@ def main():
     y = (root.winfo_screenheight() // 2) - (root.winfo_height() // 2)
     root.geometry(f"+{x}+{y}")
     
+    # Draw the window before the slow imports, so it appears right away
+    root.update()
+    STARTUP.mark('window')
+    app.load_backend()
+    STARTUP.mark('backend')
+    
     root.mainloop()
 
 if __name__ == "__main__":
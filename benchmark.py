@@ -0,0 +1,702 @@
+"""Benchmarks for the capture, preview and save paths on synthetic sources.
+
+Examples:
+    python benchmark.py                          # everything at 720p, 1080p and 4K
+    python benchmark.py --quick                  # shorter runs, no 4K
+    python benchmark.py --only encode,preview --sizes 1080p
+    python benchmark.py --compare                # diff against the previous stored run
+    python benchmark.py --compare benchmark_results/20250101_120000.json
+
+Sources are synthetic so runs are reproducible and need no hardware: a fake
+camera producing 720p/1080p/4K frames, an MJPG video file written on the fly
+and a fake screen backend in which only a small area changes between grabs.
+Nothing needs a display; without one the preview path runs with a
+PhotoImage stand-in and its 'photoimage' stage is left out.
+
+Every run is stored as JSON under ``benchmark_results/`` together with the
+machine, library versions and git commit, so runs can be compared over time.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+import frame_format
+from frame_format import DisplayConverter
+from grabber import FrameGrabber
+from metrics import METRICS
+from quality import QualityScorer
+from saver import DEFAULT_OPTIONS, SaveQueue, encode_params
+from screen_grab import FULL_SCREEN, PILBackend, ScreenCapture
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+
+GROUPS = ['capture', 'copy', 'convert', 'preview', 'encode', 'save']
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results")
+
+# Space the preview gets in a maximised window on a 1080p display
+PREVIEW_SIZE = (1280, 720)
+
+ENCODE_SETTINGS = [
+    ('jpg', 'jpeg_quality', 70),
+    ('jpg', 'jpeg_quality', 90),
+    ('jpg', 'jpeg_quality', 95),
+    ('png', 'png_compression', 1),
+    ('png', 'png_compression', 3),
+    ('png', 'png_compression', 9),
+]
+
+
+def synthetic_frames(width, height, count=4, seed=0):
+    """Deterministic BGR test frames: smooth gradients, blotchy texture, sensor noise and a moving block.
+
+    Pure noise is unrealistically hard to compress and flat colour
+    unrealistically easy; this sits in between, like a camera image.
+    """
+    rng = np.random.default_rng(seed)
+    gx = np.linspace(0, 255, width, dtype=np.float32)
+    gy = np.linspace(0, 255, height, dtype=np.float32)
+    base = np.empty((height, width, 3), np.uint8)
+    base[..., 0] = gx[None, :]
+    base[..., 1] = gy[:, None]
+    base[..., 2] = (gx[None, :] + gy[:, None]) / 2
+    texture = rng.integers(0, 256, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    texture = cv2.resize(texture, (width, height), interpolation=cv2.INTER_CUBIC)
+    base = cv2.addWeighted(base, 0.6, texture, 0.4, 0)
+
+    side = max(8, min(width, height) // 6)
+    frames = []
+    for i in range(count):
+        frame = cv2.add(base, rng.integers(0, 8, base.shape, dtype=np.uint8))
+        x = (width - side) * i // max(1, count)
+        y = (height - side) * i // max(1, count)
+        cv2.rectangle(frame, (x, y), (x + side, y + side), (40 * i % 256, 255, 200), -1)
+        cv2.putText(frame, f"frame {i}", (side // 4, height - side // 4), cv2.FONT_HERSHEY_SIMPLEX,
+                    side / 60, (255, 255, 255), max(1, side // 30))
+        frames.append(frame)
+    return frames
+
+
+class SyntheticCapture:
+    """VideoCapture stand-in that cycles through a few synthetic frames.
+
+    ``read(image)`` copies into ``image`` the way a camera decodes into the
+    caller's buffer. With ``fps`` it paces itself against absolute deadlines
+    like a real camera; without, it delivers as fast as it is asked.
+    """
+
+    def __init__(self, frames, fps=None):
+        self.frames = frames
+        self.fps = fps
+        self._index = 0
+        self._deadline = None
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self, image=None):
+        if not self._opened:
+            return False, None
+        if self.fps:
+            now = time.perf_counter()
+            if self._deadline is None:
+                self._deadline = now
+            if self._deadline > now:
+                time.sleep(self._deadline - now)
+            # Never let the deadline fall more than a frame behind
+            self._deadline = max(self._deadline + 1.0 / self.fps, time.perf_counter() - 1.0 / self.fps)
+        frame = self.frames[self._index % len(self.frames)]
+        self._index += 1
+        if image is None or image.shape != frame.shape or image.dtype != frame.dtype:
+            return True, frame.copy()
+        np.copyto(image, frame)
+        return True, image
+
+    def get(self, prop):
+        height, width = self.frames[0].shape[:2]
+        return {
+            cv2.CAP_PROP_FPS: float(self.fps or 0.0),
+            cv2.CAP_PROP_FRAME_WIDTH: float(width),
+            cv2.CAP_PROP_FRAME_HEIGHT: float(height),
+        }.get(prop, 0.0)
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._opened = False
+
+
+def write_video(path, frames, count=30, fps=30):
+    """Write ``count`` frames (cycling through ``frames``) to an MJPG AVI file"""
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise OSError(f"Could not write {path}")
+    try:
+        for i in range(count):
+            writer.write(frames[i % len(frames)])
+    finally:
+        writer.release()
+    return path
+
+
+class LoopingVideo:
+    """A video file capture that starts over at the end instead of failing"""
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise OSError(f"Could not open {path}")
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        ret, frame = self.cap.read(image)
+        if not ret:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image)
+        return ret, frame
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+
+class SyntheticScreenBackend:
+    """Screen-grab backend serving one BGRA desktop in which a small block changes on every grab.
+
+    Like the X11 shared-memory backend, ``grab_raw`` returns the same buffer
+    each time, so the cost measured is change detection and conversion.
+    """
+
+    name = "synthetic"
+    raw_format = "BGRA"
+
+    def __init__(self, frame, changed=0.02):
+        self.raw = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+        height, width = frame.shape[:2]
+        self.side = max(8, int((changed * width * height) ** 0.5))
+        self._grabs = 0
+
+    def grab_raw(self, region=None):
+        height, width = self.raw.shape[:2]
+        self._grabs += 1
+        x = (self._grabs * 97) % max(1, width - self.side)
+        y = (self._grabs * 61) % max(1, height - self.side)
+        shade = self._grabs * 7 % 256
+        self.raw[y:y + self.side, x:x + self.side] = (shade, 255 - shade, 128, 255)
+        return self.raw
+
+    def convert(self, raw, out=None):
+        return frame_format.convert(raw, self.raw_format, 'BGR', out)
+
+    def grab(self, region=None, out=None):
+        return self.convert(self.grab_raw(region), out)
+
+    def close(self):
+        pass
+
+
+def summarize(samples_ms):
+    """Latency percentiles, in milliseconds, of a list of samples"""
+    if not samples_ms:
+        return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p90_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    samples = np.asarray(samples_ms)
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+    return {
+        'count': len(samples),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'max_ms': float(samples.max()),
+    }
+
+
+def allocations(fn, calls=5):
+    """Bytes of Python and NumPy memory allocated per call of ``fn``, via tracemalloc.
+
+    Returns the largest peak above the starting point over ``calls`` calls
+    (temporary buffers included) and what was still held after them.
+    OpenCV's internal scratch memory is not visible to tracemalloc.
+    """
+    tracemalloc.start()
+    try:
+        fn()  # lets lazily created buffers settle before measuring
+        start, _ = tracemalloc.get_traced_memory()
+        peak = 0
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn()
+            _, high = tracemalloc.get_traced_memory()
+            peak = max(peak, high - before)
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'alloc_peak_bytes': peak, 'alloc_retained_bytes': max(0, end - start)}
+
+
+def stage_summary():
+    """p50/p99 of every pipeline stage recorded into METRICS since the last reset"""
+    return {name: {'p50_ms': s['p50_ms'], 'p99_ms': s['p99_ms']}
+            for name, s in METRICS.snapshot()['stages'].items() if s['count']}
+
+
+def measure(fn, seconds, min_calls=5):
+    """Call ``fn`` back to back for about ``seconds``: latency, calls per second, CPU and allocations"""
+    fn()  # warm-up: first calls allocate buffers and load codecs
+    METRICS.reset()
+    samples = []
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    while len(samples) < min_calls or time.perf_counter() - wall_start < seconds:
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    wall = time.perf_counter() - wall_start
+    result = summarize(samples)
+    result['per_s'] = len(samples) / wall
+    result['cpu_cores'] = (time.process_time() - cpu_start) / wall
+    stages = stage_summary()
+    if stages:
+        result['stages'] = stages
+    result.update(allocations(fn))
+    return result
+
+
+def run_grabber(cap, seconds):
+    """Run a FrameGrabber on ``cap`` and pull every new frame the way a capture does.
+
+    Throughput is what the grabber reads; latency is from a frame being
+    published to the consumer holding its own copy.
+    """
+    grabber = FrameGrabber(cap)
+    grabber.start()
+    try:
+        seq = grabber.wait_for_frame(0, timeout=10.0)
+        if not seq:
+            raise RuntimeError("source delivered no frames")
+        _, _, out = grabber.latest()
+        METRICS.reset()
+        latencies = []
+        first_read = grabber.frames_read
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        while time.perf_counter() - wall_start < seconds:
+            newest = grabber.wait_for_frame(seq, timeout=1.0)
+            if newest == seq:
+                if not grabber.is_running:
+                    raise RuntimeError("source stopped delivering frames")
+                continue
+            seq, timestamp, out = grabber.latest(out)
+            latencies.append((time.time() - timestamp) * 1000)
+        wall = time.perf_counter() - wall_start
+        frames = grabber.frames_read - first_read
+        cpu = time.process_time() - cpu_start
+    finally:
+        grabber.stop()
+
+    result = summarize(latencies)
+    result['per_s'] = frames / wall
+    result['consumed_per_s'] = len(latencies) / wall
+    result['cpu_cores'] = cpu / wall
+    result['stages'] = stage_summary()
+    return result
+
+
+def bench_capture(size, frames, seconds, workdir):
+    yield "camera, unpaced", {}, lambda: run_grabber(SyntheticCapture(frames), seconds)
+    yield "camera, 30 fps", {'fps': 30}, lambda: run_grabber(SyntheticCapture(frames, fps=30), seconds)
+
+    def video_file():
+        path = write_video(os.path.join(workdir, f"synthetic_{size}.avi"), frames)
+        return run_grabber(LoopingVideo(path), seconds)
+    yield "video file (MJPG)", {'codec': 'MJPG'}, video_file
+
+    def screen():
+        backend = SyntheticScreenBackend(frames[0])
+        cap = ScreenCapture(FULL_SCREEN, fps=1000, backend=lambda: backend)
+        return run_grabber(cap, seconds)
+    yield "screen, 2% changing", {'changed': 0.02}, screen
+
+
+def bench_copy(size, frames, seconds, workdir):
+    grabber = FrameGrabber(SyntheticCapture(frames))
+    grabber.start(first_frame=frames[0])
+    grabber.stop(release=False)
+    out = np.empty_like(frames[0])
+    yield "latest() into buffer", {}, lambda: measure(lambda: grabber.latest(out), seconds)
+    yield "latest() allocating", {}, lambda: measure(lambda: grabber.latest(), seconds)
+
+
+def bench_convert(size, frames, seconds, workdir):
+    frame = frames[0]
+    width, height = PREVIEW_SIZE
+    resized = np.empty((height, width, 3), np.uint8)
+    rgba = np.empty(frame.shape[:2] + (4,), np.uint8)
+    rgb = np.empty_like(frame)
+    bgra = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+    for name, interpolation in (('linear', cv2.INTER_LINEAR), ('area', cv2.INTER_AREA),
+                                ('nearest', cv2.INTER_NEAREST)):
+        yield (f"resize to {width}x{height}, {name}", {'interpolation': name},
+               lambda i=interpolation: measure(lambda: cv2.resize(frame, PREVIEW_SIZE, dst=resized, interpolation=i),
+                                               seconds))
+    # The preview's resize and channel swap: the straightforward two passes
+    # (default interpolation, then converting the result) against DisplayConverter
+    half = frame[::2, ::2].copy()
+    targets = [('fit', frame, PREVIEW_SIZE), ('half', frame, (frame.shape[1] // 2, frame.shape[0] // 2)),
+               ('2x up', half, (frame.shape[1], frame.shape[0]))]
+    for label, source, (width, height) in targets:
+        two_pass = np.empty((height, width, 3), np.uint8)
+        display = np.empty((height, width, 4), np.uint8)
+
+        def naive(source=source, size=(width, height), two_pass=two_pass, display=display):
+            cv2.resize(source, size, dst=two_pass)
+            cv2.cvtColor(two_pass, cv2.COLOR_BGR2RGBA, dst=display)
+        converter = DisplayConverter((source.shape[1], source.shape[0]), (width, height))
+        yield f"display {label}, two-pass", {'width': width, 'height': height}, lambda f=naive: measure(f, seconds)
+        yield (f"display {label}, converter", {'width': width, 'height': height},
+               lambda c=converter, s=source: measure(lambda: c.convert(s), seconds))
+
+    yield ("shrink /4, one INTER_AREA", {}, lambda: measure(
+        lambda: cv2.resize(frame, (frame.shape[1] // 4, frame.shape[0] // 4), interpolation=cv2.INTER_AREA), seconds))
+    yield "shrink /4, halvings", {}, lambda: measure(lambda: frame_format.shrink(frame, 4), seconds)
+
+    # What the quality monitor and the pre-trigger buffer spend scoring each grabbed frame
+    scorer = QualityScorer()
+    yield "quality score", {}, lambda: measure(lambda: scorer.score(frame), seconds)
+
+    # PIL screen grabs: unpack to RGB then swap, against packing straight to BGR
+    from PIL import Image
+    screenshot = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    grabbed = np.empty_like(frame)
+
+    def pil_two_pass():
+        cv2.cvtColor(np.asarray(screenshot.convert('RGB')), cv2.COLOR_RGB2BGR, dst=grabbed)
+    yield "PIL grab to BGR, two-pass", {}, lambda: measure(pil_two_pass, seconds)
+
+    def pil_backend():
+        try:
+            backend = PILBackend()
+        except ImportError as e:
+            raise RuntimeError(f"PIL.ImageGrab unavailable: {e}")
+        backend._grab = lambda bbox=None: screenshot
+        return measure(lambda: backend.grab(out=grabbed), seconds)
+    yield "PIL grab to BGR, packed", {}, pil_backend
+
+    yield "BGR to RGBA", {}, lambda: measure(lambda: cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA, dst=rgba), seconds)
+    yield "BGR to RGB", {}, lambda: measure(lambda: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb), seconds)
+    yield "BGRA to BGR (screen)", {}, lambda: measure(lambda: cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=rgb),
+                                                      seconds)
+
+
+class _Widget:
+    """Stands in for the Tk label and container a PreviewRenderer draws into"""
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def config(self, **kwargs):
+        pass
+
+
+class _NullPhoto:
+    def paste(self, image):
+        pass
+
+
+_tk_root = None
+
+
+def tk_root():
+    """A hidden Tk root for real PhotoImages, or None when there is no display"""
+    global _tk_root
+    if _tk_root is None:
+        try:
+            import tkinter
+            _tk_root = tkinter.Tk()
+            _tk_root.withdraw()
+        except Exception:
+            _tk_root = False
+    return _tk_root or None
+
+
+def preview_renderer(detect_changes):
+    from preview import PreviewRenderer
+
+    widget = _Widget()
+    renderer = PreviewRenderer(widget, widget, detect_changes=detect_changes)
+    if tk_root() is None:
+        renderer._create_photo = lambda size: _NullPhoto()
+    renderer.on_configure(SimpleNamespace(width=PREVIEW_SIZE[0] + renderer.padding[0],
+                                          height=PREVIEW_SIZE[1] + renderer.padding[1]))
+    return renderer
+
+
+def render_cycle(renderer, frames):
+    index = [0]
+
+    def render():
+        renderer.render(frames[index[0] % len(frames)])
+        index[0] += 1
+    return render
+
+
+def bench_preview(size, frames, seconds, workdir):
+    try:
+        import preview  # noqa: F401  (needs Pillow's ImageTk)
+    except ImportError as e:
+        print(f"Skipping preview benchmarks: {e}")
+        return
+    params = {'photoimage': tk_root() is not None}
+    yield "full frames", params, lambda: measure(render_cycle(preview_renderer(False), frames), seconds)
+    yield ("change detection, static", params,
+           lambda: measure(render_cycle(preview_renderer(True), frames[:1]), seconds))
+
+    def partial():
+        backend = SyntheticScreenBackend(frames[0])
+        screens = [backend.grab() for _ in range(8)]
+        return measure(render_cycle(preview_renderer(True), screens), seconds)
+    yield "change detection, 2% changing", params, partial
+
+
+def bench_encode(size, frames, seconds, workdir):
+    frame = frames[0]
+    for extension, option, value in ENCODE_SETTINGS:
+        options = dict(DEFAULT_OPTIONS, **{option: value})
+        ext, params = encode_params(f"frame.{extension}", options)
+
+        def encode(ext=ext, params=params):
+            result = measure(lambda: cv2.imencode(ext, frame, params), seconds)
+            result['bytes'] = len(cv2.imencode(ext, frame, params)[1])
+            return result
+        yield f"{extension} {option.split('_')[1]} {value}", {option: value}, encode
+
+
+def run_save_queue(frames, seconds, workdir, extension, max_workers=2):
+    """Stream frames through a SaveQueue for ``seconds``: saved per second and submit-to-written latency.
+
+    Back-pressure kicks in at four pending frames, so latency reflects a
+    short queue rather than however much memory the default bound allows.
+    """
+    outdir = tempfile.mkdtemp(dir=workdir)
+    queue = SaveQueue(max_workers=max_workers, max_pending_bytes=4 * frames[0].nbytes)
+    latencies = []
+    lock = threading.Lock()
+
+    def done(job):
+        with lock:
+            latencies.append((time.time() - job.submitted) * 1000)
+            if job.error is None:
+                os.remove(job.path)
+
+    METRICS.reset()
+    submitted = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    while time.perf_counter() - wall_start < seconds:
+        path = os.path.join(outdir, f"frame_{submitted:06d}.{extension}")
+        queue.submit(frames[submitted % len(frames)], path, on_done=done)
+        submitted += 1
+    queue.wait()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    stats = queue.stats()
+    queue.shutdown()
+    os.rmdir(outdir)
+
+    result = summarize(latencies)
+    result['per_s'] = submitted / wall
+    result['cpu_cores'] = cpu / wall
+    result['failed'] = stats.get('failed', 0)
+    result['stages'] = stage_summary()
+    return result
+
+
+def bench_save(size, frames, seconds, workdir):
+    for extension in ('jpg', 'png'):
+        yield (f"save queue, {extension}", {'workers': 2},
+               lambda e=extension: run_save_queue(frames, seconds, workdir, e))
+
+
+BENCHMARKS = {
+    'capture': bench_capture,
+    'copy': bench_copy,
+    'convert': bench_convert,
+    'preview': bench_preview,
+    'encode': bench_encode,
+    'save': bench_save,
+}
+
+
+def machine_info():
+    """What a result depends on besides the code: hardware, OS and library versions"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+        'cpu_features': cv2.getCPUFeaturesLine() if hasattr(cv2, 'getCPUFeaturesLine') else None,
+        'numpy': np.__version__,
+        'git_commit': commit,
+    }
+
+
+def format_result(result):
+    line = f"{result['group']:<8} {result['name']:<32} {result['size']:>6} {result['per_s']:>9.1f}/s"
+    line += f"  p50 {result['p50_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms  cpu {result['cpu_cores']:>4.2f}"
+    if 'alloc_peak_bytes' in result:
+        line += f"  alloc {result['alloc_peak_bytes'] / 1024:>8.0f} KiB"
+    if 'bytes' in result:
+        line += f"  {result['bytes'] / 1024:>7.0f} KiB out"
+    return line
+
+
+def run(groups, sizes, seconds, report=print):
+    """Run the selected benchmark groups at each size; returns the list of results"""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="capture_bench_") as workdir:
+        for size in sizes:
+            frames = synthetic_frames(*RESOLUTIONS[size])
+            for group in groups:
+                for name, params, bench in BENCHMARKS[group](size, frames, seconds, workdir):
+                    try:
+                        result = bench()
+                    except Exception as e:
+                        report(f"{group:<8} {name:<32} {size:>6} failed: {e}")
+                        continue
+                    result = dict(group=group, name=name, size=size, params=params, **result)
+                    results.append(result)
+                    report(format_result(result))
+    return results
+
+
+def result_key(result):
+    return result['group'], result['name'], result['size']
+
+
+def previous_run(results_dir):
+    runs = sorted(glob.glob(os.path.join(results_dir, "*.json")))
+    return runs[-1] if runs else None
+
+
+def compare(baseline, current, report=print):
+    """Report throughput and latency changes of every benchmark present in both runs"""
+    if baseline['machine'] != current['machine']:
+        changed = [key for key in current['machine'] if baseline['machine'].get(key) != current['machine'][key]]
+        report(f"Note: machine or libraries differ from the baseline ({', '.join(changed)})")
+    old = {result_key(r): r for r in baseline['results']}
+    report(f"{'group':<8} {'benchmark':<32} {'size':>6} {'per second':>22} {'p50 ms':>22} {'p99 ms':>22}")
+
+    def change(before, after):
+        pct = (after - before) / before * 100 if before else 0.0
+        return f"{before:>7.1f} {after:>7.1f} {pct:>+5.0f}%"
+
+    for result in current['results']:
+        before = old.get(result_key(result))
+        if before is None:
+            continue
+        report(f"{result['group']:<8} {result['name']:<32} {result['size']:>6} "
+               f"{change(before['per_s'], result['per_s']):>22} "
+               f"{change(before['p50_ms'], result['p50_ms']):>22} "
+               f"{change(before['p99_ms'], result['p99_ms']):>22}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark capture, preview and save paths on synthetic sources")
+    parser.add_argument("--only", default=None,
+                        help=f"comma-separated groups to run (default: all of {','.join(GROUPS)})")
+    parser.add_argument("--sizes", default=None,
+                        help=f"comma-separated resolutions (default: all of {','.join(RESOLUTIONS)})")
+    parser.add_argument("--seconds", type=float, default=None, help="time per benchmark (default 2, 0.5 with --quick)")
+    parser.add_argument("--quick", action="store_true", help="short runs, and no 4K unless --sizes asks for it")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="OpenCV worker threads (default: what the app uses, see frame_format.configure_threads)")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="where runs are stored")
+    parser.add_argument("--no-save", action="store_true", help="don't store this run")
+    parser.add_argument("--compare", nargs="?", const="previous", default=None, metavar="RUN",
+                        help="compare with a stored run (default: the most recent one)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    groups = args.only.split(",") if args.only else GROUPS
+    if args.sizes:
+        sizes = args.sizes.lower().split(",")
+    else:
+        sizes = [size for size in RESOLUTIONS if not (args.quick and size == '4k')]
+    unknown = [name for name in groups if name not in BENCHMARKS] + [size for size in sizes if size not in RESOLUTIONS]
+    if unknown:
+        parser.error(f"unknown group or size: {', '.join(unknown)}")
+    seconds = args.seconds if args.seconds is not None else (0.5 if args.quick else 2.0)
+
+    baseline_path = None
+    if args.compare:
+        baseline_path = previous_run(args.results_dir) if args.compare == "previous" else args.compare
+        if baseline_path is None or not os.path.exists(baseline_path):
+            print(f"No stored run to compare with in {args.results_dir}", file=sys.stderr)
+            return 1
+
+    frame_format.configure_threads(args.threads)
+    machine = machine_info()
+    print(f"OpenCV {machine['opencv']} ({machine['opencv_threads']} threads), NumPy {machine['numpy']}, "
+          f"{machine['cpu_count']} CPUs, {machine['platform']}")
+    current = {
+        'timestamp': time.time(),
+        'machine': machine,
+        'settings': {'groups': groups, 'sizes': sizes, 'seconds': seconds},
+        'results': run(groups, sizes, seconds),
+    }
+
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        path = os.path.join(args.results_dir, time.strftime("%Y%m%d_%H%M%S") + ".json")
+        with open(path, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Results stored in {path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {baseline_path}:")
+        compare(baseline, current)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
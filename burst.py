@@ -0,0 +1,234 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from metrics import METRICS
+
+
+class FramePool:
+    """A fixed set of preallocated frame buffers handed out and returned"""
+
+    def __init__(self, shape, dtype=np.uint8, count=32):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.count = count
+        self._free = queue.Queue()
+        for _ in range(count):
+            self._free.put(np.empty(self.shape, self.dtype))
+
+    def fits(self, frame):
+        return frame.shape == self.shape and frame.dtype == self.dtype
+
+    def acquire(self, timeout=None):
+        """Take a free buffer, waiting up to ``timeout`` seconds; None if none freed up"""
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, buf):
+        self._free.put(buf)
+
+    @property
+    def available(self):
+        return self._free.qsize()
+
+
+class CaptureRun:
+    """Base class for burst and interval captures that stream pool buffers to a SaveQueue"""
+
+    def __init__(self, grabber, pool, save_queue, output_dir, extension="jpg", prefix="capture", source=None):
+        self.grabber = grabber
+        self.pool = pool
+        self.save_queue = save_queue
+        self.output_dir = output_dir
+        self.extension = extension
+        self.source = source
+        self.prefix = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}"
+
+        self.is_running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+        # Stats
+        self.captured = 0
+        self.written = 0
+        self.failed = 0
+        self.missed = 0  # frames lost to a full pool or already overwritten in the grabber
+        self.started = 0.0
+        self.finished = 0.0
+
+    def start(self):
+        self.is_running = True
+        self.started = time.time()
+        self.thread = threading.Thread(target=self._run_wrapper, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run_wrapper(self):
+        try:
+            self.run()
+        except Exception as e:
+            print(f"Error in {type(self).__name__}: {e}")
+        self.finished = time.time()
+        self.is_running = False
+
+    def run(self):
+        raise NotImplementedError
+
+    def _submit(self, buf, timestamp):
+        """Hand a filled pool buffer to the save queue; it returns to the pool once written"""
+        stamp = datetime.fromtimestamp(timestamp).strftime("%H%M%S_%f")[:-3]
+        path = os.path.join(self.output_dir, f"{self.prefix}_{self.captured:05d}_{stamp}.{self.extension}")
+
+        def done(job):
+            self.pool.release(buf)
+            with self._lock:
+                if job.error is None:
+                    self.written += 1
+                else:
+                    self.failed += 1
+
+        self.captured += 1
+        self.save_queue.submit(buf, path, on_done=done, source=self.source)
+
+    def elapsed(self):
+        end = self.finished or time.time()
+        return max(1e-6, end - self.started) if self.started else 0.0
+
+    def requested_rate(self):
+        raise NotImplementedError
+
+    def stats(self):
+        elapsed = self.elapsed()
+        return {
+            'captured': self.captured,
+            'written': self.written,
+            'failed': self.failed,
+            'missed': self.missed,
+            'requested_fps': self.requested_rate(),
+            'achieved_fps': self.captured / elapsed if elapsed else 0.0,
+            'written_fps': self.written / elapsed if elapsed else 0.0,
+            'pool_free': self.pool.available,
+            'running': self.is_running,
+        }
+
+
+class BurstCapture(CaptureRun):
+    """Captures ``count`` consecutive frames at the full rate of the grabber"""
+
+    def __init__(self, grabber, pool, save_queue, output_dir, count, **kwargs):
+        kwargs.setdefault("prefix", "burst")
+        super().__init__(grabber, pool, save_queue, output_dir, **kwargs)
+        self.count = count
+        # What the grabber delivers until the burst has measured it itself
+        self.source_fps = grabber.fps or grabber.nominal_fps
+
+    def requested_rate(self):
+        return self.source_fps
+
+    def _measure_rate(self, first_seq):
+        elapsed = self.elapsed()
+        # Too few frames in to beat the grabber's own estimate
+        if elapsed >= 0.5:
+            self.source_fps = (self.grabber.seq - first_seq) / elapsed
+
+    def run(self):
+        self.source_fps = self.grabber.fps or self.grabber.nominal_fps or self.source_fps
+        last_seq = self.grabber.seq
+        # Frames that arrive during the burst, counted to measure the source rate
+        first_seq = last_seq
+        while self.captured < self.count and not self._stop_event.is_set():
+            seq = self.grabber.wait_for_frame(last_seq, timeout=1.0)
+            if seq == last_seq:
+                if not self.grabber.is_running:
+                    break
+                continue
+
+            for s in range(last_seq + 1, seq + 1):
+                if self.captured >= self.count:
+                    break
+                buf = self.pool.acquire(timeout=0.5)
+                if buf is None:
+                    self.missed += 1
+                    METRICS.count('capture_missed')
+                    continue
+                timestamp = self.grabber.copy_frame(s, buf)
+                if timestamp is None:
+                    # Overwritten in the grabber's ring before we got to it
+                    self.pool.release(buf)
+                    self.missed += 1
+                    METRICS.count('capture_missed')
+                    continue
+                self._submit(buf, timestamp)
+            last_seq = seq
+            self._measure_rate(first_seq)
+
+        self._measure_rate(first_seq)
+
+
+class IntervalCapture(CaptureRun):
+    """Captures one frame every ``interval`` seconds until stopped or ``count`` is reached.
+
+    With ``changed_since`` (a screen source's ``changed_since``) a frame is
+    only saved if the source changed after the last saved one.
+    """
+
+    def __init__(self, grabber, pool, save_queue, output_dir, interval, count=None, changed_since=None, **kwargs):
+        kwargs.setdefault("prefix", "timelapse")
+        super().__init__(grabber, pool, save_queue, output_dir, **kwargs)
+        self.interval = interval
+        self.count = count
+        self.changed_since = changed_since
+        self.late = 0  # captures that ran later than half an interval
+        self.unchanged = 0  # frames not saved because nothing changed
+        self._last_saved = None
+
+    def requested_rate(self):
+        return 1.0 / self.interval
+
+    def run(self):
+        deadline = time.time()
+        while not self._stop_event.is_set():
+            if self.count is not None and self.captured >= self.count:
+                break
+            if time.time() - deadline > self.interval / 2:
+                self.late += 1
+
+            buf = self.pool.acquire(timeout=self.interval)
+            if buf is None:
+                self.missed += 1
+                METRICS.count('capture_missed')
+            else:
+                seq, timestamp, frame = self.grabber.latest(buf)
+                if seq == 0 or frame is not buf:
+                    self.pool.release(buf)
+                    self.missed += 1
+                    METRICS.count('capture_missed')
+                elif (self.changed_since is not None and self._last_saved is not None
+                      and not self.changed_since(self._last_saved)):
+                    self.pool.release(buf)
+                    self.unchanged += 1
+                else:
+                    self._submit(buf, timestamp)
+                    self._last_saved = timestamp
+
+            # Schedule against absolute deadlines so the cadence doesn't drift
+            deadline += self.interval
+            if time.time() - deadline > self.interval:
+                # Fell more than a whole interval behind; skip ahead instead of bursting
+                deadline = time.time()
+            self._stop_event.wait(max(0.0, deadline - time.time()))
+
+    def stats(self):
+        stats = super().stats()
+        stats['late'] = self.late
+        stats['unchanged'] = self.unchanged
+        return stats
@@ -0,0 +1,232 @@
+import glob
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import cv2
+
+from camera_modes import list_modes
+
+# Per-user cache directory shared by the app's on-disk caches
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".smart_capture")
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "cameras.json")
+
+# Without device nodes a working index is trusted for this long after its last probe
+KNOWN_GOOD_TTL = 24 * 3600
+
+# A failed probe is trusted only briefly: a busy or slow camera fails without its node changing
+FAILED_TTL = 5 * 60
+
+
+def probe_camera(index, backend=cv2.CAP_ANY):
+    """Open a camera index and read one frame; return a result dict"""
+    result = {'index': index, 'ok': False, 'backend': None, 'width': 0, 'height': 0}
+    cap = cv2.VideoCapture(index, backend)
+    try:
+        if cap.isOpened():
+            result['backend'] = cap.getBackendName()
+            ret, frame = cap.read()
+            if ret and frame is not None:
+                result['ok'] = True
+                result['height'], result['width'] = frame.shape[:2]
+    finally:
+        cap.release()
+    return result
+
+
+class CameraDiscovery:
+    """Finds USB cameras by probing candidate indices concurrently.
+
+    Results are cached on disk keyed by ``/dev/video*`` node (or index on
+    platforms without device nodes) and backend, so known-good devices are
+    reported without reopening them and, on Linux, nodes that failed before
+    are skipped for ``failed_ttl`` seconds, or until the node itself changes.
+    On Windows and macOS, where there is no node to watch, a working index
+    is trusted for ``trust_ttl`` seconds or until ``forget`` reports that
+    opening it failed. Working
+    devices also carry their native capture modes (see camera_modes) under
+    'modes'.
+    """
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, max_index=10, backend=cv2.CAP_ANY, max_workers=8,
+                 trust_ttl=KNOWN_GOOD_TTL, failed_ttl=FAILED_TTL):
+        self.cache_path = cache_path
+        self.max_index = max_index
+        self.backend = backend
+        self.max_workers = max_workers
+        self.trust_ttl = trust_ttl
+        self.failed_ttl = failed_ttl
+        self._lock = threading.Lock()
+        self.cache = self._load_cache()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with self._lock:
+                data = json.dumps(self.cache, indent=2)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Error saving camera cache: {e}")
+
+    def candidates(self):
+        """Return [(index, node)] of camera indices worth probing"""
+        nodes = glob.glob("/dev/video*")
+        if nodes:
+            found = []
+            for node in nodes:
+                match = re.match(r"/dev/video(\d+)$", node)
+                if match:
+                    found.append((int(match.group(1)), node))
+            return sorted(found)
+        return [(i, None) for i in range(self.max_index)]
+
+    @staticmethod
+    def _node_stamp(node):
+        try:
+            return os.stat(node).st_ctime
+        except OSError:
+            return None
+
+    def _cache_key(self, index, node, backend):
+        return f"{node or f'index:{index}'}|{backend or 'ANY'}"
+
+    def cached_devices(self):
+        """Return cached known-good devices that still exist, without probing"""
+        devices = []
+        present = {index: node for index, node in self.candidates()}
+        for entry in self.cache.values():
+            if not entry.get('ok'):
+                continue
+            if entry['node'] is not None and present.get(entry['index']) != entry['node']:
+                continue
+            devices.append(entry)
+        return sorted(devices, key=lambda e: e['index'])
+
+    def modes(self, index):
+        """Native modes of camera ``index``, from the cache when its node hasn't changed"""
+        node = dict(self.candidates()).get(index)
+        with self._lock:
+            entry = self._cached_entry(index, node)
+        if entry is not None and 'modes' in entry and (node is None or entry.get('stamp') == self._node_stamp(node)):
+            return entry['modes']
+        modes = list_modes(index)
+        if entry is not None:
+            with self._lock:
+                entry['modes'] = modes
+            self._save_cache()
+        return modes
+
+    def _cached_entry(self, index, node):
+        for entry in self.cache.values():
+            if entry['index'] == index and entry['node'] == node:
+                return entry
+        return None
+
+    def _trusted(self, entry, node, now):
+        """Whether a cached verdict can stand in for a probe"""
+        if node is not None:
+            # Node unchanged since the last probe, and a failure still recent
+            if entry.get('stamp') != self._node_stamp(node):
+                return False
+            return entry['ok'] or now - entry.get('last_seen', 0) < self.failed_ttl
+        # Index-keyed: only known-good devices, and not forever
+        return entry['ok'] and now - entry.get('last_seen', 0) < self.trust_ttl
+
+    def forget(self, index):
+        """Drop cached verdicts for camera ``index``, e.g. after opening it failed, so it is probed again"""
+        with self._lock:
+            keys = [k for k, e in self.cache.items() if e['index'] == index]
+            for key in keys:
+                del self.cache[key]
+        if keys:
+            self._save_cache()
+
+    def _record(self, result, node):
+        entry = dict(result, node=node, stamp=self._node_stamp(node) if node else None,
+                     last_seen=time.time())
+        with self._lock:
+            # One entry per device: drop verdicts recorded under another backend
+            for key in [k for k, e in self.cache.items() if e['index'] == result['index'] and e['node'] == node]:
+                del self.cache[key]
+            self.cache[self._cache_key(result['index'], node, result['backend'])] = entry
+        return entry
+
+    def discover(self, on_result=None, per_device_timeout=3.0, deadline=6.0, force=False, retry_failed=False):
+        """Probe candidates in parallel and return the list of working devices.
+
+        ``on_result(entry)`` is called from the probing thread as soon as each
+        working device is known. Devices that don't answer within
+        ``per_device_timeout`` seconds, or before the overall ``deadline``,
+        are abandoned. ``force`` probes everything again; ``retry_failed``
+        only the devices that failed before, keeping known-good ones cached.
+        """
+        start = time.time()
+        found = []
+        to_probe = []
+
+        for index, node in self.candidates():
+            entry = None if force else self._cached_entry(index, node)
+            if entry is not None and (entry['ok'] or not retry_failed) and self._trusted(entry, node, start):
+                if entry['ok']:
+                    found.append(entry)
+                    if on_result:
+                        on_result(entry)
+                continue
+            to_probe.append((index, node))
+
+        if to_probe:
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(to_probe)))
+            started = {}
+
+            def run(index):
+                started[index] = time.time()
+                result = probe_camera(index, self.backend)
+                if result['ok']:
+                    result['modes'] = list_modes(index)
+                return result
+
+            futures = {executor.submit(run, index): (index, node) for index, node in to_probe}
+            pending = set(futures)
+            while pending:
+                now = time.time()
+                if now - start >= deadline:
+                    break
+                # Give up on probes that have been running too long
+                for future in list(pending):
+                    index = futures[future][0]
+                    if index in started and now - started[index] >= per_device_timeout:
+                        pending.discard(future)
+                if not pending:
+                    break
+
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, node = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Error probing camera {index}: {e}")
+                        continue
+                    entry = self._record(result, node)
+                    if entry['ok']:
+                        found.append(entry)
+                        if on_result:
+                            on_result(entry)
+
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        self._save_cache()
+        return sorted(found, key=lambda e: e['index'])
@@ -0,0 +1,262 @@
+"""Native capture modes of USB cameras, and picking the fastest one for a request.
+
+On Linux the modes come straight from the V4L2 driver (VIDIOC_ENUM_FMT,
+VIDIOC_ENUM_FRAMESIZES and VIDIOC_ENUM_FRAMEINTERVALS), which needs no
+capture stream, so probing takes a few milliseconds and works while another
+program is using the camera. Elsewhere no modes are known and cameras are
+asked for MJPG at the requested size, which nearly every UVC camera offers.
+"""
+import os
+import re
+import struct
+import threading
+
+import cv2
+
+# What a USB camera is asked for unless the user picks something else
+DEFAULT_REQUEST = (1280, 720, 30.0)
+
+# Offered in place of continuous or stepwise frame size and rate ranges
+COMMON_SIZES = [(640, 480), (800, 600), (1024, 768), (1280, 720), (1280, 960), (1600, 1200),
+                (1920, 1080), (2560, 1440), (3840, 2160)]
+COMMON_RATES = [120.0, 60.0, 30.0, 25.0, 20.0, 15.0, 10.0, 5.0]
+
+
+def _ioc(direction, number, size):
+    return (direction << 30) | (size << 16) | (ord('V') << 8) | number
+
+
+_READ, _WRITE = 2, 1
+VIDIOC_QUERYCAP = _ioc(_READ, 0, 104)
+VIDIOC_ENUM_FMT = _ioc(_READ | _WRITE, 2, 64)
+VIDIOC_ENUM_FRAMESIZES = _ioc(_READ | _WRITE, 74, 44)
+VIDIOC_ENUM_FRAMEINTERVALS = _ioc(_READ | _WRITE, 75, 52)
+
+# struct v4l2_capability, v4l2_fmtdesc, v4l2_frmsizeenum, v4l2_frmivalenum
+_CAPABILITY = struct.Struct('=16s32s32sIII3I')
+_FMTDESC = struct.Struct('=III32sII3I')
+_FRMSIZE = struct.Struct('=III6I2I')
+_FRMIVAL = struct.Struct('=5I6I2I')
+
+_BUF_TYPE_VIDEO_CAPTURE = 1
+_CAP_VIDEO_CAPTURE = 0x1
+_CAP_DEVICE_CAPS = 0x80000000
+_FMT_FLAG_COMPRESSED = 0x1
+_DISCRETE = 1
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def fourcc_code(fourcc):
+    return cv2.VideoWriter_fourcc(*fourcc)
+
+
+def fourcc_name(code):
+    code = int(code)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+
+
+def device_node(index):
+    """The /dev/video node OpenCV opens for a camera index, or None"""
+    node = f"/dev/video{index}"
+    return node if os.path.exists(node) else None
+
+
+def _ioctl(fd, request, layout, *fields):
+    """Run an ioctl on a packed struct and return the unpacked result, or None on EINVAL"""
+    import fcntl
+    buf = bytearray(layout.pack(*fields))
+    try:
+        fcntl.ioctl(fd, request, buf, True)
+    except OSError:
+        # EINVAL ends every V4L2 enumeration
+        return None
+    return layout.unpack(buf)
+
+
+def _frame_sizes(fd, pixelformat):
+    sizes = []
+    index = 0
+    while True:
+        result = _ioctl(fd, VIDIOC_ENUM_FRAMESIZES, _FRMSIZE, index, pixelformat, 0, *([0] * 8))
+        if result is None:
+            return sizes
+        size_type, values = result[2], result[3:9]
+        if size_type == _DISCRETE:
+            sizes.append((values[0], values[1]))
+        else:
+            # Continuous or stepwise range: offer the usual sizes that fall on it
+            min_w, max_w, step_w, min_h, max_h, step_h = values
+            sizes.extend((w, h) for w, h in COMMON_SIZES
+                         if min_w <= w <= max_w and min_h <= h <= max_h
+                         and (w - min_w) % max(1, step_w) == 0 and (h - min_h) % max(1, step_h) == 0)
+            return sizes
+        index += 1
+
+
+def _frame_rates(fd, pixelformat, width, height):
+    rates = []
+    index = 0
+    while True:
+        result = _ioctl(fd, VIDIOC_ENUM_FRAMEINTERVALS, _FRMIVAL, index, pixelformat, width, height, 0,
+                        *([0] * 8))
+        if result is None:
+            break
+        interval_type, values = result[4], result[5:11]
+        if interval_type == _DISCRETE:
+            if values[0]:
+                rates.append(values[1] / values[0])
+        else:
+            # Range of intervals: its fastest rate plus the usual ones inside it
+            min_num, min_den, max_num, max_den = values[:4]
+            fastest = min_den / min_num if min_num else 0.0
+            slowest = max_den / max_num if max_num else 0.0
+            rates.append(fastest)
+            rates.extend(rate for rate in COMMON_RATES if slowest <= rate < fastest)
+            break
+        index += 1
+    return sorted({round(rate, 3) for rate in rates}, reverse=True)
+
+
+def query_v4l2_modes(node):
+    """Every (format, size, rates) combination a V4L2 capture device offers.
+
+    Returns a list of dicts with 'fourcc', 'description', 'compressed',
+    'width', 'height' and 'rates' (frames per second, fastest first).
+    Nodes that aren't capture devices (e.g. UVC metadata nodes) have none.
+    """
+    fd = os.open(node, os.O_RDWR | os.O_NONBLOCK)
+    try:
+        capability = _ioctl(fd, VIDIOC_QUERYCAP, _CAPABILITY, *([b''] * 3 + [0] * 6))
+        if capability is None:
+            return []
+        capabilities, device_caps = capability[4], capability[5]
+        caps = device_caps if capabilities & _CAP_DEVICE_CAPS else capabilities
+        if not caps & _CAP_VIDEO_CAPTURE:
+            return []
+
+        modes = []
+        index = 0
+        while True:
+            fmt = _ioctl(fd, VIDIOC_ENUM_FMT, _FMTDESC, index, _BUF_TYPE_VIDEO_CAPTURE, 0, b'', 0, 0, 0, 0, 0)
+            if fmt is None:
+                break
+            flags, description, pixelformat = fmt[2], fmt[3], fmt[4]
+            for width, height in _frame_sizes(fd, pixelformat):
+                modes.append({
+                    'fourcc': fourcc_name(pixelformat),
+                    'description': description.split(b'\0', 1)[0].decode('ascii', 'replace'),
+                    'compressed': bool(flags & _FMT_FLAG_COMPRESSED),
+                    'width': width,
+                    'height': height,
+                    'rates': _frame_rates(fd, pixelformat, width, height),
+                })
+            index += 1
+        return modes
+    finally:
+        os.close(fd)
+
+
+def list_modes(index):
+    """Cached native modes of USB camera ``index``; [] where they can't be queried.
+
+    Entries are keyed by the device node's ctime, so re-plugging a different
+    camera into the same node probes it again.
+    """
+    node = device_node(index)
+    if node is None:
+        return []
+    try:
+        key = (node, os.stat(node).st_ctime)
+    except OSError:
+        return []
+    with _cache_lock:
+        if key in _cache:
+            return _cache[key]
+    try:
+        modes = query_v4l2_modes(node)
+    except (OSError, ImportError) as e:
+        print(f"Could not query modes of {node}: {e}")
+        modes = []
+    with _cache_lock:
+        _cache[key] = modes
+    return modes
+
+
+def pick_mode(modes, width=DEFAULT_REQUEST[0], height=DEFAULT_REQUEST[1], fps=DEFAULT_REQUEST[2]):
+    """The fastest mode of at least ``width`` x ``height``, or None if ``modes`` is empty.
+
+    Modes that reach ``fps`` beat those that don't. Among those, the smallest
+    frame that still meets the requested size wins (less to move over USB,
+    decode and copy), then uncompressed formats, which skip JPEG decoding,
+    then the highest rate. If no mode is big enough the largest ones compete.
+    Returns a dict with 'fourcc', 'width', 'height' and the chosen 'fps'.
+    """
+    modes = [mode for mode in modes if mode['rates']]
+    if not modes:
+        return None
+    candidates = [mode for mode in modes if mode['width'] >= width and mode['height'] >= height]
+    if not candidates:
+        largest = max(mode['width'] * mode['height'] for mode in modes)
+        candidates = [mode for mode in modes if mode['width'] * mode['height'] == largest]
+
+    def rank(mode):
+        fastest = mode['rates'][0]
+        return -min(fastest, fps), mode['width'] * mode['height'], mode['compressed'], -fastest
+
+    mode = min(candidates, key=rank)
+    # The slowest rate that still meets the request, so the camera isn't run faster than needed
+    rate = min((rate for rate in mode['rates'] if rate >= fps), default=mode['rates'][0])
+    return {'fourcc': mode['fourcc'], 'width': mode['width'], 'height': mode['height'], 'fps': rate}
+
+
+def choose_mode(index, width=DEFAULT_REQUEST[0], height=DEFAULT_REQUEST[1], fps=DEFAULT_REQUEST[2]):
+    """The mode to request from USB camera ``index``: the best native one, else MJPG at the request"""
+    mode = pick_mode(list_modes(index), width, height, fps)
+    if mode is None:
+        mode = {'fourcc': 'MJPG', 'width': width, 'height': height, 'fps': fps}
+    return mode
+
+
+def apply_mode(cap, mode):
+    """Ask an open capture for ``mode``; returns what was actually negotiated"""
+    # Format first: V4L2 validates the size and rate against the current format
+    if mode.get('fourcc'):
+        cap.set(cv2.CAP_PROP_FOURCC, fourcc_code(mode['fourcc']))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, mode['width'])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, mode['height'])
+    if mode.get('fps'):
+        cap.set(cv2.CAP_PROP_FPS, mode['fps'])
+    return negotiated_mode(cap)
+
+
+def negotiated_mode(cap):
+    """The format, size and rate an open capture is actually delivering"""
+    return {
+        'fourcc': fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)),
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'fps': float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+    }
+
+
+def describe_mode(mode):
+    """Short label such as 'MJPG 1280x720 @ 30 fps'"""
+    fps = mode.get('fps')
+    label = f"{mode['fourcc'] or '?'} {mode['width']}x{mode['height']}".strip()
+    return f"{label} @ {fps:g} fps" if fps else label
+
+
+def parse_mode(text):
+    """Parse '[FOURCC:]WIDTHxHEIGHT[@FPS]' into a request dict (fourcc None if not given)"""
+    match = re.fullmatch(r"(?:([A-Za-z0-9 ]{4}):)?(\d+)x(\d+)(?:@(\d+(?:\.\d+)?))?", text.strip())
+    if not match:
+        raise ValueError(f"Invalid mode '{text}', expected e.g. 1920x1080@30 or MJPG:1920x1080@30")
+    fourcc, width, height, fps = match.groups()
+    return {
+        'fourcc': fourcc.upper() if fourcc else None,
+        'width': int(width),
+        'height': int(height),
+        'fps': float(fps) if fps else DEFAULT_REQUEST[2],
+    }
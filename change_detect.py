@@ -0,0 +1,94 @@
+import numpy as np
+import cv2
+
+
+class ChangeResult:
+    """Which tiles of a frame changed compared with the previous one"""
+
+    def __init__(self, tiles, tile_size, frame_size):
+        self.tiles = tiles  # bool array, one entry per tile (rows x columns)
+        self.tile_size = tile_size
+        self.frame_size = frame_size  # (width, height)
+
+    @property
+    def changed(self):
+        return bool(self.tiles.any())
+
+    @property
+    def fraction(self):
+        return float(self.tiles.mean()) if self.tiles.size else 0.0
+
+    def rects(self):
+        """Changed area as (x, y, width, height) rectangles in frame pixels.
+
+        Horizontal runs of changed tiles in each tile row are merged, which
+        keeps the list short for the typical case of a few busy regions.
+        """
+        width, height = self.frame_size
+        tile = self.tile_size
+        rects = []
+        for row in range(self.tiles.shape[0]):
+            line = self.tiles[row]
+            column = 0
+            while column < len(line):
+                if not line[column]:
+                    column += 1
+                    continue
+                start = column
+                while column < len(line) and line[column]:
+                    column += 1
+                x, y = start * tile, row * tile
+                rects.append((x, y, min(column * tile, width) - x, min(y + tile, height) - y))
+        return rects
+
+
+class ChangeDetector:
+    """Compares downsampled tile signatures of consecutive frames.
+
+    Each frame is reduced by roughly ``step`` in both directions with a
+    bilinear resize (which averages a 2x2 neighbourhood per sample and is far
+    cheaper than INTER_AREA), giving ``tile_size // step`` samples along each
+    side of a tile. A tile counts as changed when any of its samples differs
+    by more than ``threshold`` in any channel.
+    """
+
+    def __init__(self, tile_size=64, step=4, threshold=6):
+        self.tile_size = tile_size
+        self.samples = max(1, tile_size // step)
+        self.threshold = threshold
+        self._previous = None
+        self._current = None
+        self._diff = None
+        self._grid = None
+
+    def reset(self):
+        self._previous = None
+
+    def update(self, frame):
+        """Compare a frame with the last one passed in; returns a ChangeResult"""
+        height, width = frame.shape[:2]
+        columns = -(-width // self.tile_size)
+        rows = -(-height // self.tile_size)
+        small_size = (columns * self.samples, rows * self.samples)
+
+        if self._grid != (rows, columns, frame.shape[2:]):
+            # New geometry: everything counts as changed
+            self._grid = (rows, columns, frame.shape[2:])
+            self._previous = None
+            shape = (small_size[1], small_size[0]) + frame.shape[2:]
+            self._current = np.empty(shape, np.uint8)
+            self._diff = np.empty(shape, np.uint8)
+
+        cv2.resize(frame, small_size, dst=self._current, interpolation=cv2.INTER_LINEAR)
+        if self._previous is None:
+            tiles = np.ones((rows, columns), bool)
+            self._previous = self._current.copy()
+        else:
+            cv2.absdiff(self._current, self._previous, dst=self._diff)
+            # Fold channels into the sample axis so one reduction covers everything
+            per_tile = self._diff.reshape(rows, self.samples, columns, -1).max(axis=(1, 3))
+            tiles = per_tile > self.threshold
+            # Swap buffers so the current signature becomes the reference
+            self._previous, self._current = self._current, self._previous
+
+        return ChangeResult(tiles, self.tile_size, (width, height))
@@ -0,0 +1,199 @@
+"""Headless capture from the command line.
+
+Examples:
+    python cli.py 0 -n 10 -r 2 -o shots          # 10 frames from USB camera 0, 2 per second
+    python cli.py http://phone:8080/video -n 50    # burst of 50 consecutive frames
+    python cli.py screen:Firefox -n 5 -r 0.5 -f png
+    python cli.py screen -n 100 -r 0.2 --skip-unchanged  # screen timelapse of frames that changed
+    python cli.py 0 --mode MJPG:1920x1080@30       # a specific native camera mode
+    python cli.py 0 -n 20 --no-index               # skip the capture library
+    python cli.py 0 --serve 8090                   # share camera 0 at http://localhost:8090/video
+    python cli.py 0 -n 600 --raw                   # 600 consecutive lossless frames to a spool file
+    python cli.py --list-windows
+
+Nothing here imports tkinter or PIL.ImageTk, so it runs without a display
+(screen sources still need one to grab from).
+"""
+import argparse
+import sys
+import time
+
+from camera_modes import choose_mode, describe_mode, parse_mode
+from engine import CaptureEngine, parse_source
+from frame_format import configure_threads
+from metrics import METRICS
+from saver import FORMATS
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Capture frames from a camera, stream or screen without the GUI")
+    parser.add_argument("source", nargs="?",
+                        help="USB camera index, stream URL, 'screen' or 'screen:<window title>'")
+    parser.add_argument("-n", "--count", type=int, default=1, help="number of frames to save (default 1)")
+    parser.add_argument("-r", "--rate", type=float, default=None,
+                        help="frames per second to save; omit to save consecutive frames at the source rate")
+    parser.add_argument("-o", "--output", default="Captured_Images", help="output directory")
+    parser.add_argument("-f", "--format", default="jpg", choices=sorted(ext.lstrip('.') for ext in FORMATS),
+                        help="image format")
+    parser.add_argument("-q", "--quality", type=int, default=None, help="JPEG/WebP quality (1-100)")
+    parser.add_argument("--prefix", default=None, help="filename prefix")
+    parser.add_argument("--mode", default=None, metavar="[FOURCC:]WxH[@FPS]",
+                        help="USB camera mode; without FOURCC the fastest native mode at least that big is used "
+                             "(default 1280x720@30)")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="with --rate on a screen source, don't save frames identical to the last one saved")
+    parser.add_argument("--stats", metavar="PATH", default=None,
+                        help="write per-stage timings to PATH (.json or .csv) when done")
+    parser.add_argument("--no-index", action="store_true",
+                        help="don't add saved frames to the capture library (thumbnails, near-duplicate flags)")
+    parser.add_argument("--raw", action="store_true",
+                        help="copy consecutive frames uncompressed into one spool file instead of saving images; "
+                             "convert it afterwards with spool.py export")
+    parser.add_argument("--serve", metavar="[HOST:]PORT", default=None,
+                        help="re-serve the source as MJPEG (/video) and snapshots (/snapshot) until interrupted, "
+                             "instead of saving frames; HOST defaults to 127.0.0.1")
+    parser.add_argument("--list-windows", action="store_true", help="list capturable windows and exit")
+    parser.add_argument("--list-cameras", action="store_true", help="probe USB cameras and exit")
+    return parser
+
+
+def list_windows():
+    from screen_grab import list_windows as enumerate_windows
+    for window in enumerate_windows():
+        print(window['title'])
+    return 0
+
+
+def list_cameras():
+    from camera_discovery import CameraDiscovery
+    discovery = CameraDiscovery()
+    devices = discovery.discover()
+    for device in devices:
+        print(f"{device['index']}: {device['width']}x{device['height']} ({device.get('backend') or 'unknown backend'})")
+        for mode in discovery.modes(device['index']):
+            rates = ", ".join(f"{rate:g}" for rate in mode['rates'])
+            print(f"    {mode['fourcc']} {mode['width']}x{mode['height']} @ {rates} fps")
+    if not devices:
+        print("No USB cameras detected", file=sys.stderr)
+    return 0
+
+
+def parse_address(text):
+    """Split ``[HOST:]PORT`` into (host, port)"""
+    host, _, port = text.rpartition(":")
+    try:
+        return host or "127.0.0.1", int(port)
+    except ValueError:
+        raise ValueError(f"Invalid address: {text!r} (expected [HOST:]PORT)") from None
+
+
+def serve(engine):
+    """Serve the open source until interrupted"""
+    server = engine.server
+    print(f"Serving {server.url}video (snapshots at {server.url}snapshot); Ctrl-C to stop")
+    try:
+        while engine.is_open:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    stats = server.stats()
+    print(f"Sent {stats['sent']} frame(s) to {stats['connections']} client(s), {stats['dropped']} dropped for slow "
+          f"readers, {stats['encoded']} encoded, {stats['passed_through']} passed through")
+    return 0
+
+
+def spool_frames(engine, count, output, prefix=None):
+    """Copy ``count`` consecutive frames into a spool file; returns an exit status"""
+    from spool import SpoolRecorder
+    engine.use_full_frames()
+    recorder = SpoolRecorder(engine.grabber, output, max_frames=count, prefix=prefix or "spool")
+    recorder.start()
+    try:
+        while recorder.is_running:
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        recorder.stop()
+        recorder.thread.join()
+    stats = recorder.stats()
+    print(f"Spooled {stats['recorded']} frame(s) to {recorder.path} ({stats['dropped']} dropped, "
+          f"{stats['fps']:.2f} FPS, {stats['bytes_written'] / 1e6:.1f} MB); "
+          f"export with: python spool.py export {recorder.path}")
+    return 0 if stats['recorded'] and recorder.error is None else 1
+
+
+def save_frames(engine, args):
+    """Save ``args.count`` frames as images, consecutively or at ``args.rate``; returns an exit status"""
+    run = engine.capture_series(args.count, args.rate, extension=args.format, prefix=args.prefix,
+                                skip_unchanged=args.skip_unchanged)
+    try:
+        while run.is_running:
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        run.stop()
+    engine.save_queue.wait()
+    stats = run.stats()
+    print(f"Saved {stats['written']} of {stats['captured']} frame(s) to {args.output} "
+          f"({stats['missed']} missed, {stats['failed']} failed, {stats['achieved_fps']:.2f} FPS)")
+    return 0 if stats['written'] and not stats['failed'] else 1
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.list_windows:
+        return list_windows()
+    if args.list_cameras:
+        return list_cameras()
+    if args.source is None:
+        build_parser().print_usage(sys.stderr)
+        return 2
+    if args.count < 1 or (args.rate is not None and args.rate <= 0):
+        print("Count and rate must be positive", file=sys.stderr)
+        return 2
+    try:
+        request = parse_mode(args.mode) if args.mode else None
+        address = parse_address(args.serve) if args.serve else None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    configure_threads()
+    library = None
+    if not args.no_index:
+        from library import CaptureLibrary
+        library = CaptureLibrary()
+    engine = CaptureEngine(output_dir=args.output, library=library)
+    if args.quality is not None:
+        quality = min(100, max(1, args.quality))
+        engine.save_queue.options.update({'jpeg_quality': quality, 'webp_quality': quality})
+
+    try:
+        source = parse_source(args.source)
+        mode = None
+        if request is not None and isinstance(source, int):
+            mode = request if request['fourcc'] else choose_mode(source, request['width'], request['height'],
+                                                                 request['fps'])
+        engine.open(source, mode)
+        if engine.mode is not None:
+            print(f"Camera {source}: {describe_mode(engine.mode)}")
+        if address is not None:
+            engine.serve(address[1], address[0])
+            status = serve(engine)
+        elif args.raw:
+            status = spool_frames(engine, args.count, args.output, args.prefix)
+        else:
+            status = save_frames(engine, args)
+    except Exception as e:
+        print(f"Capture failed: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        engine.shutdown()
+        if library is not None:
+            library.close()
+        # Every mode exports its timings, including failed runs
+        if args.stats:
+            METRICS.export(args.stats)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import os
+import time
+from datetime import datetime
+
+from burst import BurstCapture, FramePool, IntervalCapture
+from camera_modes import negotiated_mode
+from grabber import FrameGrabber
+from mjpeg import MJPEGCapture, pick_reduction
+from saver import FORMATS, SaveQueue
+from sessions import open_capture, source_name
+
+
+def parse_source(text):
+    """Turn a command-line source into something CaptureEngine.open accepts.
+
+    ``"0"`` is USB camera 0, ``"screen"`` the full screen, ``"screen:Title"``
+    the first window whose title matches, and anything else a stream URL.
+    """
+    text = str(text).strip()
+    if text.isdigit():
+        return int(text)
+    if text == "screen" or text.startswith("screen:"):
+        from screen_grab import find_window
+        title = text.partition(":")[2]
+        window_info = find_window(title)
+        if window_info is None:
+            raise ValueError(f"No window matching '{title}'")
+        return window_info
+    return text
+
+
+def timestamped_filename(prefix="capture", extension="jpg"):
+    # Milliseconds, so captures within the same second get different names
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+    return f"{prefix}_{timestamp}.{extension}"
+
+
+class CaptureEngine:
+    """Opens a source, grabs from it on a background thread and saves frames.
+
+    This is everything capture needs without a display: the Tk app drives
+    one engine and the command line drives another. Sources are a USB index,
+    a stream URL or a window info dict (see screen_grab.list_windows).
+    """
+
+    def __init__(self, output_dir="Captured_Images", save_queue=None, screen_fps=30, library=None):
+        self.output_dir = output_dir
+        self.save_queue = save_queue if save_queue is not None else SaveQueue(library=library)
+        self.screen_fps = screen_fps
+        self.source = None
+        self.cap = None
+        self.grabber = None
+        self.mode = None  # negotiated format, size and rate of a USB camera
+        self.server = None  # RestreamServer, while serving
+
+    @property
+    def is_open(self):
+        return self.grabber is not None and self.grabber.is_running
+
+    def open(self, source, mode=None):
+        """Open a source and start grabbing; returns the first frame.
+
+        ``mode`` applies to USB cameras (see camera_modes.choose_mode).
+        """
+        self.close()
+        if isinstance(source, dict):
+            # Screen capture behaves like a camera that grabs the selected window
+            from screen_grab import ScreenCapture
+            cap = ScreenCapture(source, fps=self.screen_fps)
+            ret, frame = cap.read()
+            if not ret:
+                cap.release()
+                raise Exception("Cannot capture the selected window")
+        else:
+            cap, frame = open_capture(source, mode)
+
+        self.cap = cap
+        self.mode = negotiated_mode(cap) if isinstance(source, int) else None
+        self.grabber = FrameGrabber(cap)
+        self.grabber.start(first_frame=frame)
+        self.source = source
+        if self.server is not None:
+            self.server.set_source(self.grabber, cap if isinstance(cap, MJPEGCapture) else None)
+        return frame
+
+    def close(self):
+        """Stop grabbing and release the source"""
+        if self.server is not None:
+            self.server.set_source(None)
+        if self.grabber is not None:
+            self.grabber.stop()
+        elif self.cap is not None:
+            self.cap.release()
+        self.grabber = None
+        self.cap = None
+        self.source = None
+        self.mode = None
+
+    def capture(self):
+        """Return (timestamp, frame) for the newest frame, or (0.0, None); the frame is a private copy"""
+        timestamp, _, frame = self.capture_original()
+        return timestamp, frame
+
+    def capture_original(self):
+        """Return (timestamp, encoded, frame) for the newest frame.
+
+        For MJPEG streams ``encoded`` holds the camera's own JPEG bytes and the
+        frame is decoded from them at full size (the grabber may only hold
+        reduced preview frames); for other sources it is None.
+        """
+        if self.grabber is None:
+            return 0.0, None, None
+        if isinstance(self.cap, MJPEGCapture):
+            timestamp, data, frame = self.cap.capture()
+            if frame is not None:
+                return timestamp, data, frame
+        _, timestamp, frame = self.grabber.latest()
+        return timestamp, None, frame
+
+    def use_full_frames(self, full=True, display_size=None, timeout=1.0):
+        """Choose between full-size and preview-sized decoding for MJPEG streams.
+
+        Anything that consumes every grabbed frame (burst, recording, the
+        pre-trigger buffer) needs full frames; with only a preview running,
+        decoding at a reduced size that still covers ``display_size`` is much
+        cheaper. Waits up to ``timeout`` for the grabber to hold full frames.
+        Screen sources likewise convert every grab while full frames are
+        needed, instead of repeating the previous frame when nothing changed.
+        """
+        cap = self.cap
+        if hasattr(cap, 'skip_unchanged'):
+            cap.skip_unchanged = not full
+            return
+        if not isinstance(cap, MJPEGCapture):
+            return
+        if not full:
+            if cap.full_size and display_size:
+                cap.reduction = pick_reduction(cap.full_size, display_size)
+            return
+        if cap.reduction == 1:
+            return
+        cap.reduction = 1
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            seq = self.grabber.seq
+            shape, _ = self.grabber.frame_format()
+            if shape is not None and cap.full_size == (shape[1], shape[0]):
+                return
+            self.grabber.wait_for_frame(seq, timeout=deadline - time.time())
+
+    def output_path(self, filename=None, extension="jpg"):
+        """Full path in the output directory, adding a timestamped name or an extension if missing"""
+        if not filename:
+            filename = timestamped_filename(extension=extension)
+        elif not filename.lower().endswith(tuple(FORMATS)):
+            filename += '.' + extension
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, filename)
+
+    def save(self, frame, filename=None, extension="jpg", options=None, on_done=None, block=True, encoded=None):
+        """Queue a frame for background saving; returns the SaveJob, or None if the queue is full.
+
+        When ``encoded`` holds the source's original JPEG and the file is a
+        JPEG, those bytes are written as-is instead of re-encoding ``frame``.
+        """
+        path = self.output_path(filename, extension)
+        source = source_name(self.source) if self.source is not None else None
+        if encoded is not None and path.lower().endswith(('.jpg', '.jpeg')):
+            return self.save_queue.submit_encoded(encoded, path, on_done=on_done, block=block, source=source)
+        return self.save_queue.submit(frame, path, options=options, on_done=on_done, block=block, source=source)
+
+    def capture_series(self, count=None, rate=None, extension="jpg", prefix=None, skip_unchanged=False):
+        """Start saving frames in the background and return the running capture.
+
+        Without ``rate`` every grabbed frame is saved (a burst of ``count``);
+        otherwise one frame is saved every ``1 / rate`` seconds until ``count``
+        is reached or the capture is stopped. With ``skip_unchanged`` such a
+        timelapse of a screen source doesn't save frames identical to the
+        last one saved.
+        """
+        if self.grabber is None or self.grabber.seq == 0:
+            raise Exception("No frame available to capture")
+        if not rate and not count:
+            raise ValueError("A burst needs a frame count")
+        self.use_full_frames()
+        _, _, frame = self.grabber.latest()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        kwargs = {'extension': extension, 'source': source_name(self.source)}
+        if prefix:
+            kwargs['prefix'] = prefix
+        if rate:
+            if skip_unchanged:
+                kwargs['changed_since'] = getattr(self.cap, 'changed_since', None)
+            pool = FramePool(frame.shape, frame.dtype, 4)
+            run = IntervalCapture(self.grabber, pool, self.save_queue, self.output_dir,
+                                  1.0 / rate, count=count, **kwargs)
+        else:
+            pool = FramePool(frame.shape, frame.dtype, min(count, 32))
+            run = BurstCapture(self.grabber, pool, self.save_queue, self.output_dir, count, **kwargs)
+        run.start()
+        return run
+
+    def serve(self, port=None, host="127.0.0.1", quality=80):
+        """Re-serve grabbed frames over HTTP (see restream.py); returns the running RestreamServer.
+
+        The server stays up across ``open``/``close``, following whatever
+        source is open. Raises OSError if the port is taken.
+        """
+        from restream import DEFAULT_PORT, RestreamServer
+        if self.server is None:
+            server = RestreamServer(host, DEFAULT_PORT if port is None else port, quality)
+            server.start()
+            self.server = server
+        if self.grabber is not None:
+            self.server.set_source(self.grabber, self.cap if isinstance(self.cap, MJPEGCapture) else None)
+        return self.server
+
+    def stop_serving(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+
+    def shutdown(self, wait=True):
+        """Close the source, stop serving and let queued saves finish"""
+        self.close()
+        self.stop_serving()
+        self.save_queue.shutdown(wait=wait)
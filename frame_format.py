@@ -0,0 +1,194 @@
+"""Channel-order-aware resize and colour conversion.
+
+Frames are tagged with their channel order ('BGR', 'RGB', 'BGRA', 'RGBA',
+'GRAY') so a conversion is only done when the orders actually differ, and
+interpolation is picked by scale factor to stay on OpenCV's fast paths.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+CHANNELS = {'GRAY': 1, 'BGR': 3, 'RGB': 3, 'BGRA': 4, 'RGBA': 4}
+
+_CODES = {
+    ('BGR', 'RGB'): cv2.COLOR_BGR2RGB,
+    ('BGR', 'BGRA'): cv2.COLOR_BGR2BGRA,
+    ('BGR', 'RGBA'): cv2.COLOR_BGR2RGBA,
+    ('BGR', 'GRAY'): cv2.COLOR_BGR2GRAY,
+    ('RGB', 'BGR'): cv2.COLOR_RGB2BGR,
+    ('RGB', 'RGBA'): cv2.COLOR_RGB2RGBA,
+    ('RGB', 'BGRA'): cv2.COLOR_RGB2BGRA,
+    ('RGB', 'GRAY'): cv2.COLOR_RGB2GRAY,
+    ('BGRA', 'BGR'): cv2.COLOR_BGRA2BGR,
+    ('BGRA', 'RGB'): cv2.COLOR_BGRA2RGB,
+    ('BGRA', 'RGBA'): cv2.COLOR_BGRA2RGBA,
+    ('BGRA', 'GRAY'): cv2.COLOR_BGRA2GRAY,
+    ('RGBA', 'RGB'): cv2.COLOR_RGBA2RGB,
+    ('RGBA', 'BGR'): cv2.COLOR_RGBA2BGR,
+    ('RGBA', 'BGRA'): cv2.COLOR_RGBA2BGRA,
+    ('RGBA', 'GRAY'): cv2.COLOR_RGBA2GRAY,
+    ('GRAY', 'BGR'): cv2.COLOR_GRAY2BGR,
+    ('GRAY', 'RGB'): cv2.COLOR_GRAY2RGB,
+    ('GRAY', 'BGRA'): cv2.COLOR_GRAY2BGRA,
+    ('GRAY', 'RGBA'): cv2.COLOR_GRAY2RGBA,
+}
+
+
+def conversion_code(src_format, dst_format):
+    """cv2.cvtColor code between two channel orders, or None when they are the same"""
+    if src_format == dst_format:
+        return None
+    try:
+        return _CODES[(src_format, dst_format)]
+    except KeyError:
+        raise ValueError(f"No conversion from {src_format} to {dst_format}") from None
+
+
+def convert(frame, src_format, dst_format, out=None):
+    """Convert ``frame`` to ``dst_format``, into ``out`` when it fits.
+
+    Returns ``frame`` itself (or a copy into ``out``) when no conversion is needed.
+    """
+    code = conversion_code(src_format, dst_format)
+    shape = frame.shape[:2] + ((CHANNELS[dst_format],) if CHANNELS[dst_format] > 1 else ())
+    if out is not None and (out.shape != shape or out.dtype != frame.dtype):
+        out = None
+    if code is None:
+        if out is None:
+            return frame
+        np.copyto(out, frame)
+        return out
+    if out is None:
+        return cv2.cvtColor(frame, code)
+    cv2.cvtColor(frame, code, dst=out)
+    return out
+
+
+def pick_interpolation(src_size, dst_size):
+    """Interpolation for resizing (width, height) ``src_size`` to ``dst_size``.
+
+    Exact halving uses INTER_AREA, whose 2x path is vectorised and as cheap
+    as INTER_LINEAR while properly averaging; other INTER_AREA ratios are 4-20x
+    slower, so they are avoided. Whole-number enlargements use INTER_NEAREST,
+    which is pixel exact there and the cheapest. Everything else is INTER_LINEAR.
+    """
+    src_width, src_height = src_size
+    dst_width, dst_height = dst_size
+    if dst_width * 2 == src_width and dst_height * 2 == src_height:
+        return cv2.INTER_AREA
+    if dst_width >= src_width and dst_height >= src_height:
+        factor = dst_width // src_width
+        if factor >= 2 and dst_width == src_width * factor and dst_height == src_height * factor:
+            return cv2.INTER_NEAREST
+    return cv2.INTER_LINEAR
+
+
+def shrink(frame, factor):
+    """Box-filter ``frame`` down by an integer ``factor``.
+
+    Powers of two are done as repeated exact halvings on the fast INTER_AREA
+    path, which averages the same pixels as one big INTER_AREA step.
+    """
+    height, width = frame.shape[:2]
+    while factor > 1 and factor % 2 == 0 and width % 2 == 0 and height % 2 == 0:
+        width, height = width // 2, height // 2
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        factor //= 2
+    if factor > 1:
+        frame = cv2.resize(frame, (max(1, width // factor), max(1, height // factor)),
+                           interpolation=cv2.INTER_AREA)
+    return frame
+
+
+class DisplayConverter:
+    """Resizes and converts frames of one size and format into a preallocated display buffer.
+
+    The channel swap is done on whichever side of the resize has fewer pixels:
+    when shrinking, the frame is resized first and only the small result is
+    converted; when enlarging, the small source is converted and the resize
+    writes the display buffer directly. When the source is already in the
+    display order, the resize alone writes the buffer, and when no resize is
+    needed the conversion does, so each pixel of the output is written once.
+    """
+
+    def __init__(self, src_size, dst_size, src_format='BGR', dst_format='RGBA'):
+        self.src_size = tuple(src_size)
+        self.dst_size = tuple(dst_size)
+        self.src_format = src_format
+        self.dst_format = dst_format
+        self.code = conversion_code(src_format, dst_format)
+        self.interpolation = pick_interpolation(self.src_size, self.dst_size)
+
+        width, height = self.dst_size
+        self.output = np.empty((height, width, CHANNELS[dst_format]), np.uint8)
+        self.resize_first = width * height <= self.src_size[0] * self.src_size[1]
+        self._scratch = None
+        if self.code is not None and self.src_size != self.dst_size:
+            if self.resize_first:
+                self._scratch = np.empty((height, width, CHANNELS[src_format]), np.uint8)
+            else:
+                self._scratch = np.empty((self.src_size[1], self.src_size[0], CHANNELS[dst_format]), np.uint8)
+
+    def fits(self, frame):
+        return (frame.shape[1], frame.shape[0]) == self.src_size
+
+    def convert(self, frame):
+        """Resize and convert a whole frame into ``output``; returns ``output``"""
+        self._apply(frame, self.output, timed=True)
+        return self.output
+
+    def convert_region(self, frame_region, output_region):
+        """Resize and convert part of a frame into the matching part of ``output``"""
+        self._apply(frame_region, output_region)
+
+    def _apply(self, src, dst, timed=False):
+        size = (dst.shape[1], dst.shape[0])
+        start = time.perf_counter() if timed else None
+        if src.shape[:2] == dst.shape[:2]:
+            if self.code is None:
+                np.copyto(dst, src)
+            else:
+                cv2.cvtColor(src, self.code, dst=dst)
+            stage = 'convert'
+        elif self.code is None:
+            cv2.resize(src, size, dst=dst, interpolation=self.interpolation)
+            stage = 'resize'
+        elif self.resize_first:
+            scratch = self._scratch[:dst.shape[0], :dst.shape[1]]
+            cv2.resize(src, size, dst=scratch, interpolation=self.interpolation)
+            if timed:
+                start = METRICS.record_since('resize', start)
+            cv2.cvtColor(scratch, self.code, dst=dst)
+            stage = 'convert'
+        else:
+            scratch = self._scratch[:src.shape[0], :src.shape[1]]
+            cv2.cvtColor(src, self.code, dst=scratch)
+            if timed:
+                start = METRICS.record_since('convert', start)
+            cv2.resize(scratch, size, dst=dst, interpolation=self.interpolation)
+            stage = 'resize'
+        if timed:
+            METRICS.record_since(stage, start)
+
+
+def configure_threads(threads=None):
+    """Size OpenCV's worker pool; returns the thread count in use.
+
+    OpenCV defaults to one worker per core, but the grabber, preview and
+    save threads already run resize, convert and encode calls side by side,
+    and on frames this small a fully parallelised call mostly pays for
+    synchronisation. The default leaves half the cores (at most four) to
+    OpenCV; ``CAPTURE_OPENCV_THREADS`` overrides it.
+    """
+    if threads is None:
+        try:
+            threads = int(os.environ['CAPTURE_OPENCV_THREADS'])
+        except (KeyError, ValueError):
+            threads = max(1, min(4, (os.cpu_count() or 1) // 2))
+    cv2.setUseOptimized(True)  # SIMD dispatch, in case something turned it off
+    cv2.setNumThreads(threads)
+    return cv2.getNumThreads()
@@ -0,0 +1,221 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+
+class FrameGrabber:
+    """Reads frames from a capture source on its own thread into a ring buffer.
+
+    The grabber never waits on its consumers: it reads as fast as the source
+    delivers, always overwriting the oldest slot, so preview, capture and save
+    can each pull from the buffer at their own pace.
+    """
+
+    def __init__(self, cap, slots=4, max_failures=30):
+        if slots < 2:
+            raise ValueError("FrameGrabber needs at least 2 slots")
+        self.cap = cap
+        self.slots = slots
+        self.max_failures = max_failures
+
+        # Ring buffer, allocated once the first frame tells us the shape
+        self._ring = None
+        self._seqs = [0] * slots
+        self._stamps = [0.0] * slots
+        self.seq = 0
+        self.last_timestamp = 0.0
+
+        self._cond = threading.Condition()
+        self.is_running = False
+        self.failed = False
+        self.thread = None
+
+        # Simple throughput stats
+        self.frames_read = 0
+        self.nominal_fps = 0.0  # what the source claims (CAP_PROP_FPS)
+        self.read_ms = 0.0  # smoothed time spent in cap.read()
+        self.fps = 0.0
+        self._fps_count = 0
+        self._fps_start = 0.0
+
+    def start(self, first_frame=None):
+        """Start the grabber thread, optionally seeding it with an already-read frame"""
+        try:
+            self.nominal_fps = float(self.cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        except Exception:
+            self.nominal_fps = 0.0
+        if first_frame is not None:
+            self._publish(first_frame, time.time())
+        self.is_running = True
+        self.failed = False
+        self._fps_start = time.time()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, release=True):
+        """Stop the grabber thread and optionally release the capture"""
+        self.is_running = False
+        with self._cond:
+            self._cond.notify_all()
+        # Sources that can block waiting for new content get woken up
+        interrupt = getattr(self.cap, 'interrupt', None)
+        if interrupt is not None:
+            interrupt()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+        if release and self.cap is not None:
+            self.cap.release()
+
+    def _allocate(self, frame):
+        self._ring = [np.empty_like(frame) for _ in range(self.slots)]
+        self._seqs = [0] * self.slots
+        self._stamps = [0.0] * self.slots
+
+    def _publish(self, frame, timestamp):
+        """Copy an externally produced frame into the next slot"""
+        with self._cond:
+            if self._ring is None or self._ring[0].shape != frame.shape or self._ring[0].dtype != frame.dtype:
+                self._allocate(frame)
+            slot = (self.seq + 1) % self.slots
+        np.copyto(self._ring[slot], frame)
+        self._commit(slot, timestamp)
+
+    def _commit(self, slot, timestamp):
+        with self._cond:
+            self.seq += 1
+            self._seqs[slot] = self.seq
+            self._stamps[slot] = timestamp
+            self.last_timestamp = timestamp
+            self._cond.notify_all()
+        self.frames_read += 1
+        METRICS.count('frames_grabbed')
+        self._fps_count += 1
+        elapsed = timestamp - self._fps_start
+        if elapsed >= 1.0:
+            self.fps = self._fps_count / elapsed
+            self._fps_count = 0
+            self._fps_start = timestamp
+
+    def _run(self):
+        failures = 0
+        while self.is_running:
+            try:
+                if self._ring is None:
+                    ret, frame = self.cap.read()
+                    if ret:
+                        self._publish(frame, time.time())
+                else:
+                    # The slot after the newest one is never handed out by
+                    # latest()/frames_since(), so we can decode straight into it
+                    slot = (self.seq + 1) % self.slots
+                    buf = self._ring[slot]
+                    with self._cond:
+                        self._seqs[slot] = 0
+                    read_start = time.perf_counter()
+                    ret, frame = self.cap.read(buf)
+                    read_ms = (time.perf_counter() - read_start) * 1000
+                    self.read_ms += (read_ms - self.read_ms) * 0.1
+                    METRICS.record('read', read_ms)
+                    if ret:
+                        if frame is not buf:
+                            # Source changed resolution or format
+                            self._publish(frame, time.time())
+                        else:
+                            self._commit(slot, time.time())
+            except Exception as e:
+                print(f"Error in frame grabber: {e}")
+                ret = False
+
+            if ret:
+                failures = 0
+            else:
+                failures += 1
+                if failures >= self.max_failures:
+                    self.failed = True
+                    break
+                time.sleep(0.01)
+
+        self.is_running = False
+        with self._cond:
+            self._cond.notify_all()
+
+    def latest(self, out=None):
+        """Return (seq, timestamp, frame) for the newest frame, or (0, 0.0, None).
+
+        The frame is a private copy; pass ``out`` to copy into an existing array
+        of the same shape instead of allocating.
+        """
+        with self._cond:
+            if self.seq == 0:
+                return 0, 0.0, None
+            slot = self.seq % self.slots
+            src = self._ring[slot]
+            start = time.perf_counter()
+            if out is None or out.shape != src.shape or out.dtype != src.dtype:
+                out = src.copy()
+            else:
+                np.copyto(out, src)
+            METRICS.record_since('copy', start)
+            return self.seq, self._stamps[slot], out
+
+    def frames_since(self, seq):
+        """Return [(seq, timestamp, frame), ...] for frames newer than ``seq`` still in the ring"""
+        frames = []
+        with self._cond:
+            if self._ring is None:
+                return frames
+            first = max(seq + 1, self.seq - self.slots + 2)
+            for s in range(first, self.seq + 1):
+                slot = s % self.slots
+                if self._seqs[slot] == s:
+                    frames.append((s, self._stamps[slot], self._ring[slot].copy()))
+        return frames
+
+    def copy_frame(self, seq, out):
+        """Copy frame ``seq`` into ``out`` if it is still held; returns its timestamp or None"""
+        with self._cond:
+            if self._ring is None:
+                return None
+            slot = seq % self.slots
+            if self._seqs[slot] != seq or seq > self.seq or seq <= self.seq - self.slots + 1:
+                return None
+            if out.shape != self._ring[slot].shape or out.dtype != self._ring[slot].dtype:
+                return None
+            start = time.perf_counter()
+            np.copyto(out, self._ring[slot])
+            METRICS.record_since('copy', start)
+            return self._stamps[slot]
+
+    def frame_format(self):
+        """Return (shape, dtype) of the frames currently in the ring, or (None, None)"""
+        with self._cond:
+            if self._ring is None:
+                return None, None
+            return self._ring[0].shape, self._ring[0].dtype
+
+    def frame_near(self, timestamp):
+        """Return (seq, timestamp, frame) for the held frame closest to ``timestamp``"""
+        with self._cond:
+            if self.seq == 0:
+                return 0, 0.0, None
+            best = None
+            for s in range(max(1, self.seq - self.slots + 2), self.seq + 1):
+                slot = s % self.slots
+                if self._seqs[slot] != s:
+                    continue
+                if best is None or abs(self._stamps[slot] - timestamp) < abs(self._stamps[best] - timestamp):
+                    best = slot
+            if best is None:
+                return 0, 0.0, None
+            return self._seqs[best], self._stamps[best], self._ring[best].copy()
+
+    def wait_for_frame(self, seq, timeout=None):
+        """Block until a frame newer than ``seq`` is available; return the newest seq"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq or not self.is_running, timeout)
+            return self.seq
@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+
+import cv2
+
+from metrics import METRICS
+
+# FFmpeg demuxer/decoder options that trade robustness to jitter for latency:
+# no input buffering, low-delay decoding and a short stream probe
+LOW_LATENCY_OPTIONS = {
+    'fflags': 'nobuffer',
+    'flags': 'low_delay',
+    'max_delay': '500000',
+    'probesize': '65536',
+    'analyzeduration': '500000',
+}
+
+# OPENCV_FFMPEG_CAPTURE_OPTIONS is read from the environment when a capture
+# opens, so concurrent opens must not see each other's options
+_env_lock = threading.Lock()
+
+
+def is_stream_url(source):
+    return isinstance(source, str) and "://" in source
+
+
+def ffmpeg_options_string(url, options):
+    """Format options for OPENCV_FFMPEG_CAPTURE_OPTIONS ("key;value|key;value")"""
+    options = dict(options)
+    if url.lower().startswith("rtsp://"):
+        # UDP loses packets (and whole frames) on Wi-Fi
+        options.setdefault('rtsp_transport', 'tcp')
+    return "|".join(f"{key};{value}" for key, value in options.items())
+
+
+def open_stream(url, options=LOW_LATENCY_OPTIONS, open_timeout_ms=5000, read_timeout_ms=5000):
+    """Open a network stream with the FFmpeg backend and the given capture options"""
+    if not cv2.videoio_registry.hasBackend(cv2.CAP_FFMPEG):
+        # The options are FFmpeg's; other builds get a plain open
+        return cv2.VideoCapture(url)
+    params = []
+    if hasattr(cv2, 'CAP_PROP_OPEN_TIMEOUT_MSEC'):
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, open_timeout_ms,
+                  cv2.CAP_PROP_READ_TIMEOUT_MSEC, read_timeout_ms]
+    with _env_lock:
+        previous = os.environ.get('OPENCV_FFMPEG_CAPTURE_OPTIONS')
+        os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = ffmpeg_options_string(url, options or {})
+        try:
+            cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+        finally:
+            if previous is None:
+                del os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS']
+            else:
+                os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = previous
+    return cap
+
+
+class IPCameraCapture:
+    """VideoCapture-like network stream that stays fresh and survives drop-outs.
+
+    Each ``read`` drains frames that were already buffered (a grab that
+    returns much faster than the frame interval came from the buffer, not
+    the network) and decodes only the newest, so a consumer that falls
+    behind catches up instead of lagging by seconds. After the first frame,
+    a failed read closes the stream and reconnects with exponential backoff;
+    ``read`` blocks until frames flow again or ``interrupt`` is called, so a
+    FrameGrabber and the preview ride out the drop-out instead of stopping.
+    """
+
+    def __init__(self, url, options=LOW_LATENCY_OPTIONS, flush=True, max_flush=30,
+                 open_timeout_ms=5000, read_timeout_ms=5000,
+                 initial_backoff=0.5, max_backoff=10.0, max_reconnects=None):
+        self.url = url
+        self.options = options
+        self.flush = flush
+        self.max_flush = max_flush
+        self.open_timeout_ms = open_timeout_ms
+        self.read_timeout_ms = read_timeout_ms
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.max_reconnects = max_reconnects
+
+        self._interrupted = threading.Event()
+        self._released = False
+        self._reading = False
+        self._lock = threading.Lock()
+        self.state = 'connecting'
+
+        # Stats
+        self.frames = 0
+        self.flushed = 0
+        self.reconnects = 0
+        self.grab_ms = 0.0
+        self.latency_ms = None
+        self.last_error = None
+        self.connected_at = 0.0
+        self._frame_interval = None
+        self._clock_offset = None
+
+        self.cap = None
+        self._connect()
+
+    def _connect(self):
+        self.cap = open_stream(self.url, self.options, self.open_timeout_ms, self.read_timeout_ms)
+        if self.cap.isOpened():
+            self.state = 'connected'
+            self.connected_at = time.time()
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            # FFmpeg reports 1000 or 90000 for streams without a frame rate
+            self._frame_interval = 1.0 / fps if 0 < fps <= 240 else None
+            self._clock_offset = None
+            return True
+        self.state = 'disconnected'
+        return False
+
+    def _reconnect(self):
+        """Reopen the stream, backing off exponentially; False if interrupted or out of attempts"""
+        backoff = self.initial_backoff
+        attempts = 0
+        while not self._interrupted.is_set():
+            if self.max_reconnects is not None and attempts >= self.max_reconnects:
+                self.state = 'failed'
+                return False
+            self.state = 'reconnecting'
+            if self.cap is not None:
+                self.cap.release()
+            attempts += 1
+            if self._connect():
+                self.reconnects += 1
+                return True
+            self.state = 'reconnecting'
+            if self._interrupted.wait(backoff):
+                break
+            backoff = min(self.max_backoff, backoff * 2)
+        return False
+
+    def _grab_newest(self):
+        """Grab frames until one had to wait on the network; returns whether any grab succeeded"""
+        start = time.perf_counter()
+        if not self.cap.grab():
+            return False
+        elapsed = time.perf_counter() - start
+        if self.flush:
+            # Buffered frames come back almost instantly
+            stale = 0.25 * self._frame_interval if self._frame_interval else 0.005
+            flushed = 0
+            while elapsed < stale and flushed < self.max_flush:
+                start = time.perf_counter()
+                if not self.cap.grab():
+                    break
+                elapsed = time.perf_counter() - start
+                flushed += 1
+            self.flushed += flushed
+            if flushed:
+                METRICS.count('stream_flushed', flushed)
+        self.grab_ms += (elapsed * 1000 - self.grab_ms) * 0.1
+        METRICS.record('grab', elapsed * 1000)
+        return True
+
+    def _update_latency(self):
+        # Stream timestamps only measure lag relative to the best case seen:
+        # wall time minus presentation time grows as frames queue up
+        position = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if not position or position <= 0:
+            self.latency_ms = None
+            return
+        offset = time.time() * 1000 - position
+        if self._clock_offset is None or offset < self._clock_offset:
+            self._clock_offset = offset
+        self.latency_ms = offset - self._clock_offset
+
+    def read(self, image=None):
+        with self._lock:
+            if self._released:
+                return False, None
+            self._reading = True
+        try:
+            return self._read(image)
+        finally:
+            with self._lock:
+                self._reading = False
+                if self._released and self.cap is not None:
+                    # release() was called mid-read and left closing to us
+                    self.cap.release()
+
+    def _read(self, image):
+        while not self._interrupted.is_set():
+            error = None
+            try:
+                ok = self.cap is not None and self.cap.isOpened() and self._grab_newest()
+                if ok:
+                    start = time.perf_counter()
+                    ok, frame = self.cap.retrieve(image)
+                    METRICS.record_since('decode', start)
+            except cv2.error as e:
+                error = str(e)
+                ok = False
+            if ok:
+                self.frames += 1
+                self._update_latency()
+                return True, frame
+
+            if self.frames == 0 and self.reconnects == 0:
+                # Never connected properly: let the caller report it
+                return False, None
+            self.last_error = error or "stream stopped delivering frames"
+            if not self._reconnect():
+                return False, None
+        return False, None
+
+    def interrupt(self):
+        """Wake a read that is waiting to reconnect (used when stopping)"""
+        self._interrupted.set()
+
+    def isOpened(self):
+        return not self._released and self.cap is not None and self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop) if self.cap is not None else 0.0
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value) if self.cap is not None else False
+
+    def release(self):
+        self._interrupted.set()
+        with self._lock:
+            self._released = True
+            # A read blocked on the network releases the stream when it returns
+            if not self._reading and self.cap is not None:
+                self.cap.release()
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'frames': self.frames,
+            'flushed': self.flushed,
+            'reconnects': self.reconnects,
+            'grab_ms': self.grab_ms,
+            'latency_ms': self.latency_ms,
+            'last_error': self.last_error,
+        }
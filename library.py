@@ -0,0 +1,372 @@
+import collections
+import mmap
+import os
+import sqlite3
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from camera_discovery import CACHE_DIR
+from frame_format import shrink
+from saver import FORMATS
+
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR, "captures.db")
+DEFAULT_THUMBNAIL_PATH = os.path.join(CACHE_DIR, "thumbnails.bin")
+
+THUMBNAIL_SIZE = (160, 120)
+
+# Hashes this many bits apart (of 64) or fewer count as near-duplicates
+DUPLICATE_DISTANCE = 6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    directory TEXT NOT NULL,
+    source TEXT,
+    timestamp REAL NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    bytes INTEGER,
+    phash INTEGER,
+    duplicate_of INTEGER,
+    thumbnail INTEGER
+);
+CREATE INDEX IF NOT EXISTS captures_by_directory ON captures (directory, timestamp);
+"""
+
+
+def _downsample(frame, size):
+    """Area-average ``frame`` down to ``size``: exact halvings first, then one INTER_AREA step"""
+    height, width = frame.shape[:2]
+    factor = 1
+    while width // (factor * 2) >= size[0] * 2 and height // (factor * 2) >= size[1] * 2:
+        factor *= 2
+    return cv2.resize(shrink(frame, factor), size, interpolation=cv2.INTER_AREA)
+
+
+def perceptual_hash(frame):
+    """64-bit DCT hash: which low frequencies of a 32x32 grey version are above their median.
+
+    Re-encoding, resizing and small exposure changes flip only a few bits,
+    so the Hamming distance between two hashes measures visual similarity.
+    """
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(_downsample(frame, (32, 32)), cv2.COLOR_BGR2GRAY)
+    else:
+        frame = _downsample(frame, (32, 32))
+    low = cv2.dct(np.float32(frame))[:8, :8].flatten()
+    bits = low > np.median(low[1:])  # the DC term only tracks brightness
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def thumbnail(frame, size=THUMBNAIL_SIZE):
+    """Letterboxed RGB thumbnail of a BGR frame, exactly ``size``"""
+    height, width = frame.shape[:2]
+    scale = min(size[0] / width, size[1] / height)
+    fit = (max(1, int(width * scale)), max(1, int(height * scale)))
+    small = cv2.cvtColor(_downsample(frame, fit), cv2.COLOR_BGR2RGB)
+    out = np.zeros((size[1], size[0], 3), np.uint8)
+    x, y = (size[0] - fit[0]) // 2, (size[1] - fit[1]) // 2
+    out[y:y + fit[1], x:x + fit[0]] = small
+    return out
+
+
+def _signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value is not None and value >= 1 << 63 else value
+
+
+def _unsigned(value):
+    return value + (1 << 64) if value is not None and value < 0 else value
+
+
+class ThumbnailStore:
+    """Fixed-size RGB thumbnails packed into one file and read back through mmap.
+
+    Slot ``n`` lives at ``n * slot_bytes`` and is written at that offset,
+    whatever the file's current length, so a thumbnail is a NumPy view
+    into the page cache with no decoding; the ``cache_size`` most recently
+    used ones are also kept in memory.
+    """
+
+    def __init__(self, path=DEFAULT_THUMBNAIL_PATH, size=THUMBNAIL_SIZE, cache_size=512):
+        self.path = path
+        self.size = tuple(size)
+        self.slot_bytes = size[0] * size[1] * 3
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Not append mode: writes must land at their slot's offset
+        self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b", buffering=0)
+        self._map = None
+
+    def _mapped(self, end):
+        # Remap once the file has grown past the current mapping
+        if self._map is None or len(self._map) < end:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if os.fstat(self._file.fileno()).st_size < end:
+                return None
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def write(self, slot, image):
+        data = np.ascontiguousarray(image, np.uint8).tobytes()
+        with self._lock:
+            if hasattr(os, 'pwrite'):
+                os.pwrite(self._file.fileno(), data, slot * self.slot_bytes)
+            else:
+                self._file.seek(slot * self.slot_bytes)
+                self._file.write(data)
+            self._cache.pop(slot, None)
+
+    def read(self, slot):
+        """The thumbnail in ``slot`` as a (height, width, 3) RGB array, or None"""
+        with self._lock:
+            image = self._cache.get(slot)
+            if image is not None:
+                self._cache.move_to_end(slot)
+                return image
+            start = slot * self.slot_bytes
+            mapped = self._mapped(start + self.slot_bytes)
+            if mapped is None:
+                return None
+            image = np.frombuffer(mapped, np.uint8, self.slot_bytes, start).reshape(self.size[1], self.size[0], 3)
+            image = image.copy()  # the mapping may be replaced when the file grows
+            self._cache[slot] = image
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return image
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+
+class CaptureLibrary:
+    """SQLite index of saved captures with thumbnails and near-duplicate detection.
+
+    Each capture is recorded with its path, directory, source, timestamp,
+    size and a 64-bit perceptual hash. ``add`` is called from save workers
+    right after a file is written: it hashes the frame, stores a thumbnail
+    and flags the capture as a near-duplicate of the closest earlier one in
+    the same directory within ``duplicate_distance`` bits. Hashes per
+    directory are kept in memory, so the check is one vectorised XOR and
+    bit count however many captures there are.
+
+    A capture's thumbnail slot is its row id, so several libraries (the
+    app and cli.py, say) can share one database and thumbnail file without
+    handing out the same slot.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, thumbnail_path=DEFAULT_THUMBNAIL_PATH,
+                 duplicate_distance=DUPLICATE_DISTANCE):
+        self.db_path = db_path
+        self.duplicate_distance = duplicate_distance
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            # Thumbnails stored under other slot numbers by older versions are regenerated on demand
+            self._db.execute("UPDATE captures SET thumbnail = NULL WHERE thumbnail IS NOT NULL AND thumbnail != id")
+            self._db.commit()
+        self.thumbnails = ThumbnailStore(thumbnail_path)
+        self._hashes = {}  # directory -> (ids, hashes)
+
+    def _directory_hashes(self, directory):
+        # Lock held
+        if directory not in self._hashes:
+            rows = self._db.execute("SELECT id, phash FROM captures WHERE directory = ? AND phash IS NOT NULL",
+                                    (directory,)).fetchall()
+            ids = np.array([row['id'] for row in rows], np.int64)
+            hashes = np.array([_unsigned(row['phash']) for row in rows], np.uint64)
+            self._hashes[directory] = (ids, hashes)
+        return self._hashes[directory]
+
+    def _nearest(self, directory, phash, exclude=None):
+        """(id, distance) of the most similar capture in ``directory`` other than ``exclude``, or (None, None)"""
+        ids, hashes = self._directory_hashes(directory)
+        if exclude is not None:
+            keep = ids != exclude
+            ids, hashes = ids[keep], hashes[keep]
+        if not len(ids):
+            return None, None
+        diff = np.bitwise_xor(hashes, np.uint64(phash))
+        distances = np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        return int(ids[best]), int(distances[best])
+
+    def add(self, path, frame=None, data=None, source=None, timestamp=None):
+        """Index a saved image from its frame, its encoded bytes or the file; returns the entry"""
+        if frame is None:
+            if data is None:
+                data = np.fromfile(path, np.uint8)
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError(f"Cannot decode {path}")
+        path = os.path.abspath(path)
+        directory = os.path.dirname(path)
+        phash = perceptual_hash(frame)
+        thumb = thumbnail(frame, self.thumbnails.size)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+
+        with self._lock:
+            # Saving over an indexed file replaces its row (and gives it a new id)
+            row = self._db.execute("SELECT id FROM captures WHERE path = ?", (path,)).fetchone()
+            replaced = row['id'] if row is not None else None
+            nearest, distance = self._nearest(directory, phash, exclude=replaced)
+            duplicate_of = nearest if distance is not None and distance <= self.duplicate_distance else None
+            try:
+                cursor = self._db.execute(
+                    "INSERT OR REPLACE INTO captures (path, directory, source, timestamp, width, height, bytes,"
+                    " phash, duplicate_of) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, directory, source, timestamp or time.time(), frame.shape[1], frame.shape[0], size,
+                     _signed(phash), duplicate_of))
+                entry_id = cursor.lastrowid
+                # The row id is the slot; it is only published once the thumbnail is written
+                self.thumbnails.write(entry_id, thumb)
+                self._db.execute("UPDATE captures SET thumbnail = id WHERE id = ?", (entry_id,))
+                if replaced is not None:
+                    self._db.execute("UPDATE captures SET duplicate_of = ? WHERE duplicate_of = ?",
+                                     (entry_id, replaced))
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+            ids, hashes = self._directory_hashes(directory)
+            if replaced is not None:
+                keep = ids != replaced
+                ids, hashes = ids[keep], hashes[keep]
+            self._hashes[directory] = (np.append(ids, entry_id), np.append(hashes, np.uint64(phash)))
+            return self.get(entry_id)
+
+    def get(self, entry_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM captures WHERE id = ?", (entry_id,)).fetchone()
+        return self._entry(row) if row is not None else None
+
+    @staticmethod
+    def _entry(row):
+        entry = dict(row)
+        entry['phash'] = _unsigned(entry['phash'])
+        return entry
+
+    def captures(self, directory=None, duplicates_only=False, limit=-1, offset=0):
+        """Indexed captures, newest first, optionally only those in ``directory``"""
+        query = "SELECT * FROM captures"
+        conditions, params = [], []
+        if directory is not None:
+            conditions.append("directory = ?")
+            params.append(os.path.abspath(directory))
+        if duplicates_only:
+            conditions.append("duplicate_of IS NOT NULL")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._db.execute(query, params + [limit, offset]).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def thumbnail(self, entry):
+        """RGB thumbnail array of an entry, regenerating it from the file if it's missing"""
+        if entry['thumbnail'] is not None:
+            image = self.thumbnails.read(entry['thumbnail'])
+            if image is not None:
+                return image
+        frame = cv2.imread(entry['path'], cv2.IMREAD_REDUCED_COLOR_4)
+        if frame is None:
+            return None
+        image = thumbnail(frame, self.thumbnails.size)
+        with self._lock:
+            self.thumbnails.write(entry['id'], image)
+            self._db.execute("UPDATE captures SET thumbnail = id WHERE id = ?", (entry['id'],))
+            self._db.commit()
+        entry['thumbnail'] = entry['id']
+        return image
+
+    def remove(self, entry_id):
+        with self._lock:
+            row = self._db.execute("SELECT directory FROM captures WHERE id = ?", (entry_id,)).fetchone()
+            self._db.execute("DELETE FROM captures WHERE id = ?", (entry_id,))
+            self._db.execute("UPDATE captures SET duplicate_of = NULL WHERE duplicate_of = ?", (entry_id,))
+            self._db.commit()
+            if row is not None:
+                self._hashes.pop(row['directory'], None)
+
+    def scan(self, directory, on_progress=None):
+        """Index images in ``directory`` that aren't known yet and forget ones that are gone.
+
+        Returns the number of newly indexed files. JPEGs are decoded at a
+        quarter of their size, which is plenty for the hash and thumbnail.
+        """
+        directory = os.path.abspath(directory)
+        with self._lock:
+            known = {row['path']: row['id'] for row in
+                     self._db.execute("SELECT id, path FROM captures WHERE directory = ?", (directory,))}
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            names = []
+        present = set()
+        added = 0
+        for name in names:
+            path = os.path.join(directory, name)
+            if not name.lower().endswith(tuple(FORMATS)):
+                continue
+            present.add(path)
+            if path in known:
+                continue
+            flags = cv2.IMREAD_REDUCED_COLOR_4 if name.lower().endswith(('.jpg', '.jpeg')) else cv2.IMREAD_COLOR
+            frame = cv2.imread(path, flags)
+            if frame is None:
+                continue
+            try:
+                entry = self.add(path, frame=frame, timestamp=os.path.getmtime(path))
+            except (OSError, ValueError) as e:
+                print(f"Error indexing {path}: {e}")
+                continue
+            if flags != cv2.IMREAD_COLOR:
+                self._store_image_size(entry['id'], path)
+            added += 1
+            if on_progress:
+                on_progress(added)
+        for path, entry_id in known.items():
+            if path not in present:
+                self.remove(entry_id)
+        return added
+
+    def _store_image_size(self, entry_id, path):
+        # Reduced decodes don't tell us the real size; the JPEG header does
+        try:
+            from PIL import Image
+            with Image.open(path) as image:
+                width, height = image.size
+        except Exception:
+            return
+        with self._lock:
+            self._db.execute("UPDATE captures SET width = ?, height = ? WHERE id = ?", (width, height, entry_id))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+        self.thumbnails.close()
@@ -0,0 +1,207 @@
+import bisect
+import csv
+import json
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds in milliseconds: four per doubling from
+# 10 µs to ~40 s, so any percentile is within ~19% of the true value
+BUCKET_BOUNDS = [0.01 * 2 ** (i / 4) for i in range(88)]
+
+# Stages in pipeline order, for display; anything else is listed after them
+STAGES = ['read', 'grab', 'decode', 'copy', 'score', 'resize', 'convert', 'photoimage', 'render', 'encode', 'write']
+
+
+class Histogram:
+    """Fixed log-bucketed timing histogram; recording is a bisect and an increment"""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def record(self, ms):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if self.min is None or ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (0-100)"""
+        if not self.count:
+            return 0.0
+        rank = max(1.0, p / 100.0 * self.count)
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                bound = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'min_ms': self.min or 0.0,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max,
+        }
+
+
+def process_memory():
+    """Resident set size of this process in bytes, or None if unknown"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        pass
+    try:
+        import resource
+        # Peak rather than current, but better than nothing (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    except Exception:
+        return None
+
+
+class Metrics:
+    """Per-stage timing histograms, event counters and gauges shared by the pipeline.
+
+    Components record into the module-level ``METRICS`` instance: a stage
+    timing is one lock round trip and a bisect into fixed buckets, so it can
+    stay enabled all the time. Counters (frames grabbed, rendered, dropped)
+    also yield rates between snapshots; gauges hold the latest value of
+    things like queued bytes.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.gauges = {}
+            self.started = time.time()
+            self._rate_time = time.perf_counter()
+            self._rate_counts = {}
+            self.rates = {}
+
+    def record(self, stage, ms):
+        """Add one timing, in milliseconds, to a stage's histogram"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.record(ms)
+
+    def record_since(self, stage, start):
+        """Record the time since ``start`` (a time.perf_counter() value); returns now"""
+        now = time.perf_counter()
+        self.record(stage, (now - start) * 1000)
+        return now
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[name] = value
+
+    def _update_rates(self):
+        # Per-second rates of every counter since the previous update (lock held)
+        now = time.perf_counter()
+        elapsed = now - self._rate_time
+        if elapsed < 0.5:
+            return
+        for name, value in self.counters.items():
+            self.rates[name] = (value - self._rate_counts.get(name, 0)) / elapsed
+        self._rate_counts = dict(self.counters)
+        self._rate_time = now
+
+    def snapshot(self):
+        """Return everything recorded so far as plain data"""
+        with self._lock:
+            self._update_rates()
+            stages = {name: h.summary() for name, h in self.histograms.items()}
+            counters = dict(self.counters)
+            rates = dict(self.rates)
+            gauges = dict(self.gauges)
+        order = {name: i for i, name in enumerate(STAGES)}
+        return {
+            'timestamp': time.time(),
+            'uptime_s': time.time() - self.started,
+            'stages': dict(sorted(stages.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))),
+            'counters': counters,
+            'rates_per_s': rates,
+            'gauges': gauges,
+            'memory_bytes': process_memory(),
+        }
+
+    def format_overlay(self, snapshot=None):
+        """Compact multi-line text for the preview overlay"""
+        snapshot = snapshot or self.snapshot()
+        lines = [f"{'stage':<11}{'mean':>7}{'p90':>7}{'p99':>7}{'max':>8}  ms"]
+        for name, s in snapshot['stages'].items():
+            lines.append(f"{name:<11}{s['mean_ms']:>7.2f}{s['p90_ms']:>7.2f}{s['p99_ms']:>7.2f}{s['max_ms']:>8.1f}")
+        rates = snapshot['rates_per_s']
+        counters = snapshot['counters']
+        for name in sorted(counters):
+            lines.append(f"{name:<22}{counters[name]:>8}  {rates.get(name, 0.0):>6.1f}/s")
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines.append(f"{name:<22}{value:>8.0f}" if isinstance(value, (int, float)) else f"{name:<22}{value}")
+        if snapshot['memory_bytes'] is not None:
+            lines.append(f"{'memory (RSS)':<22}{snapshot['memory_bytes'] / 2**20:>6.0f} MB")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write a snapshot to ``path`` as CSV (by extension) or JSON"""
+        snapshot = self.snapshot()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['kind', 'name', 'count', 'mean_ms', 'min_ms', 'p50_ms', 'p90_ms',
+                                 'p99_ms', 'max_ms', 'value', 'rate_per_s'])
+                for name, s in snapshot['stages'].items():
+                    writer.writerow(['stage', name, s['count'], f"{s['mean_ms']:.4f}", f"{s['min_ms']:.4f}",
+                                     f"{s['p50_ms']:.4f}", f"{s['p90_ms']:.4f}", f"{s['p99_ms']:.4f}",
+                                     f"{s['max_ms']:.4f}", '', ''])
+                for name, value in snapshot['counters'].items():
+                    writer.writerow(['counter', name, '', '', '', '', '', '', '', value,
+                                     f"{snapshot['rates_per_s'].get(name, 0.0):.3f}"])
+                for name, value in snapshot['gauges'].items():
+                    writer.writerow(['gauge', name, '', '', '', '', '', '', '', value, ''])
+                writer.writerow(['gauge', 'memory_bytes', '', '', '', '', '', '', '', snapshot['memory_bytes'], ''])
+        else:
+            with open(path, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+        return path
+
+
+# Shared by every component in the process
+METRICS = Metrics()
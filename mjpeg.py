@@ -0,0 +1,262 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+# imdecode flags for DCT-domain downscaling: libjpeg skips most of the work
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class NotMJPEGStream(Exception):
+    """The URL answered, but not with a multipart JPEG stream"""
+
+
+def pick_reduction(full_size, display_size):
+    """Largest JPEG decode reduction (1, 2, 4 or 8) that still covers ``display_size``"""
+    full_width, full_height = full_size
+    width, height = display_size
+    for reduction in (8, 4, 2):
+        if full_width // reduction >= width and full_height // reduction >= height:
+            return reduction
+    return 1
+
+
+def decode_jpeg(data, reduction=1):
+    """Decode JPEG bytes to BGR, scaled down by ``reduction`` during decoding"""
+    return cv2.imdecode(np.frombuffer(data, np.uint8), REDUCED_DECODE_FLAGS[reduction])
+
+
+class MJPEGCapture:
+    """Reads a multipart MJPEG-over-HTTP stream without decoding it.
+
+    A reader thread splits the stream into raw JPEG images and keeps only
+    the newest. Frames are decoded when someone asks: ``read`` (used by the
+    FrameGrabber) decodes at ``reduction``, which the app lowers to 2, 4 or 8
+    while only the preview needs frames, and ``capture`` decodes the newest
+    image at full size and hands back its original bytes so they can be
+    saved without re-encoding. Drop-outs are retried with exponential
+    backoff, like IPCameraCapture.
+    """
+
+    def __init__(self, url, timeout=5.0, reduction=1, initial_backoff=0.5, max_backoff=10.0):
+        self.url = url
+        self.timeout = timeout
+        self.reduction = reduction
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._timestamp = 0.0
+        self._read_seq = 0
+        self._stop_event = threading.Event()
+        self._response = None
+        self._boundary = None
+        self.full_size = None  # (width, height) once a frame was decoded at full size
+        self.state = 'connecting'
+
+        # Stats
+        self.received = 0
+        self.decoded = 0
+        self.bytes_received = 0
+        self.reconnects = 0
+        self.decode_ms = 0.0
+        self.last_error = None
+        self.fps = 0.0
+        self._fps_count = 0
+        self._fps_start = time.time()
+
+        # Connect up front so a wrong URL or a non-MJPEG stream fails here
+        self._connect()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        import urllib.request  # pulls in http and email; only stream users pay for it
+        response = urllib.request.urlopen(self.url, timeout=self.timeout)
+        content_type = response.headers.get('Content-Type', '')
+        if 'multipart' not in content_type.lower() or 'boundary=' not in content_type:
+            response.close()
+            raise NotMJPEGStream(f"{self.url} is not an MJPEG stream ({content_type or 'no content type'})")
+        boundary = content_type.split('boundary=', 1)[1].split(';', 1)[0].strip().strip('"')
+        # Servers disagree on whether the parameter includes the leading dashes
+        self._boundary = boundary.lstrip('-').encode()
+        self._response = response
+        self.state = 'connected'
+
+    def _is_boundary(self, line):
+        line = line.strip()
+        return line.startswith(b'--') and line.lstrip(b'-').startswith(self._boundary)
+
+    def _read_part(self):
+        """Return the next JPEG in the stream; raises EOFError when the stream ends"""
+        stream = self._response
+        line = stream.readline()
+        while not self._is_boundary(line):
+            if not line:
+                raise EOFError("stream ended")
+            line = stream.readline()
+
+        length = None
+        while True:
+            line = stream.readline()
+            if not line:
+                raise EOFError("stream ended")
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'content-length':
+                length = int(value.strip())
+
+        if length is not None:
+            data = stream.read(length)
+            if len(data) < length:
+                raise EOFError("stream ended mid-frame")
+            return data
+
+        # No length header: the image runs up to the end-of-image marker
+        data = bytearray()
+        while True:
+            chunk = stream.readline()
+            if not chunk:
+                raise EOFError("stream ended mid-frame")
+            data += chunk
+            end = data.rfind(b'\xff\xd9')
+            if end != -1 and not data[end + 2:].strip():
+                return bytes(data[:end + 2])
+
+    def _run(self):
+        backoff = self.initial_backoff
+        while not self._stop_event.is_set():
+            try:
+                if self._response is None:
+                    self.state = 'reconnecting'
+                    self._connect()
+                    self.reconnects += 1
+                    backoff = self.initial_backoff
+                data = self._read_part()
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                self.last_error = str(e) or type(e).__name__
+                self.state = 'reconnecting'
+                if self._response is not None:
+                    self._response.close()
+                    self._response = None
+                if self._stop_event.wait(backoff):
+                    break
+                backoff = min(self.max_backoff, backoff * 2)
+                continue
+
+            timestamp = time.time()
+            with self._cond:
+                self._jpeg = data
+                self._seq += 1
+                self._timestamp = timestamp
+                self._cond.notify_all()
+            self.received += 1
+            self.bytes_received += len(data)
+            self._fps_count += 1
+            if timestamp - self._fps_start >= 1.0:
+                self.fps = self._fps_count / (timestamp - self._fps_start)
+                self._fps_count = 0
+                self._fps_start = timestamp
+
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def latest_jpeg(self):
+        """Return (seq, timestamp, jpeg_bytes) for the newest image, or (0, 0.0, None)"""
+        with self._cond:
+            return self._seq, self._timestamp, self._jpeg
+
+    def _decode(self, data, reduction):
+        start = time.perf_counter()
+        frame = decode_jpeg(data, reduction)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.decode_ms += (elapsed - self.decode_ms) * 0.1
+        METRICS.record('decode', elapsed)
+        self.decoded += 1
+        if frame is not None and reduction == 1:
+            self.full_size = (frame.shape[1], frame.shape[0])
+        return frame
+
+    def capture(self):
+        """Return (timestamp, jpeg_bytes, frame) for the newest image decoded at full size"""
+        _, timestamp, data = self.latest_jpeg()
+        if data is None:
+            return 0.0, None, None
+        return timestamp, data, self._decode(data, 1)
+
+    def read(self, image=None):
+        """Wait for an image newer than the last one read and decode it at ``reduction``.
+
+        Once the stream has delivered, this waits through drop-outs; before
+        the first image it gives up after ``timeout`` so opening can fail.
+        """
+        deadline = time.time() + self.timeout
+        with self._cond:
+            while self._seq == self._read_seq:
+                if self._stop_event.is_set() or (self._seq == 0 and time.time() > deadline):
+                    return False, None
+                self._cond.wait(0.5)
+            self._read_seq = self._seq
+            data = self._jpeg
+        frame = self._decode(data, self.reduction)
+        if frame is None:
+            return False, None
+        return True, frame
+
+    def interrupt(self):
+        """Wake a read that is waiting for the next image (used when stopping)"""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def isOpened(self):
+        return not self._stop_event.is_set()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if self.full_size and prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.full_size[0])
+        if self.full_size and prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.full_size[1])
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.interrupt()
+        response = self._response
+        if response is not None:
+            # Unblocks the reader thread if it is waiting on the socket
+            response.close()
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'received': self.received,
+            'decoded': self.decoded,
+            'skipped': max(0, self.received - self.decoded),
+            'bytes_received': self.bytes_received,
+            'reconnects': self.reconnects,
+            'decode_ms': self.decode_ms,
+            'reduction': self.reduction,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,119 @@
+import os
+import time
+
+
+class CpuMonitor:
+    """Fraction of total CPU capacity this process used since the last sample"""
+
+    def __init__(self):
+        self.cpus = os.cpu_count() or 1
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self.load = 0.0
+
+    def sample(self):
+        wall, cpu = time.perf_counter(), time.process_time()
+        if wall - self._wall > 0:
+            self.load = (cpu - self._cpu) / (wall - self._wall) / self.cpus
+        self._wall, self._cpu = wall, cpu
+        return self.load
+
+
+class FramePacer:
+    """Deadline-based frame pacing that follows the source and backs off under load.
+
+    The pacer learns the source cadence from frame timestamps (seeded with
+    a nominal rate such as CAP_PROP_FPS) and the time spent processing each
+    frame. ``delay()`` returns how long to wait until the next deadline, so
+    processing time is absorbed instead of added to a fixed sleep. ``adapt()``
+    lowers the target rate when the CPU is busy or the achieved rate falls
+    short, and raises it again, up to the source rate, once things recover.
+    """
+
+    def __init__(self, nominal_fps=None, min_fps=5.0, max_fps=60.0,
+                 high_load=0.85, low_load=0.6, smoothing=0.1):
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.high_load = high_load
+        self.low_load = low_load
+        self.smoothing = smoothing
+
+        self.source_fps = nominal_fps if nominal_fps and nominal_fps > 0 else None
+        self.target_fps = min(max_fps, self.source_fps or max_fps)
+        self.work_ms = 0.0
+        self._last_frame = None
+        self._deadline = None
+
+    @property
+    def period(self):
+        return 1.0 / self.target_fps
+
+    def observe_frame(self, timestamp):
+        """Feed the arrival time of a new source frame"""
+        if self._last_frame is not None:
+            interval = timestamp - self._last_frame
+            if interval > 0:
+                fps = 1.0 / interval
+                if self.source_fps is None:
+                    self.source_fps = fps
+                else:
+                    self.source_fps += (fps - self.source_fps) * self.smoothing
+        self._last_frame = timestamp
+
+    def observe_rate(self, fps):
+        """Feed a source rate measured over a window (e.g. new frames per second)"""
+        if self.source_fps is None:
+            self.source_fps = fps
+        else:
+            self.source_fps += (fps - self.source_fps) * 0.5
+
+    def observe_work(self, ms):
+        """Feed how long processing one frame took"""
+        self.work_ms += (ms - self.work_ms) * self.smoothing
+
+    def delay(self, now=None):
+        """Seconds to wait until the next deadline, advancing the schedule"""
+        if now is None:
+            now = time.perf_counter()
+        if self._deadline is None or now - self._deadline > self.period:
+            # First call, or fell more than a frame behind: restart the schedule
+            self._deadline = now
+        self._deadline += self.period
+        return max(0.0, self._deadline - now)
+
+    def ceiling(self):
+        """Highest useful rate: never faster than the source delivers"""
+        if self.source_fps:
+            return max(self.min_fps, min(self.max_fps, self.source_fps))
+        return self.max_fps
+
+    def adapt(self, cpu_load=0.0, achieved_fps=None, offered_fps=None):
+        """Adjust the target rate from CPU load and the rate actually achieved.
+
+        ``offered_fps`` is how many new frames were available; falling short
+        of it (or of the target, if lower) means frames are being dropped
+        for lack of time rather than by design.
+        """
+        ceiling = self.ceiling()
+        overloaded = cpu_load > self.high_load
+        # Work alone eating most of the frame budget leaves no headroom
+        overloaded = overloaded or self.work_ms > 0.8 * self.period * 1000
+        falling_behind = False
+        if achieved_fps is not None:
+            expected = self.target_fps if offered_fps is None else min(self.target_fps, offered_fps)
+            falling_behind = achieved_fps < 0.8 * expected
+
+        if overloaded or falling_behind:
+            self.target_fps = max(self.min_fps, self.target_fps * 0.8)
+        elif cpu_load < self.low_load:
+            # Recover quickly when the source picks up again (e.g. a static screen starts changing)
+            self.target_fps = min(ceiling, max(self.target_fps * 1.25, offered_fps or 0.0))
+        self.target_fps = min(self.target_fps, ceiling)
+        return self.target_fps
+
+    def stats(self):
+        return {
+            'target_fps': self.target_fps,
+            'source_fps': self.source_fps or 0.0,
+            'work_ms': self.work_ms,
+        }
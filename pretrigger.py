@@ -0,0 +1,210 @@
+import collections
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+from quality import QualityScorer
+
+
+class BufferedFrame:
+    """One frame held by the pre-trigger buffer, raw or JPEG-compressed"""
+
+    __slots__ = ('seq', 'timestamp', 'score', 'data', 'compressed')
+
+    def __init__(self, seq, timestamp, score, data, compressed):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.score = score
+        self.data = data
+        self.compressed = compressed
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def decode(self):
+        """Return the frame as a BGR array (a private copy)"""
+        if self.compressed:
+            return cv2.imdecode(self.data, cv2.IMREAD_COLOR)
+        return self.data.copy()
+
+
+class PreTriggerBuffer:
+    """Keeps the last ``seconds`` of grabbed frames within ``max_bytes`` of memory.
+
+    A background thread copies every new frame out of the FrameGrabber,
+    scores it with the quality monitor's scorer and appends it, evicting the
+    oldest frames once the time window or the memory budget is exceeded. With ``compress`` frames
+    are held as JPEG bytes, which fits many times more history into the same
+    budget at the cost of an encode per frame; raw buffers of evicted frames
+    are recycled so the uncompressed path doesn't allocate in steady state.
+    """
+
+    def __init__(self, grabber, seconds=5.0, max_bytes=256 * 1024 * 1024, compress=False, jpeg_quality=90):
+        self.grabber = grabber
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.jpeg_quality = jpeg_quality
+
+        self._frames = collections.deque()
+        self._spare = []
+        self._lock = threading.Condition()
+        self._stop_event = threading.Event()
+        self._triggers = 0
+        self._scorer = QualityScorer()
+        self.thread = None
+        self.is_running = False
+
+        # Stats
+        self.bytes_held = 0
+        self.evicted = 0
+        self.missed = 0
+        self.process_ms = 0.0
+        self.error = None
+
+    def start(self):
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.is_running = False
+        with self._lock:
+            self._frames.clear()
+            self._spare = []
+            self.bytes_held = 0
+            self._lock.notify_all()
+
+    def _take_buffer(self, shape, dtype):
+        while self._spare:
+            buf = self._spare.pop()
+            if buf.shape == shape and buf.dtype == dtype:
+                return buf
+        return np.empty(shape, dtype)
+
+    def _evict(self, now):
+        while self._frames and (now - self._frames[0].timestamp > self.seconds or self.bytes_held > self.max_bytes):
+            old = self._frames.popleft()
+            self.bytes_held -= old.nbytes
+            self.evicted += 1
+            # Frames held by a pending trigger must keep their buffers
+            if not old.compressed and not self._triggers and len(self._spare) < 4:
+                self._spare.append(old.data)
+
+    def _run(self):
+        last_seq = self.grabber.seq
+        try:
+            while not self._stop_event.is_set():
+                seq = self.grabber.wait_for_frame(last_seq, timeout=0.5)
+                if seq == last_seq:
+                    if not self.grabber.is_running:
+                        break
+                    continue
+
+                for s in range(last_seq + 1, seq + 1):
+                    start = time.perf_counter()
+                    shape, dtype = self.grabber.frame_format()
+                    if shape is None:
+                        break
+                    with self._lock:
+                        buf = self._take_buffer(shape, dtype)
+                    timestamp = self.grabber.copy_frame(s, buf)
+                    if timestamp is None:
+                        self.missed += 1
+                        continue
+
+                    score = self._scorer.score(buf, s, timestamp).score
+                    if self.compress:
+                        ok, data = cv2.imencode('.jpg', buf, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                        if not ok:
+                            continue
+                        with self._lock:
+                            self._spare.append(buf)
+                        entry = BufferedFrame(s, timestamp, score, data, True)
+                    else:
+                        entry = BufferedFrame(s, timestamp, score, buf, False)
+
+                    with self._lock:
+                        self._frames.append(entry)
+                        self.bytes_held += entry.nbytes
+                        self._evict(timestamp)
+                        METRICS.gauge('pretrigger_bytes', self.bytes_held)
+                        self._lock.notify_all()
+                    self.process_ms += ((time.perf_counter() - start) * 1000 - self.process_ms) * 0.1
+                last_seq = seq
+        except Exception as e:
+            self.error = e
+            print(f"Error buffering frames: {e}")
+            self._stop_event.set()
+        finally:
+            self.is_running = False
+            # Wake pending triggers so they hand over what was held
+            with self._lock:
+                self._lock.notify_all()
+
+    def snapshot(self, since=None, until=None):
+        """Return held BufferedFrames between two timestamps (all by default)"""
+        with self._lock:
+            return [f for f in self._frames
+                    if (since is None or f.timestamp >= since) and (until is None or f.timestamp <= until)]
+
+    def best_frame(self, window=None):
+        """Decode and return (timestamp, frame) of the sharpest frame in the last ``window`` seconds"""
+        since = time.time() - window if window else None
+        frames = self.snapshot(since=since)
+        if not frames:
+            return None, None
+        best = max(frames, key=lambda f: f.score)
+        return best.timestamp, best.decode()
+
+    def trigger(self, post_seconds=0.0, on_done=None):
+        """Collect the pre-trigger window plus ``post_seconds`` after now.
+
+        The frames already held are taken immediately, so the memory budget
+        can't evict them while the post-trigger frames arrive. Runs on a
+        background thread; ``on_done(trigger_time, frames)`` gets the list of
+        BufferedFrames once the post-trigger time has elapsed.
+        """
+        trigger_time = time.time()
+        with self._lock:
+            self._triggers += 1
+            before = list(self._frames)
+
+        def run():
+            end = trigger_time + post_seconds
+            after = []
+            try:
+                with self._lock:
+                    # Wait for the post-trigger frames to arrive
+                    self._lock.wait_for(lambda: self._stop_event.is_set() or
+                                        (self._frames and self._frames[-1].timestamp >= end),
+                                        timeout=post_seconds + 1.0)
+                    last_seq = before[-1].seq if before else 0
+                    after = [f for f in self._frames if f.seq > last_seq and f.timestamp <= end]
+            finally:
+                with self._lock:
+                    self._triggers -= 1
+            if on_done:
+                on_done(trigger_time, before + after)
+
+        threading.Thread(target=run, daemon=True).start()
+        return trigger_time
+
+    def stats(self):
+        with self._lock:
+            held = len(self._frames)
+            span = self._frames[-1].timestamp - self._frames[0].timestamp if held > 1 else 0.0
+            return {
+                'frames': held,
+                'seconds': span,
+                'bytes': self.bytes_held,
+                'max_bytes': self.max_bytes,
+                'evicted': self.evicted,
+                'missed': self.missed,
+                'process_ms': self.process_ms,
+            }
@@ -0,0 +1,288 @@
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageTk
+
+from change_detect import ChangeDetector
+from frame_format import DisplayConverter
+from metrics import METRICS
+from pacing import CpuMonitor, FramePacer
+
+
+class PreviewScheduler:
+    """Renders preview frames on the Tk main loop, at most one per display tick.
+
+    Frames come either from ``source(last_seq)``, which is polled on each tick
+    and returns ``(seq, frame)`` (``frame`` is None when nothing new arrived),
+    or from worker threads calling ``submit(frame)``. Only the newest frame is
+    kept; anything that is replaced before it is rendered counts as dropped.
+
+    Ticks are scheduled by a FramePacer: never faster than the source offers
+    new frames (seeded with ``nominal_fps``), against deadlines rather than
+    fixed sleeps, and slowed down when the CPU is busy or rendering can't
+    keep up.
+    """
+
+    def __init__(self, root, render, source=None, is_active=None, on_stopped=None,
+                 nominal_fps=None, max_fps=60.0):
+        self.root = root
+        self.render = render
+        self.source = source
+        self.is_active = is_active
+        self.on_stopped = on_stopped
+        self.pacer = FramePacer(nominal_fps, max_fps=max_fps)
+        self.cpu = CpuMonitor()
+
+        self._lock = threading.Lock()
+        self._pending = None
+        self._submitted = 0
+        self._last_seq = 0
+        self._after_id = None
+        self.is_running = False
+
+        # Stats
+        self.rendered = 0
+        self.dropped = 0
+        self.render_ms = 0.0
+        self.max_render_ms = 0.0
+        self.fps = 0.0
+        self._window_start = 0.0
+        self._window_rendered = 0
+        self._window_render_total = 0.0
+        self._window_first_seq = 0
+
+    def _schedule(self):
+        delay_ms = int(self.pacer.delay() * 1000)
+        self._after_id = self.root.after(max(1, delay_ms), self._tick)
+
+    def start(self):
+        self.is_running = True
+        self._window_start = time.perf_counter()
+        self.cpu.sample()
+        self._schedule()
+
+    def stop(self):
+        self.is_running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        with self._lock:
+            self._pending = None
+
+    def submit(self, frame):
+        """Offer a frame from any thread; replaces (and drops) an unrendered one"""
+        with self._lock:
+            self._submitted += 1
+            self._pending = (self._submitted, frame)
+
+    def _take(self):
+        if self.source is not None:
+            return self.source(self._last_seq)
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return self._last_seq, None
+        return pending
+
+    def _tick(self):
+        self._after_id = None
+        if not self.is_running:
+            return
+        if self.is_active is not None and not self.is_active():
+            self.stop()
+            if self.on_stopped:
+                self.on_stopped()
+            return
+
+        try:
+            seq, frame = self._take()
+            if frame is not None:
+                if seq > self._last_seq + 1 and self._last_seq:
+                    self.dropped += seq - self._last_seq - 1
+                    METRICS.count('preview_dropped', seq - self._last_seq - 1)
+                self._last_seq = seq
+
+                start = time.perf_counter()
+                self.render(frame)
+                elapsed = (time.perf_counter() - start) * 1000
+                self.pacer.observe_work(elapsed)
+                METRICS.record('render', elapsed)
+                METRICS.count('frames_rendered')
+                self.rendered += 1
+                self._window_rendered += 1
+                self._window_render_total += elapsed
+                self.max_render_ms = max(self.max_render_ms, elapsed)
+        except Exception as e:
+            print(f"Error rendering preview: {e}")
+
+        now = time.perf_counter()
+        if now - self._window_start >= 1.0:
+            window = now - self._window_start
+            self.fps = self._window_rendered / window
+            if self._window_rendered:
+                self.render_ms = self._window_render_total / self._window_rendered
+            # New frames the source offered during the window, rendered or not
+            offered = (self._last_seq - self._window_first_seq) / window if self._window_first_seq else None
+            if offered is not None:
+                self.pacer.observe_rate(offered)
+            self.pacer.adapt(self.cpu.sample(), achieved_fps=self.fps, offered_fps=offered)
+            self._window_start = now
+            self._window_rendered = 0
+            self._window_render_total = 0.0
+            self._window_first_seq = self._last_seq
+
+        if self.is_running:
+            self._schedule()
+
+    def stats(self):
+        """Return a snapshot of preview statistics"""
+        return {
+            'fps': self.fps,
+            'rendered': self.rendered,
+            'dropped': self.dropped,
+            'render_ms': self.render_ms,
+            'max_render_ms': self.max_render_ms,
+            'target_fps': self.pacer.target_fps,
+            'cpu_load': self.cpu.load,
+        }
+
+
+class PreviewRenderer:
+    """Draws BGR frames into a label without per-frame allocations.
+
+    The target size is recomputed only when the container fires <Configure>
+    or the frame shape changes. A DisplayConverter resizes and converts
+    frames of ``source_format`` into a preallocated RGBA buffer, and a single
+    PhotoImage is updated in place with ``paste``; the PIL image shares
+    memory with that buffer.
+
+    With ``detect_changes`` frames identical to the last rendered one are
+    skipped, and when only part of the frame changed just those tiles are
+    resized and converted.
+    """
+
+    def __init__(self, label, container, min_size=(640, 480), padding=(20, 40), detect_changes=False,
+                 source_format='BGR'):
+        self.label = label
+        self.container = container
+        self.min_size = min_size
+        self.padding = padding
+        self.source_format = source_format
+
+        self._widget_size = min_size
+        self._frame_shape = None
+        self._target_size = None
+        self._converter = None
+        self._pil_image = None
+        self.photo = None
+
+        self.detector = ChangeDetector() if detect_changes else None
+        self._needs_full = True
+        self.skipped = 0
+        self.partial = 0
+
+        container.bind('<Configure>', self.on_configure, add='+')
+
+    @property
+    def widget_size(self):
+        """Space available for the preview image, in pixels"""
+        return self._widget_size
+
+    def on_configure(self, event):
+        """Recompute the target size when the preview area is resized"""
+        widget_size = (max(self.min_size[0], event.width - self.padding[0]),
+                       max(self.min_size[1], event.height - self.padding[1]))
+        if widget_size != self._widget_size:
+            self._widget_size = widget_size
+            self._frame_shape = None  # force geometry refresh on next frame
+
+    def _update_geometry(self, frame):
+        frame_height, frame_width = frame.shape[:2]
+        widget_width, widget_height = self._widget_size
+
+        # Calculate scaling factor to maintain aspect ratio
+        scale = min(widget_width / frame_width, widget_height / frame_height)
+        new_width = max(1, int(frame_width * scale))
+        new_height = max(1, int(frame_height * scale))
+
+        self._frame_shape = frame.shape
+        self._needs_full = True
+        if self._target_size == (new_width, new_height) and self._converter.fits(frame):
+            return
+        new_size = self._target_size != (new_width, new_height)
+        self._target_size = (new_width, new_height)
+
+        # Reallocate the buffers, and the PhotoImage when the size changed
+        self._converter = DisplayConverter((frame_width, frame_height), self._target_size, self.source_format, 'RGBA')
+        self._pil_image = Image.frombuffer('RGBA', self._target_size, self._converter.output, 'raw', 'RGBA', 0, 1)
+        if new_size or self.photo is None:
+            self.photo = self._create_photo(self._target_size)
+            self.label.config(image=self.photo, text="")
+            self.label.image = self.photo  # Keep a reference
+
+    def _create_photo(self, size):
+        return ImageTk.PhotoImage('RGBA', size)
+
+    def render(self, frame):
+        """Resize, convert and paste a BGR frame into the persistent PhotoImage"""
+        if frame.shape != self._frame_shape:
+            self._update_geometry(frame)
+
+        if self.detector is not None:
+            change = self.detector.update(frame)
+            if not self._needs_full:
+                if not change.changed:
+                    self.skipped += 1
+                    return
+                if change.fraction < 0.5:
+                    self._render_rects(frame, change.rects())
+                    start = time.perf_counter()
+                    self.photo.paste(self._pil_image)
+                    METRICS.record_since('photoimage', start)
+                    self.partial += 1
+                    return
+
+        self._converter.convert(frame)
+        start = time.perf_counter()
+        self.photo.paste(self._pil_image)
+        METRICS.record_since('photoimage', start)
+        self._needs_full = False
+
+    def _render_rects(self, frame, rects):
+        """Resize and convert only the given frame rectangles into the preview buffer"""
+        frame_height, frame_width = frame.shape[:2]
+        target_width, target_height = self._target_size
+        scale_x = target_width / frame_width
+        scale_y = target_height / frame_height
+        for x, y, width, height in rects:
+            # Destination box, then the source box that maps onto it exactly
+            dx0, dy0 = int(x * scale_x), int(y * scale_y)
+            dx1 = min(target_width, int(np.ceil((x + width) * scale_x)))
+            dy1 = min(target_height, int(np.ceil((y + height) * scale_y)))
+            if dx1 <= dx0 or dy1 <= dy0:
+                continue
+            sx0, sy0 = int(dx0 / scale_x), int(dy0 / scale_y)
+            sx1 = min(frame_width, int(np.ceil(dx1 / scale_x)))
+            sy1 = min(frame_height, int(np.ceil(dy1 / scale_y)))
+            self._converter.convert_region(frame[sy0:sy1, sx0:sx1], self._converter.output[dy0:dy1, dx0:dx1])
+
+    def set_change_detection(self, enabled):
+        """Turn skipping of unchanged frames/tiles on or off"""
+        if enabled and self.detector is None:
+            self.detector = ChangeDetector()
+        elif not enabled:
+            self.detector = None
+        self._needs_full = True
+
+    def reset(self):
+        """Forget the current PhotoImage, e.g. after the label was cleared"""
+        self._frame_shape = None
+        self._target_size = None
+        self._needs_full = True
+        self.photo = None
+        if self.detector is not None:
+            self.detector.reset()
@@ -0,0 +1,290 @@
+"""Frame quality scoring and picking the best recent frame.
+
+Every frame is scored on a small grey copy: sharpness is the variance of
+the Laplacian, exposure comes from the grey-level histogram and motion is
+the mean difference from the previously scored frame. Phone cameras over
+USB or Wi-Fi often deliver motion-blurred frames or frames taken while the
+autofocus is still hunting; keeping the few best frames of the last seconds
+lets Capture return a sharp one instead of whatever arrived last.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_format import shrink
+from metrics import METRICS
+
+# Frames are shrunk by a power of two to no less than this width before scoring
+SCORE_WIDTH = 320
+
+# Grey levels at either end of the histogram that count as clipped
+CLIP_LEVELS = 8
+
+# Mean absolute grey-level change between scored frames below which the view is steady
+STEADY_MOTION = 2.0
+
+
+class FrameQuality:
+    """Scores of one frame; ``score`` (sharpness weighted by exposure) ranks frames"""
+
+    __slots__ = ('seq', 'timestamp', 'sharpness', 'brightness', 'clipped', 'motion', 'score')
+
+    def __init__(self, seq, timestamp, sharpness, brightness, clipped, motion):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.sharpness = sharpness
+        self.brightness = brightness
+        self.clipped = clipped  # fraction of pixels at the ends of the histogram
+        self.motion = motion  # None for the first frame
+        self.score = sharpness * exposure_weight(brightness, clipped)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def exposure_weight(brightness, clipped):
+    """1.0 for a well exposed frame, falling towards 0 as it gets very dark, very bright or clipped"""
+    level = min(1.0, brightness / 64.0, (255.0 - brightness) / 64.0)
+    return max(0.0, level) * (1.0 - clipped)
+
+
+def score_factor(width, target=SCORE_WIDTH):
+    """Largest power of two that keeps ``width`` at or above ``target`` pixels"""
+    factor = 1
+    while width // (factor * 2) >= target:
+        factor *= 2
+    return factor
+
+
+class QualityScorer:
+    """Scores frames of one size, reusing its small grey buffers between calls"""
+
+    def __init__(self, target_width=SCORE_WIDTH):
+        self.target_width = target_width
+        self._gray = None
+        self._previous = None
+        self._diff = None
+
+    def reset(self):
+        """Forget the previous frame, e.g. after the view changed completely"""
+        self._previous = None
+
+    def score(self, frame, seq=0, timestamp=0.0):
+        """Return the FrameQuality of a BGR (or grey) frame"""
+        small = shrink(frame, score_factor(frame.shape[1], self.target_width))
+        if small.ndim == 3:
+            if self._gray is None or self._gray.shape != small.shape[:2]:
+                self._gray = np.empty(small.shape[:2], np.uint8)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        else:
+            gray = small
+
+        _, deviation = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+        sharpness = float(deviation[0, 0]) ** 2
+        histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        clipped = float(histogram[:CLIP_LEVELS].sum() + histogram[-CLIP_LEVELS:].sum()) / gray.size
+        brightness = float(np.dot(histogram, np.arange(256, dtype=np.float32))) / gray.size
+
+        motion = None
+        if self._previous is not None and self._previous.shape == gray.shape:
+            if self._diff is None or self._diff.shape != gray.shape:
+                self._diff = np.empty_like(gray)
+            cv2.absdiff(gray, self._previous, dst=self._diff)
+            motion = float(cv2.mean(self._diff)[0])
+        # Swap rather than copy: the grey buffer of this frame becomes the previous one
+        if gray is self._gray:
+            self._gray, self._previous = self._previous, gray
+        else:
+            self._previous = gray.copy()
+        return FrameQuality(seq, timestamp, sharpness, brightness, clipped, motion)
+
+
+class QualityMonitor:
+    """Scores the newest grabbed frames and keeps the ``top_k`` best of the last ``window`` seconds.
+
+    A background thread copies the newest frame out of the FrameGrabber and
+    scores it. It never waits on the grabber and skips straight to the
+    newest frame when it falls behind, so the grab rate is unaffected; to
+    bound its CPU use it also leaves at least ``(1 - max_load)`` of each
+    scoring interval idle, skipping frames as needed. Frames that make the
+    top ``top_k`` keep their buffer; the rest reuse one spare, so steady
+    state doesn't allocate.
+
+    With ``on_auto_capture`` set, ``on_auto_capture(quality, frame)`` is
+    called (on the monitor thread) for a frame that is steady for
+    ``steady_frames`` scored frames in a row, scores at least
+    ``auto_ratio`` of the best score in the window and at least
+    ``min_sharpness``; then not again for ``cooldown`` seconds.
+    """
+
+    def __init__(self, grabber, top_k=3, window=2.0, max_load=0.25, on_auto_capture=None, auto_ratio=0.9,
+                 min_sharpness=20.0, steady_frames=3, cooldown=2.0):
+        self.grabber = grabber
+        self.top_k = top_k
+        self.window = window
+        self.max_load = max_load
+        self.on_auto_capture = on_auto_capture
+        self.auto_ratio = auto_ratio
+        self.min_sharpness = min_sharpness
+        self.steady_frames = steady_frames
+        self.cooldown = cooldown
+
+        self.scorer = QualityScorer()
+        self._best = []  # (FrameQuality, frame), best first
+        self._spare = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.is_running = False
+
+        # Stats
+        self.latest = None  # FrameQuality of the last scored frame
+        self.scored = 0
+        self.skipped = 0
+        self.auto_captures = 0
+        self.process_ms = 0.0  # smoothed copy + score time per frame
+        self.busy_s = 0.0
+        self.started = 0.0
+        self.error = None
+        self._steady = 0
+        self._last_auto = 0.0
+
+    def start(self):
+        self.is_running = True
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.is_running = False
+        with self._lock:
+            self._best = []
+            self._spare = None
+
+    def _buffer(self, shape, dtype):
+        # Lock held
+        if self._best and self._best[0][1].shape != shape:
+            # The source changed size: earlier frames can't be compared any more
+            self._best = []
+            self.scorer.reset()
+        spare, self._spare = self._spare, None
+        if spare is None or spare.shape != shape or spare.dtype != dtype:
+            spare = np.empty(shape, dtype)
+        return spare
+
+    def _keep(self, quality, frame):
+        """Add a scored frame to the top-K; returns whether it made it"""
+        with self._lock:
+            oldest = quality.timestamp - self.window
+            dropped = [entry for entry in self._best if entry[0].timestamp < oldest]
+            best = [entry for entry in self._best if entry[0].timestamp >= oldest]
+            best.append((quality, frame))
+            best.sort(key=lambda entry: entry[0].score, reverse=True)
+            dropped.extend(best[self.top_k:])
+            self._best = best[:self.top_k]
+            kept = any(entry[1] is frame for entry in self._best)
+            free = [entry[1] for entry in dropped]
+            if not kept:
+                free.append(frame)
+            if free:
+                self._spare = free[0]
+            return kept
+
+    def _run(self):
+        last_seq = self.grabber.seq
+        next_allowed = 0.0
+        try:
+            while not self._stop_event.is_set():
+                seq = self.grabber.wait_for_frame(last_seq, timeout=0.5)
+                if seq == last_seq:
+                    if not self.grabber.is_running:
+                        break
+                    continue
+                now = time.perf_counter()
+                if now < next_allowed:
+                    # Over the CPU budget: let this frame go and wait for a later one
+                    self.skipped += seq - last_seq
+                    last_seq = seq
+                    continue
+                self.skipped += seq - last_seq - 1
+                last_seq = seq
+
+                shape, dtype = self.grabber.frame_format()
+                if shape is None:
+                    continue
+                with self._lock:
+                    buf = self._buffer(shape, dtype)
+                timestamp = self.grabber.copy_frame(seq, buf)
+                if timestamp is None:
+                    with self._lock:
+                        self._spare = buf
+                    self.skipped += 1
+                    continue
+                quality = self.scorer.score(buf, seq, timestamp)
+                kept = self._keep(quality, buf)
+
+                elapsed = (time.perf_counter() - now) * 1000
+                METRICS.record('score', elapsed)
+                self.process_ms += (elapsed - self.process_ms) * 0.1 if self.scored else elapsed
+                self.busy_s += elapsed / 1000
+                self.scored += 1
+                self.latest = quality
+                next_allowed = now + elapsed / 1000 / max(0.01, self.max_load)
+
+                if self.on_auto_capture is not None:
+                    self._check_auto_capture(quality, buf if kept else None)
+        except Exception as e:
+            self.error = e
+            print(f"Error scoring frames: {e}")
+        finally:
+            self.is_running = False
+
+    def _check_auto_capture(self, quality, frame):
+        steady = quality.motion is not None and quality.motion < STEADY_MOTION
+        self._steady = self._steady + 1 if steady else 0
+        if frame is None or self._steady < self.steady_frames:
+            return
+        if quality.timestamp - self._last_auto < self.cooldown or quality.sharpness < self.min_sharpness:
+            return
+        with self._lock:
+            peak = self._best[0][0].score if self._best else 0.0
+            if quality.score < peak * self.auto_ratio:
+                return
+            frame = frame.copy()
+        self._last_auto = quality.timestamp
+        self.auto_captures += 1
+        METRICS.count('auto_captures')
+        try:
+            self.on_auto_capture(quality, frame)
+        except Exception as e:
+            print(f"Error in auto-capture callback: {e}")
+
+    def best(self, window=None):
+        """Return (FrameQuality, frame copy) of the best frame of the last ``window`` seconds, or (None, None)"""
+        window = self.window if window is None else window
+        since = time.time() - window
+        with self._lock:
+            for quality, frame in self._best:
+                if quality.timestamp >= since:
+                    return quality, frame.copy()
+        return None, None
+
+    def stats(self):
+        latest = self.latest
+        with self._lock:
+            best = self._best[0][0] if self._best else None
+        return {
+            'scored': self.scored,
+            'skipped': self.skipped,
+            'auto_captures': self.auto_captures,
+            'process_ms': self.process_ms,
+            'load': self.busy_s / max(1e-6, time.perf_counter() - self.started),  # fraction of one core
+            'sharpness': latest.sharpness if latest else None,
+            'motion': latest.motion if latest else None,
+            'brightness': latest.brightness if latest else None,
+            'best_score': best.score if best else None,
+            'steady': self._steady >= self.steady_frames,
+        }
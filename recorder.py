@@ -0,0 +1,268 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+from burst import FramePool
+from metrics import METRICS
+
+# Container formats for cv2.VideoWriter, plus a plain JPEG sequence
+RECORD_FORMATS = {
+    'MJPG': ('.avi', 'MJPG'),
+    'mp4v': ('.mp4', 'mp4v'),
+    'JPEG sequence': (None, None),
+}
+
+
+class VideoRecorder:
+    """Streams frames from a FrameGrabber to disk on a separate encoder thread.
+
+    A feeder thread copies every new grabbed frame into a preallocated pool
+    buffer and queues it; the encoder thread writes queued frames to a
+    cv2.VideoWriter or as numbered JPEGs. When the encoder falls behind and
+    the pool runs dry, frames are dropped and counted rather than stalling
+    the grabber or the preview. Output is split into segments by duration
+    and by size.
+
+    Video files play at a fixed ``fps``, so frames are placed by their
+    timestamps: frame i of a segment is the one shown at its start + i/fps.
+    Gaps (a stalled stream, dropped frames, a source slower than ``fps``)
+    are filled by repeating the previous frame, and frames arriving faster
+    than ``fps`` are left out, so recordings play back in real time. JPEG
+    sequences keep every frame as it arrived.
+    """
+
+    def __init__(self, grabber, output_dir, record_format='MJPG', fps=None,
+                 segment_seconds=300, segment_bytes=1024 * 1024 * 1024,
+                 queue_frames=64, jpeg_quality=90, prefix="recording"):
+        if record_format not in RECORD_FORMATS:
+            raise ValueError(f"Unknown record format: {record_format}")
+        self.grabber = grabber
+        self.output_dir = output_dir
+        self.record_format = record_format
+        self.fps = fps
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.queue_frames = queue_frames
+        self.jpeg_quality = jpeg_quality
+        # Milliseconds, so a recording started within the same second gets its own files
+        self.prefix = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}"
+
+        self.pool = None
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self.is_running = False
+        self.feeder = None
+        self.encoder = None
+
+        # Current segment
+        self._writer = None
+        self._segment_path = None
+        self._segment_start = 0.0
+        self._segment_bytes = 0
+        self._segment_frames = 0
+        self._previous = None  # copy of the last frame written, to fill gaps with
+        self.segments = []
+
+        # Stats
+        self.recorded = 0
+        self.dropped = 0  # encoder too slow: no free buffer
+        self.missed = 0   # overwritten in the grabber ring before we copied it
+        self.repeated = 0  # frames written again to fill gaps in the source
+        self.discarded = 0  # arrived faster than the video's frame rate
+        self.bytes_written = 0
+        self.encode_ms = 0.0
+        self.started = 0.0
+        self.finished = 0.0  # when the recording stopped
+        self.error = None
+
+    def start(self):
+        _, _, frame = self.grabber.latest()
+        if frame is None:
+            raise Exception("No frames to record")
+        self.pool = FramePool(frame.shape, frame.dtype, self.queue_frames)
+        if not self.fps:
+            self.fps = self.grabber.nominal_fps or self.grabber.fps or 30.0
+
+        self.is_running = True
+        self.started = time.time()
+        self.finished = 0.0
+        self.feeder = threading.Thread(target=self._feed, daemon=True)
+        self.encoder = threading.Thread(target=self._encode, daemon=True)
+        self.encoder.start()
+        self.feeder.start()
+
+    def stop(self):
+        """Stop feeding; the encoder finishes the queued frames and closes the segment"""
+        self._stop_event.set()
+
+    def _feed(self):
+        last_seq = self.grabber.seq
+        while not self._stop_event.is_set():
+            seq = self.grabber.wait_for_frame(last_seq, timeout=0.5)
+            if seq == last_seq:
+                if not self.grabber.is_running:
+                    break
+                continue
+            for s in range(last_seq + 1, seq + 1):
+                buf = self.pool.acquire(timeout=0)
+                if buf is None:
+                    self.dropped += 1
+                    METRICS.count('record_dropped')
+                    continue
+                timestamp = self.grabber.copy_frame(s, buf)
+                if timestamp is None:
+                    self.pool.release(buf)
+                    self.missed += 1
+                    continue
+                self._queue.put((buf, timestamp))
+            last_seq = seq
+        self._queue.put(None)
+
+    def _encode(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                buf, timestamp = item
+                try:
+                    start = time.perf_counter()
+                    if not self._write(buf, timestamp):
+                        continue
+                    elapsed = (time.perf_counter() - start) * 1000
+                    self.encode_ms += (elapsed - self.encode_ms) * 0.1
+                    METRICS.record('record_encode', elapsed)
+                    METRICS.count('recorded')
+                    self.recorded += 1
+                finally:
+                    self.pool.release(buf)
+        except Exception as e:
+            self.error = e
+            print(f"Error recording video: {e}")
+            self._stop_event.set()
+            # Keep draining so the feeder never blocks on a dead encoder
+            while self._queue.get() is not None:
+                pass
+        finally:
+            self._close_segment()
+            self.finished = time.time()
+            self.is_running = False
+
+    def _needs_new_segment(self, timestamp):
+        if self._segment_path is None:
+            return True
+        # By video frame slot, so a segment never holds more than segment_seconds of video
+        if self.segment_seconds and self._slot(timestamp) >= self._segment_length():
+            return True
+        return bool(self.segment_bytes) and self._segment_bytes >= self.segment_bytes
+
+    def _open_segment(self, frame, timestamp):
+        self._close_segment()
+        extension, fourcc = RECORD_FORMATS[self.record_format]
+        name = f"{self.prefix}_{len(self.segments):03d}"
+        # Never write into an earlier recording's segment
+        path = os.path.join(self.output_dir, name)
+        suffix = 0
+        while os.path.exists(path + (extension or "")):
+            suffix += 1
+            path = os.path.join(self.output_dir, f"{name}_{suffix}")
+        if fourcc is None:
+            self._segment_path = path
+            os.makedirs(self._segment_path)
+        else:
+            self._segment_path = path + extension
+            height, width = frame.shape[:2]
+            self._writer = cv2.VideoWriter(self._segment_path, cv2.VideoWriter_fourcc(*fourcc),
+                                           float(self.fps), (width, height))
+            if not self._writer.isOpened():
+                self._writer = None
+                raise Exception(f"Cannot open video writer for {self._segment_path}")
+        self._segment_start = timestamp
+        self._segment_bytes = 0
+        self._segment_frames = 0
+        self.segments.append(self._segment_path)
+
+    def _close_segment(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+            try:
+                size = os.path.getsize(self._segment_path)
+                self.bytes_written += size - self._segment_bytes
+                self._segment_bytes = size
+            except OSError:
+                pass
+
+    def _slot(self, timestamp):
+        """Index of the video frame shown at ``timestamp`` in the current segment"""
+        return int((timestamp - self._segment_start) * self.fps + 0.5)
+
+    def _segment_length(self):
+        return int(self.segment_seconds * self.fps + 0.5)
+
+    def _fill(self, target):
+        """Repeat the previous frame until ``target`` frames are in the segment"""
+        while self._segment_frames < target:
+            self._writer.write(self._previous)
+            self._segment_frames += 1
+            self.repeated += 1
+
+    def _write(self, frame, timestamp):
+        """Write one grabbed frame; returns False if it was left out"""
+        if self._needs_new_segment(timestamp):
+            if self._writer is not None and self.segment_seconds:
+                # Play the last frame to the end of the segment
+                self._fill(min(self._slot(timestamp), self._segment_length()))
+            self._open_segment(frame, timestamp)
+
+        if self._writer is None:
+            path = os.path.join(self._segment_path, f"frame_{self._segment_frames:06d}.jpg")
+            ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise Exception(f"Could not encode {path}")
+            with open(path, "wb") as f:
+                f.write(data)
+            self._segment_bytes += len(data)
+            self.bytes_written += len(data)
+        else:
+            slot = self._slot(timestamp)
+            if slot < self._segment_frames:
+                # That frame's time is already filled
+                self.discarded += 1
+                return False
+            self._fill(slot)
+            self._writer.write(frame)
+            if self._previous is None or self._previous.shape != frame.shape:
+                self._previous = frame.copy()
+            else:
+                self._previous[...] = frame
+            # VideoWriter buffers internally; the file size is close enough for rotation
+            if self._segment_frames % 30 == 0:
+                try:
+                    size = os.path.getsize(self._segment_path)
+                    self.bytes_written += size - self._segment_bytes
+                    self._segment_bytes = size
+                except OSError:
+                    pass
+        self._segment_frames += 1
+        return True
+
+    def stats(self):
+        elapsed = max(1e-6, (self.finished or time.time()) - self.started) if self.started else 0.0
+        return {
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'missed': self.missed,
+            'repeated': self.repeated,
+            'discarded': self.discarded,
+            'queued': self._queue.qsize(),
+            'segments': len(self.segments),
+            'bytes_written': self.bytes_written,
+            'encode_ms': self.encode_ms,
+            'fps': self.recorded / elapsed if elapsed else 0.0,
+            'running': self.is_running,
+        }
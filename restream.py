@@ -0,0 +1,320 @@
+"""Re-serve the grabbed frames over HTTP, so one capture feeds many viewers.
+
+A USB camera can only be opened by one process, so while the app holds it
+other tools can't see it. RestreamServer serves whatever the grabber
+delivers on localhost:
+
+    /stream, /video     multipart MJPEG, like an IP camera (so cli.py and the
+                        app itself can connect to http://host:port/video)
+    /snapshot, /shot.jpg
+                        the newest frame as one JPEG
+    /stats              JSON counters
+
+Each frame is encoded once, by one thread, and the same bytes go to every
+client. Clients always send the newest frame when they are ready for the
+next one, so a slow reader skips frames instead of holding up the encoder
+or the other clients. Nothing is encoded while nobody is watching. An MJPEG
+camera's own JPEGs are passed through without being decoded or re-encoded.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+DEFAULT_PORT = 8090
+
+BOUNDARY = b"frame"
+
+INDEX_PAGE = b"""<!doctype html>
+<title>Smart-Capture stream</title>
+<body style="margin:0;background:#000">
+<img src="/stream" style="display:block;max-width:100%;max-height:100vh;margin:auto">
+</body>
+"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Socket timeout: a client that stops reading for this long is dropped
+    timeout = 10
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        restream = self.server.restream
+        url = urlsplit(self.path)
+        try:
+            if url.path in ("/stream", "/video"):
+                fps = parse_qs(url.query).get('fps', [None])[0]
+                restream.serve_stream(self, float(fps) if fps else None)
+            elif url.path in ("/snapshot", "/shot.jpg"):
+                restream.serve_snapshot(self)
+            elif url.path == "/stats":
+                self._send(200, "application/json", json.dumps(restream.stats()).encode())
+            elif url.path in ("/", "/index.html"):
+                self._send(200, "text/html", INDEX_PAGE)
+            else:
+                self._send(404, "text/plain", b"Not found\n")
+        except (OSError, ValueError):
+            # Client went away or sent a bad query
+            pass
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RestreamServer:
+    """Serves a FrameGrabber's frames as MJPEG and JPEG snapshots over HTTP.
+
+    The server keeps listening across sources: ``set_source`` points it at
+    a new grabber (and, for MJPEG cameras, the capture whose ``latest_jpeg``
+    can be passed through), and ``set_source(None)`` leaves connected
+    clients waiting until there is a source again. ``port=0`` picks a free
+    port; ``port`` holds the real one once started.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, quality=80):
+        self.host = host
+        self.port = port
+        self.quality = quality
+
+        self._grabber = None
+        self._jpeg_source = None
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._timestamp = 0.0
+        self.seq = 0  # frames published; clients wait for it to move on
+        self._frame_seq = 0  # grabber seq of the published frame
+        self._watchers = 0  # streaming clients plus waiting snapshot requests
+        self._buffer = None
+        self._stop_event = threading.Event()
+        self._httpd = None
+        self._server_thread = None
+        self.thread = None
+        self.is_running = False
+
+        # Stats
+        self.clients = 0
+        self.connections = 0
+        self.encoded = 0
+        self.passed_through = 0
+        self.sent = 0
+        self.dropped = 0
+        self.snapshots = 0
+        self.bytes_sent = 0
+        self.encode_ms = 0.0
+
+    @property
+    def url(self):
+        host = "localhost" if self.host in ("", "0.0.0.0", "127.0.0.1") else self.host
+        return f"http://{host}:{self.port}/"
+
+    def start(self):
+        """Bind and start serving; raises OSError if the port is taken"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.restream = self
+        self.port = self._httpd.server_address[1]
+        self._stop_event.clear()
+        self.is_running = True
+        self._server_thread = threading.Thread(target=self._httpd.serve_forever, kwargs={'poll_interval': 0.5},
+                                               daemon=True)
+        self._server_thread.start()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.is_running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def set_source(self, grabber, jpeg_source=None):
+        """Serve frames from ``grabber`` from now on (None: no source)"""
+        with self._cond:
+            self._grabber = grabber
+            self._jpeg_source = jpeg_source
+            self._frame_seq = 0
+            self._jpeg = None
+            self._cond.notify_all()
+
+    # --- Encoding ---------------------------------------------------------
+
+    def _run(self):
+        last_seq = 0
+        grabber = None
+        while not self._stop_event.is_set():
+            with self._cond:
+                self._cond.wait_for(lambda: self._stop_event.is_set()
+                                    or (self._watchers and self._grabber is not None), timeout=0.5)
+                if self._stop_event.is_set() or not self._watchers or self._grabber is None:
+                    continue
+                if self._grabber is not grabber:
+                    grabber = self._grabber
+                    last_seq = 0
+                jpeg_source = self._jpeg_source
+
+            seq = grabber.wait_for_frame(last_seq, timeout=0.5)
+            if seq == last_seq:
+                if not grabber.is_running:
+                    # The source ended; wait for the next set_source
+                    self._stop_event.wait(0.1)
+                continue
+            last_seq = seq
+            if jpeg_source is not None:
+                _, timestamp, data = jpeg_source.latest_jpeg()
+                if data is None:
+                    continue
+                self.passed_through += 1
+            else:
+                timestamp, data = self._encode(grabber, seq)
+                if data is None:
+                    continue
+            with self._cond:
+                if self._grabber is not grabber:
+                    continue
+                self._jpeg = data
+                self._timestamp = timestamp
+                self._frame_seq = seq
+                self.seq += 1
+                self._cond.notify_all()
+
+    def _encode(self, grabber, seq):
+        """Copy frame ``seq`` out of the grabber and JPEG-encode it; (timestamp, data) or (None, None)"""
+        shape, dtype = grabber.frame_format()
+        if shape is None:
+            return None, None
+        if self._buffer is None or self._buffer.shape != shape or self._buffer.dtype != dtype:
+            self._buffer = np.empty(shape, dtype)
+        timestamp = grabber.copy_frame(seq, self._buffer)
+        if timestamp is None:
+            return None, None
+        start = time.perf_counter()
+        ok, data = cv2.imencode('.jpg', self._buffer, [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)])
+        elapsed = (time.perf_counter() - start) * 1000
+        if not ok:
+            return None, None
+        METRICS.record('stream_encode', elapsed)
+        self.encode_ms += (elapsed - self.encode_ms) * 0.1 if self.encoded else elapsed
+        self.encoded += 1
+        # Shared read-only by every client; sent straight from the array
+        return timestamp, data
+
+    def _watch(self, delta):
+        with self._cond:
+            self._watchers += delta
+            self.clients += delta
+            self._cond.notify_all()
+        METRICS.gauge('stream_clients', self.clients)
+
+    def wait_for_jpeg(self, seq, timeout=None):
+        """Block until a frame newer than published ``seq`` exists; return (seq, timestamp, jpeg)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq or self._stop_event.is_set(), timeout)
+            return self.seq, self._timestamp, self._jpeg
+
+    # --- Clients ----------------------------------------------------------
+
+    def serve_stream(self, handler, fps=None):
+        """Send multipart JPEGs to one client until it disconnects or the server stops"""
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY.decode()}")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+
+        interval = 1.0 / fps if fps else 0.0
+        self.connections += 1
+        self._watch(1)
+        last_seq = 0
+        next_send = 0.0
+        try:
+            while not self._stop_event.is_set():
+                seq, timestamp, jpeg = self.wait_for_jpeg(last_seq, timeout=1.0)
+                if seq == last_seq or jpeg is None:
+                    continue
+                if interval:
+                    now = time.perf_counter()
+                    if now < next_send:
+                        self._stop_event.wait(next_send - now)
+                        # Send whatever is newest by then
+                        seq, timestamp, jpeg = self.wait_for_jpeg(last_seq, timeout=0)
+                    next_send = max(now, next_send) + interval
+                if last_seq:
+                    # Frames published while this client was still writing the last one
+                    self.dropped += seq - last_seq - 1
+                last_seq = seq
+                header = (b"--" + BOUNDARY + b"\r\nContent-Type: image/jpeg\r\n"
+                          + f"Content-Length: {len(jpeg)}\r\nX-Timestamp: {timestamp:.3f}\r\n\r\n".encode())
+                handler.wfile.write(header)
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+                self.sent += 1
+                self.bytes_sent += len(jpeg)
+                METRICS.count('stream_frames_sent')
+        finally:
+            self._watch(-1)
+
+    def snapshot(self, timeout=2.0):
+        """Return (timestamp, jpeg) of a frame at least as new as the grabber's newest now, or (None, None)"""
+        with self._cond:
+            grabber = self._grabber
+            if grabber is None:
+                return None, None
+            wanted = grabber.seq
+            if self._jpeg is not None and self._frame_seq >= wanted:
+                return self._timestamp, self._jpeg
+            self._watchers += 1
+            self._cond.notify_all()
+            try:
+                self._cond.wait_for(lambda: (self._jpeg is not None and self._frame_seq >= wanted)
+                                    or self._grabber is not grabber or self._stop_event.is_set(), timeout)
+                if self._jpeg is None or self._grabber is not grabber:
+                    return None, None
+                return self._timestamp, self._jpeg
+            finally:
+                self._watchers -= 1
+
+    def serve_snapshot(self, handler):
+        timestamp, jpeg = self.snapshot()
+        if jpeg is None:
+            handler._send(503, "text/plain", b"No frame available\n")
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/jpeg")
+        handler.send_header("Content-Length", str(len(jpeg)))
+        handler.send_header("X-Timestamp", f"{timestamp:.3f}")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+        self.snapshots += 1
+        self.bytes_sent += len(jpeg)
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'clients': self.clients,
+            'connections': self.connections,
+            'encoded': self.encoded,
+            'passed_through': self.passed_through,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'snapshots': self.snapshots,
+            'bytes_sent': self.bytes_sent,
+            'encode_ms': self.encode_ms,
+        }
@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from metrics import METRICS
+
+# Formats we can encode, by file extension
+FORMATS = {
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.png': 'png',
+    '.webp': 'webp',
+}
+
+DEFAULT_OPTIONS = {
+    'jpeg_quality': 95,
+    'png_compression': 3,
+    'webp_quality': 90,
+}
+
+
+def encode_params(path, options):
+    """Return the cv2.imencode extension and parameter list for a path"""
+    ext = os.path.splitext(path)[1].lower()
+    fmt = FORMATS.get(ext)
+    if fmt == 'jpeg':
+        return ext, [cv2.IMWRITE_JPEG_QUALITY, int(options['jpeg_quality'])]
+    if fmt == 'png':
+        return ext, [cv2.IMWRITE_PNG_COMPRESSION, int(options['png_compression'])]
+    if fmt == 'webp':
+        return ext, [cv2.IMWRITE_WEBP_QUALITY, int(options['webp_quality'])]
+    raise ValueError(f"Unsupported image format: {ext or path}")
+
+
+def write_file(path, data):
+    """Write bytes to path; returns the number of bytes written"""
+    # Write to a temporary name first so readers never see half-written files
+    start = time.perf_counter()
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    METRICS.record_since('write', start)
+    return len(data)
+
+
+def encode_and_write(frame, path, options):
+    """Encode a BGR frame and write it to path; returns the number of bytes written"""
+    ext, params = encode_params(path, options)
+    start = time.perf_counter()
+    ok, data = cv2.imencode(ext, frame, params)
+    METRICS.record_since('encode', start)
+    if not ok:
+        raise Exception(f"Could not encode {path}")
+    return write_file(path, data)
+
+
+class SaveJob:
+    """A frame (or already encoded image data) waiting to be written to disk"""
+
+    def __init__(self, frame, path, options, on_done=None, data=None, source=None):
+        self.frame = frame
+        self.data = data
+        self.path = path
+        self.options = options
+        self.on_done = on_done
+        self.source = source
+        self.nbytes = frame.nbytes if frame is not None else len(data)
+        self.submitted = time.time()
+        self.written = 0
+        self.error = None
+        self.done = False
+        self.entry = None  # library entry once indexed
+
+
+class SaveQueue:
+    """Encodes and writes frames on a background thread pool.
+
+    Memory is bounded by ``max_pending_bytes`` of raw frames waiting to be
+    encoded. ``submit`` either blocks until there is room or, with
+    ``block=False``, returns None so the caller can report the queue as full.
+
+    Two jobs never write the same file: a path that already exists or is
+    queued gets a ``_1``, ``_2``... suffix. With a ``library`` every written
+    image is indexed from the frame still in memory, before it's released.
+    """
+
+    def __init__(self, max_workers=2, max_pending_bytes=512 * 1024 * 1024, options=None, library=None):
+        self.max_pending_bytes = max_pending_bytes
+        self.library = library
+        self.options = dict(DEFAULT_OPTIONS)
+        if options:
+            self.options.update(options)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="save")
+        self._cond = threading.Condition()
+        self.pending = 0
+        self.pending_bytes = 0
+        self._claimed = set()
+
+        # Stats
+        self.completed = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.encode_ms = 0.0  # smoothed encode+write time per frame
+        self.last_error = None
+        self.last_path = None
+
+    def submit(self, frame, path, options=None, on_done=None, block=True, timeout=None, source=None):
+        """Queue a frame for saving; returns the SaveJob, or None if the queue is full.
+
+        The queue takes ownership of ``frame``: the caller must not modify it
+        afterwards. ``on_done(job)`` is called from a worker thread, and
+        ``job.path`` is the path actually written.
+        """
+        job_options = dict(self.options)
+        if options:
+            job_options.update(options)
+        # Fail fast on unsupported formats instead of in the worker
+        encode_params(path, job_options)
+        return self._queue(SaveJob(frame, path, job_options, on_done, source=source), block, timeout)
+
+    def submit_encoded(self, data, path, on_done=None, block=True, timeout=None, source=None):
+        """Queue already encoded image bytes (e.g. a camera's own JPEG) to be written as-is"""
+        job = SaveJob(None, path, dict(self.options), on_done, data=data, source=source)
+        return self._queue(job, block, timeout)
+
+    def _claim(self, path):
+        """A path nothing is queued for and that doesn't exist yet (lock held)"""
+        root, ext = os.path.splitext(path)
+        candidate, n = path, 0
+        while candidate in self._claimed or os.path.exists(candidate):
+            n += 1
+            candidate = f"{root}_{n}{ext}"
+        self._claimed.add(candidate)
+        return candidate
+
+    def _queue(self, job, block, timeout):
+        with self._cond:
+            def has_room():
+                # Always admit a single frame, even if it's larger than the limit
+                return self.pending == 0 or self.pending_bytes + job.nbytes <= self.max_pending_bytes
+
+            if not has_room():
+                if not block or not self._cond.wait_for(has_room, timeout):
+                    return None
+            job.path = self._claim(job.path)
+            self.pending += 1
+            self.pending_bytes += job.nbytes
+            METRICS.gauge('save_pending_bytes', self.pending_bytes)
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        start = time.perf_counter()
+        try:
+            if job.data is not None:
+                job.written = write_file(job.path, job.data)
+            else:
+                job.written = encode_and_write(job.frame, job.path, job.options)
+        except Exception as e:
+            job.error = e
+            print(f"Error saving {job.path}: {e}")
+        elapsed = (time.perf_counter() - start) * 1000
+        if self.library is not None and job.error is None:
+            try:
+                job.entry = self.library.add(job.path, frame=job.frame, data=job.data, source=job.source,
+                                             timestamp=job.submitted)
+            except Exception as e:
+                print(f"Error indexing {job.path}: {e}")
+        job.done = True
+        job.frame = job.data = None  # release the pixels before anything else
+
+        with self._cond:
+            self._claimed.discard(job.path)
+            self.pending -= 1
+            self.pending_bytes -= job.nbytes
+            METRICS.gauge('save_pending_bytes', self.pending_bytes)
+            METRICS.count('saved' if job.error is None else 'save_failed')
+            if job.error is None:
+                self.completed += 1
+                self.bytes_written += job.written
+                self.last_path = job.path
+            else:
+                self.failed += 1
+                self.last_error = job.error
+            if self.completed + self.failed == 1:
+                self.encode_ms = elapsed
+            else:
+                self.encode_ms += (elapsed - self.encode_ms) * 0.2
+            self._cond.notify_all()
+
+        if job.on_done:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                print(f"Error in save callback: {e}")
+
+    def wait(self, timeout=None):
+        """Block until every queued frame has been written; returns True if drained"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.pending == 0, timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending': self.pending,
+                'pending_bytes': self.pending_bytes,
+                'completed': self.completed,
+                'failed': self.failed,
+                'bytes_written': self.bytes_written,
+                'encode_ms': self.encode_ms,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,926 @@
+import collections
+import ctypes
+import ctypes.util
+import platform
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from change_detect import ChangeDetector
+from frame_format import convert
+from metrics import METRICS
+from pacing import CpuMonitor, FramePacer
+
+
+def window_region(window_info):
+    """Return (left, top, width, height) for a window entry, or None for the full screen"""
+    if not window_info or window_info.get('id') == 'fullscreen':
+        return None
+    bbox = window_info.get('bbox')
+    if not bbox:
+        return None
+    if isinstance(bbox, dict):
+        # macOS kCGWindowBounds
+        return (int(bbox.get('X', 0)), int(bbox.get('Y', 0)),
+                int(bbox.get('Width', 0)), int(bbox.get('Height', 0)))
+    left, top, width, height = bbox
+    return int(left), int(top), int(width), int(height)
+
+
+def _reuse(out, shape):
+    if out is None or out.shape != shape or out.dtype != np.uint8:
+        return np.empty(shape, np.uint8)
+    return out
+
+
+class PILBackend:
+    """Portable fallback using PIL.ImageGrab"""
+
+    name = "pil"
+    raw_format = "BGR"
+
+    def __init__(self):
+        from PIL import ImageGrab
+        self._grab = ImageGrab.grab
+
+    def grab_raw(self, region=None):
+        """Grab the region as BGR; PIL swaps the channels while packing its pixels out"""
+        bbox = None
+        if region is not None:
+            left, top, width, height = region
+            bbox = (left, top, left + width, top + height)
+        screenshot = self._grab(bbox=bbox)
+        if screenshot.mode != 'RGB':
+            screenshot = screenshot.convert('RGB')
+        width, height = screenshot.size
+        return np.frombuffer(screenshot.tobytes('raw', 'BGR'), np.uint8).reshape(height, width, 3)
+
+    def convert(self, raw, out=None):
+        """Copy a grab_raw() result into ``out`` when it fits (it is read-only)"""
+        return convert(raw, self.raw_format, 'BGR', _reuse(out, raw.shape[:2] + (3,)))
+
+    def grab(self, region=None, out=None):
+        return self.convert(self.grab_raw(region), out)
+
+    def close(self):
+        pass
+
+
+# --- X11 shared memory --------------------------------------------------------
+
+class _XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; we never allocate one ourselves
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+class _XWindowAttributes(ctypes.Structure):
+    _fields_ = [
+        ('x', ctypes.c_int),
+        ('y', ctypes.c_int),
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('border_width', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('visual', ctypes.c_void_p),
+        ('root', ctypes.c_ulong),
+        ('class_', ctypes.c_int),
+        ('bit_gravity', ctypes.c_int),
+        ('win_gravity', ctypes.c_int),
+        ('backing_store', ctypes.c_int),
+        ('backing_planes', ctypes.c_ulong),
+        ('backing_pixel', ctypes.c_ulong),
+        ('save_under', ctypes.c_int),
+        ('colormap', ctypes.c_ulong),
+        ('map_installed', ctypes.c_int),
+        ('map_state', ctypes.c_int),
+        ('all_event_masks', ctypes.c_long),
+        ('your_event_mask', ctypes.c_long),
+        ('do_not_propagate_mask', ctypes.c_long),
+        ('override_redirect', ctypes.c_int),
+        ('screen', ctypes.c_void_p),
+    ]
+
+
+_ZPIXMAP = 2
+_ALL_PLANES = 0xFFFFFFFF
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+_IS_VIEWABLE = 2
+_ANY_PROPERTY_TYPE = 0
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+
+def _load_x11():
+    x11_path = ctypes.util.find_library('X11')
+    if not x11_path:
+        raise OSError("libX11 not found")
+    x11 = ctypes.CDLL(x11_path)
+
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XRootWindow.restype = ctypes.c_ulong
+    x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultVisual.restype = ctypes.c_void_p
+    x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XFree.argtypes = [ctypes.c_void_p]
+    # Handlers are passed and returned as plain pointers, so the previous one can be put back
+    x11.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+    x11.XSetErrorHandler.restype = ctypes.c_void_p
+
+    x11.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+    x11.XInternAtom.restype = ctypes.c_ulong
+    x11.XGetWindowProperty.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_long,
+                                       ctypes.c_long, ctypes.c_int, ctypes.c_ulong,
+                                       ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int),
+                                       ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong),
+                                       ctypes.POINTER(ctypes.c_void_p)]
+    x11.XQueryTree.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong),
+                               ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_void_p),
+                               ctypes.POINTER(ctypes.c_uint)]
+    x11.XGetWindowAttributes.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XWindowAttributes)]
+    x11.XTranslateCoordinates.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_int,
+                                          ctypes.c_int, ctypes.POINTER(ctypes.c_int),
+                                          ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_ulong)]
+    return x11
+
+
+def _load_xlib():
+    xext_path = ctypes.util.find_library('Xext')
+    if not xext_path:
+        raise OSError("libXext not found")
+    x11 = _load_x11()
+    xext = ctypes.CDLL(xext_path)
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+    xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+    xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                     ctypes.c_char_p, ctypes.POINTER(_XShmSegmentInfo),
+                                     ctypes.c_uint, ctypes.c_uint]
+    xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+    xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+    xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+    xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+                                  ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    return x11, xext, libc
+
+
+_x_error_lock = threading.Lock()
+_x_error_count = 0  # errors on the trapped display
+_trapped_display = None
+_previous_handler = None
+
+
+@_XErrorHandler
+def _record_x_error(display, event):
+    # The default handler exits the process; count errors from our own
+    # requests and carry on, and pass anyone else's (Tk's) to their handler
+    global _x_error_count
+    if display == _trapped_display:
+        _x_error_count += 1
+        return 0
+    if _previous_handler:
+        return _XErrorHandler(_previous_handler)(display, event)
+    return 0
+
+
+class _XErrorTrap:
+    """Counts X errors from ``display`` while in the ``with`` block.
+
+    Xlib has one error handler per process, shared with Tk, so ours is only
+    installed for the duration of a few requests that reply (or are
+    followed by XSync) and the previous handler is put back afterwards.
+    ``failed`` tells whether any of them raised an error.
+    """
+
+    def __init__(self, x11, display):
+        self.x11 = x11
+        self.display = display
+        self._errors = 0
+        self._previous = None
+
+    def __enter__(self):
+        global _trapped_display, _previous_handler
+        _x_error_lock.acquire()
+        self._errors = _x_error_count
+        self._previous = self.x11.XSetErrorHandler(ctypes.cast(_record_x_error, ctypes.c_void_p))
+        _previous_handler = self._previous
+        _trapped_display = self.display
+        return self
+
+    def __exit__(self, *exc):
+        global _trapped_display, _previous_handler
+        self.x11.XSetErrorHandler(self._previous)
+        _trapped_display = None
+        _previous_handler = None
+        _x_error_lock.release()
+        return False
+
+    @property
+    def failed(self):
+        return _x_error_count != self._errors
+
+
+class XShmBackend:
+    """Grabs screen regions over the X11 MIT-SHM extension into a reused buffer.
+
+    The X server writes pixels straight into a shared memory segment that is
+    exposed as a NumPy view, so the only per-frame pixel work is one BGRA to
+    BGR pass into the caller's buffer. The segment is recreated only when the
+    region size changes. Not thread-safe: use one instance per thread.
+    """
+
+    name = "xshm"
+    raw_format = "BGRA"
+
+    def __init__(self, display_name=None):
+        self.x11, self.xext, self.libc = _load_xlib()
+        self.display = self.x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self.display:
+            raise OSError("Cannot open X display")
+        if not self.xext.XShmQueryExtension(self.display):
+            self.x11.XCloseDisplay(self.display)
+            raise OSError("X server has no MIT-SHM extension")
+
+        screen = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XRootWindow(self.display, screen)
+        self.visual = self.x11.XDefaultVisual(self.display, screen)
+        self.depth = self.x11.XDefaultDepth(self.display, screen)
+        self.screen_size = (self.x11.XDisplayWidth(self.display, screen),
+                            self.x11.XDisplayHeight(self.display, screen))
+
+        self._shminfo = None
+        self._image = None
+        self._view = None
+        self._size = None
+
+    def _create_image(self, width, height):
+        self._destroy_image()
+        shminfo = _XShmSegmentInfo()
+        image = self.xext.XShmCreateImage(self.display, self.visual, self.depth, _ZPIXMAP,
+                                          None, ctypes.byref(shminfo), width, height)
+        if not image:
+            raise OSError("XShmCreateImage failed")
+        if image.contents.bits_per_pixel != 32:
+            self.x11.XFree(image)
+            raise OSError(f"Unsupported X visual: {image.contents.bits_per_pixel} bits per pixel")
+
+        stride = image.contents.bytes_per_line
+        size = stride * height
+        shmid = self.libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if shmid < 0:
+            self.x11.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        addr = self.libc.shmat(shmid, None, 0)
+        if addr in (None, ctypes.c_void_p(-1).value):
+            self.libc.shmctl(shmid, _IPC_RMID, None)
+            self.x11.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmat failed")
+
+        shminfo.shmid = shmid
+        shminfo.shmaddr = addr
+        shminfo.readOnly = 0
+        image.contents.data = addr
+        with _XErrorTrap(self.x11, self.display) as trap:
+            attached = self.xext.XShmAttach(self.display, ctypes.byref(shminfo))
+            # Attach errors (e.g. a remote X server) arrive asynchronously
+            self.x11.XSync(self.display, 0)
+        if not attached or trap.failed:
+            self.libc.shmdt(addr)
+            self.libc.shmctl(shmid, _IPC_RMID, None)
+            self.x11.XFree(image)
+            raise OSError("XShmAttach failed")
+        # Segment is freed automatically once both sides detach
+        self.libc.shmctl(shmid, _IPC_RMID, None)
+
+        raw = (ctypes.c_uint8 * size).from_address(addr)
+        self._view = np.frombuffer(raw, np.uint8).reshape(height, stride)[:, :width * 4].reshape(height, width, 4)
+        self._shminfo = shminfo
+        self._image = image
+        self._size = (width, height)
+
+    def _destroy_image(self):
+        if self._image is None:
+            return
+        self._view = None
+        self.xext.XShmDetach(self.display, ctypes.byref(self._shminfo))
+        self.x11.XSync(self.display, 0)
+        self.libc.shmdt(self._shminfo.shmaddr)
+        # The pixel data lives in shared memory, so only the XImage header is freed
+        self._image.contents.data = None
+        self.x11.XFree(self._image)
+        self._image = None
+        self._shminfo = None
+        self._size = None
+
+    def _clamp(self, region):
+        screen_width, screen_height = self.screen_size
+        if region is None:
+            return 0, 0, screen_width, screen_height
+        left, top, width, height = region
+        left = min(max(0, left), screen_width - 1)
+        top = min(max(0, top), screen_height - 1)
+        width = max(1, min(width, screen_width - left))
+        height = max(1, min(height, screen_height - top))
+        return left, top, width, height
+
+    def grab_raw(self, region=None):
+        """Grab the region into shared memory; returns a BGRA view valid until the next grab"""
+        left, top, width, height = self._clamp(region)
+        if self._size != (width, height):
+            self._create_image(width, height)
+
+        with _XErrorTrap(self.x11, self.display) as trap:
+            ok = self.xext.XShmGetImage(self.display, self.root, self._image, left, top, _ALL_PLANES)
+        if not ok or trap.failed:
+            raise OSError("XShmGetImage failed")
+        return self._view
+
+    def convert(self, raw, out=None):
+        """Convert a grab_raw() view to BGR, into ``out`` when it fits"""
+        return convert(raw, self.raw_format, 'BGR', _reuse(out, raw.shape[:2] + (3,)))
+
+    def grab(self, region=None, out=None):
+        return self.convert(self.grab_raw(region), out)
+
+    def close(self):
+        if self.display:
+            self._destroy_image()
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+
+
+def create_backend(preferred=None):
+    """Return the fastest working screen-grab backend for this platform.
+
+    ``preferred`` is a backend name or a callable that builds a backend.
+    """
+    if callable(preferred):
+        return preferred()
+    names = [preferred] if preferred else []
+    if platform.system() == "Linux":
+        names.append("xshm")
+    names.append("pil")
+
+    for name in names:
+        try:
+            if name == "xshm":
+                return XShmBackend()
+            if name == "pil":
+                return PILBackend()
+        except Exception as e:
+            print(f"Screen capture backend '{name}' unavailable: {e}")
+    raise OSError("No screen capture backend available")
+
+
+FULL_SCREEN = {'title': 'Full Screen', 'id': 'fullscreen', 'bbox': None}
+
+
+class X11Windows:
+    """Top-level X11 windows: ids from the window manager's ``_NET_CLIENT_LIST``.
+
+    Without a window manager (e.g. under Xvfb) the viewable children of the
+    root window are used instead. Geometry is the client area in root
+    coordinates, which is what the screen grabber needs.
+    """
+
+    def __init__(self, display_name=None):
+        self.x11 = _load_x11()
+        self.display = self.x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self.display:
+            raise OSError("Cannot open X display")
+        self.root = self.x11.XRootWindow(self.display, self.x11.XDefaultScreen(self.display))
+        self._atoms = {}
+
+    def _atom(self, name):
+        if name not in self._atoms:
+            self._atoms[name] = self.x11.XInternAtom(self.display, name.encode(), 0)
+        return self._atoms[name]
+
+    def _property(self, window_id, name, max_items=4096):
+        """Return (type, format, bytes) of a window property, or None"""
+        actual_type = ctypes.c_ulong()
+        actual_format = ctypes.c_int()
+        items = ctypes.c_ulong()
+        remaining = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        atom = self._atom(name)
+        with _XErrorTrap(self.x11, self.display) as trap:
+            status = self.x11.XGetWindowProperty(self.display, window_id, atom, 0, max_items, 0,
+                                                 _ANY_PROPERTY_TYPE, ctypes.byref(actual_type),
+                                                 ctypes.byref(actual_format), ctypes.byref(items),
+                                                 ctypes.byref(remaining), ctypes.byref(data))
+        if status != 0 or trap.failed or not data.value:
+            if data.value:
+                self.x11.XFree(data)
+            return None
+        try:
+            # 32-bit items are returned as C longs
+            item_size = {8: 1, 16: ctypes.sizeof(ctypes.c_short), 32: ctypes.sizeof(ctypes.c_long)}
+            size = items.value * item_size.get(actual_format.value, 1)
+            return actual_type.value, actual_format.value, ctypes.string_at(data.value, size)
+        finally:
+            self.x11.XFree(data)
+
+    def ids(self):
+        """Ids of the top-level windows, in stacking or creation order"""
+        prop = self._property(self.root, '_NET_CLIENT_LIST')
+        if prop is not None and prop[1] == 32:
+            return list(np.frombuffer(prop[2], np.uint64 if ctypes.sizeof(ctypes.c_long) == 8 else np.uint32))
+        root = ctypes.c_ulong()
+        parent = ctypes.c_ulong()
+        children = ctypes.c_void_p()
+        count = ctypes.c_uint()
+        with _XErrorTrap(self.x11, self.display):
+            listed = self.x11.XQueryTree(self.display, self.root, ctypes.byref(root), ctypes.byref(parent),
+                                         ctypes.byref(children), ctypes.byref(count))
+        if not listed:
+            return []
+        if not children.value:
+            return []
+        try:
+            return list((ctypes.c_ulong * count.value).from_address(children.value))
+        finally:
+            self.x11.XFree(children)
+
+    def title(self, window_id):
+        """Window title (``_NET_WM_NAME``, else ``WM_NAME``), or None if it has none or is gone"""
+        for name in ('_NET_WM_NAME', 'WM_NAME'):
+            prop = self._property(window_id, name)
+            if prop and prop[1] == 8 and prop[2]:
+                encoding = 'utf-8' if name == '_NET_WM_NAME' else 'latin-1'
+                return prop[2].decode(encoding, 'replace').rstrip('\0')
+        return None
+
+    def geometry(self, window_id):
+        """Return (left, top, width, height) in root coordinates, or None if unmapped or gone"""
+        attributes = _XWindowAttributes()
+        left = ctypes.c_int()
+        top = ctypes.c_int()
+        child = ctypes.c_ulong()
+        with _XErrorTrap(self.x11, self.display) as trap:
+            if not self.x11.XGetWindowAttributes(self.display, window_id, ctypes.byref(attributes)):
+                return None
+            if trap.failed or attributes.map_state != _IS_VIEWABLE:
+                return None
+            if not self.x11.XTranslateCoordinates(self.display, window_id, self.root, 0, 0, ctypes.byref(left),
+                                                  ctypes.byref(top), ctypes.byref(child)):
+                return None
+        if trap.failed:
+            return None
+        return left.value, top.value, attributes.width, attributes.height
+
+    def list(self, known=()):
+        """Return [(id, title, bbox)] of titled, mapped windows; bbox is None for ids in ``known``"""
+        windows = []
+        for window_id in self.ids():
+            window_id = int(window_id)
+            title = self.title(window_id)
+            if not title or not title.strip():
+                continue
+            if window_id in known:
+                windows.append((window_id, title, None))
+                continue
+            bbox = self.geometry(window_id)
+            if bbox is not None and bbox[2] > 1 and bbox[3] > 1:
+                windows.append((window_id, title, bbox))
+        return windows
+
+    def close(self):
+        if self.display:
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+
+
+class PlatformWindows:
+    """Windows through pygetwindow on Windows and Quartz on macOS.
+
+    Both list every window in one call, so ``list`` always returns
+    geometry. They are imported here so headless users never pay for them.
+    """
+
+    def __init__(self):
+        self.system = platform.system()
+        if self.system == "Windows":
+            import pygetwindow
+            self._gw = pygetwindow
+        elif self.system == "Darwin":
+            import Quartz
+            self._quartz = Quartz
+        else:
+            raise OSError(f"No window enumeration on {self.system}")
+
+    def list(self, known=()):
+        windows = []
+        if self.system == "Windows":
+            for window in self._gw.getAllWindows():
+                if window.title and window.title.strip() and window.visible:
+                    windows.append((window._hWnd, window.title,
+                                    (window.left, window.top, window.width, window.height)))
+        else:
+            quartz = self._quartz
+            for window in quartz.CGWindowListCopyWindowInfo(quartz.kCGWindowListOptionOnScreenOnly,
+                                                            quartz.kCGNullWindowID):
+                title = window.get('kCGWindowName', '')
+                owner = window.get('kCGWindowOwnerName', '')
+                if title and title.strip():
+                    windows.append((window['kCGWindowNumber'], f"{owner} - {title}",
+                                    window_region({'bbox': window.get('kCGWindowBounds', {})})))
+        return windows
+
+    def geometry(self, window_id):
+        if self.system == "Windows":
+            rect = (ctypes.c_long * 4)()
+            if not ctypes.windll.user32.GetWindowRect(window_id, ctypes.byref(rect)):
+                return None
+            left, top, right, bottom = rect
+            return left, top, right - left, bottom - top
+        quartz = self._quartz
+        info = quartz.CGWindowListCopyWindowInfo(quartz.kCGWindowListOptionIncludingWindow, window_id)
+        if not info:
+            return None
+        return window_region({'bbox': info[0].get('kCGWindowBounds', {})})
+
+    def close(self):
+        pass
+
+
+def _window_source():
+    if platform.system() in ("Windows", "Darwin"):
+        return PlatformWindows()
+    return X11Windows()
+
+
+class WindowRegistry:
+    """Visible windows keyed by id, refreshed incrementally, with live geometry.
+
+    ``refresh`` lists window ids and titles and only queries the geometry of
+    windows it hasn't seen; ``version`` goes up whenever a window appears,
+    goes away or is renamed, so callers can skip rebuilding their lists
+    otherwise. ``get`` is a dict lookup, and ``region`` re-reads the
+    geometry of one window at most every ``max_age`` seconds, so a grabber
+    calling it every frame follows a moved or resized window for one round
+    trip to the window system a few times a second. ``start`` refreshes in
+    a background thread every ``interval`` seconds.
+
+    All window-system calls are made under one lock, so the registry can
+    be shared between threads.
+    """
+
+    def __init__(self, source=None, interval=2.0, max_age=0.2):
+        self.interval = interval
+        self.max_age = max_age
+        self._source = source
+        self._windows = {}  # id -> {'title', 'id', 'bbox'}, in listing order
+        self._checked = {}  # id -> perf_counter() of the last geometry query
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.version = 0
+        self.error = None
+
+        # Stats
+        self.refreshes = 0
+        self.refresh_ms = 0.0
+        self.geometry_queries = 0
+
+    def _ensure_source(self):
+        # Lock held
+        if self._source is None:
+            self._source = _window_source()
+        return self._source
+
+    def refresh(self):
+        """Bring the registry up to date; returns whether anything changed"""
+        start = time.perf_counter()
+        with self._lock:
+            try:
+                listed = self._ensure_source().list(self._windows)
+                self.error = None
+            except Exception as e:
+                if self.error is None:
+                    print(f"Error getting windows: {e}")
+                self.error = e
+                listed = []
+            now = time.perf_counter()
+            windows = {}
+            changed = False
+            for window_id, title, bbox in listed:
+                entry = self._windows.get(window_id)
+                if entry is None:
+                    entry = {'title': title, 'id': window_id, 'bbox': bbox}
+                    self._checked[window_id] = now
+                    changed = True
+                elif entry['title'] != title:
+                    entry = dict(entry, title=title)
+                    changed = True
+                if bbox is not None and entry['bbox'] != bbox:
+                    entry = dict(entry, bbox=bbox)
+                    self._checked[window_id] = now
+                windows[window_id] = entry
+            if windows.keys() != self._windows.keys():
+                changed = True
+            for window_id in self._windows.keys() - windows.keys():
+                self._checked.pop(window_id, None)
+            self._windows = windows
+            if changed:
+                self.version += 1
+        self.refresh_ms = (time.perf_counter() - start) * 1000
+        METRICS.record('window_refresh', self.refresh_ms)
+        self.refreshes += 1
+        return changed
+
+    def windows(self):
+        """Return [{'title', 'id', 'bbox'}, ...] of the known windows, then the full screen"""
+        with self._lock:
+            windows = [dict(entry) for entry in self._windows.values()]
+        windows.append(dict(FULL_SCREEN))
+        return windows
+
+    def get(self, window_id):
+        """The entry for ``window_id``, or None once the window is gone"""
+        if window_id == FULL_SCREEN['id']:
+            return dict(FULL_SCREEN)
+        entry = self._windows.get(window_id)
+        return dict(entry) if entry is not None else None
+
+    def find(self, title=None):
+        """Return the window whose title matches (exactly, then by substring); full screen if no title"""
+        if not title:
+            return dict(FULL_SCREEN)
+        windows = self.windows()
+        for window in windows:
+            if window['title'] == title:
+                return window
+        lowered = title.lower()
+        for window in windows:
+            if lowered in window['title'].lower():
+                return window
+        return None
+
+    def region(self, window_info, max_age=None):
+        """Current (left, top, width, height) of a window entry, or None for the full screen.
+
+        A window the registry doesn't know (or no longer lists) keeps the
+        region it was last seen at.
+        """
+        window_id = window_info.get('id') if window_info else None
+        if window_id is None or window_id == FULL_SCREEN['id']:
+            return None
+        max_age = self.max_age if max_age is None else max_age
+        entry = self._windows.get(window_id)
+        now = time.perf_counter()
+        if now - self._checked.get(window_id, 0.0) >= max_age:
+            with self._lock:
+                try:
+                    bbox = self._ensure_source().geometry(window_id)
+                except Exception:
+                    bbox = None
+                self.geometry_queries += 1
+                self._checked[window_id] = now
+                entry = self._windows.get(window_id)
+                if bbox is not None and entry is not None and entry['bbox'] != bbox:
+                    entry = dict(entry, bbox=bbox)
+                    self._windows[window_id] = entry
+                elif bbox is not None and entry is None:
+                    # Not listed (yet): remember where it is without offering it
+                    window_info['bbox'] = bbox
+        return window_region(entry if entry is not None else window_info)
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.refresh()
+            self._stop_event.wait(self.interval)
+
+    def stats(self):
+        return {
+            'windows': len(self._windows),
+            'version': self.version,
+            'refreshes': self.refreshes,
+            'refresh_ms': self.refresh_ms,
+            'geometry_queries': self.geometry_queries,
+        }
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            if self._source is not None:
+                self._source.close()
+                self._source = None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def window_registry():
+    """The process-wide WindowRegistry, created on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = WindowRegistry()
+        return _registry
+
+
+def list_windows():
+    """Return [{'title', 'id', 'bbox'}, ...] for visible windows, then the full screen.
+
+    Windows are real X11 windows on Linux, and need pygetwindow on Windows
+    and Quartz on macOS; without them only the full-screen entry is offered.
+    """
+    registry = window_registry()
+    registry.refresh()
+    return registry.windows()
+
+
+def find_window(title=None):
+    """Return the window whose title matches (exactly, then by substring); full screen if no title"""
+    registry = window_registry()
+    if title:
+        registry.refresh()
+    return registry.find(title)
+
+
+def capture_window(window_info, backend=None, out=None):
+    """Capture a specific window or full screen as a BGR frame; None on failure"""
+    try:
+        if backend is None:
+            backend = PILBackend()
+        return backend.grab(window_region(window_info), out)
+    except Exception as e:
+        print(f"Error capturing window: {e}")
+        return None
+
+
+class ScreenCapture:
+    """VideoCapture-like screen source, so a FrameGrabber can drive it.
+
+    ``read(image)`` paces itself with a FramePacer capped at ``fps`` (backing
+    off when grabbing eats the frame budget or the CPU is busy) and grabs the
+    window region straight into ``image`` when its shape matches. Every grab
+    is compared with the previous one: the changed regions are kept in
+    ``changes`` and ``changed_since`` tells whether anything changed after
+    a frame's timestamp, so a timelapse can skip saving duplicates. With
+    ``skip_unchanged`` a grab whose tiles all match the previous one isn't
+    converted: ``read`` hands back the previous frame again (copied into
+    ``image``, so callers must not draw on frames they read) and sets
+    ``unchanged``. Frames keep coming at the paced rate either way. With
+    ``track_window`` the window's geometry comes from the WindowRegistry,
+    so the grab follows it when it is moved or resized.
+    """
+
+    def __init__(self, window_info, fps=30, backend=None, skip_unchanged=True, track_window=True):
+        self.window_info = dict(window_info) if window_info else window_info
+        self.registry = window_registry() if track_window and window_region(window_info) is not None else None
+        self.fps = fps
+        self.preferred_backend = backend
+        self.backend = None
+        self.skip_unchanged = skip_unchanged
+        self.detector = ChangeDetector()
+        self.changes = collections.deque(maxlen=256)  # (timestamp, rects, fraction)
+        self.last_change = 0.0
+        self.unchanged = False  # the last frame read repeats the one before
+        self.skipped = 0
+        self._last = None
+        self.pacer = FramePacer(fps, max_fps=fps)
+        self.cpu = CpuMonitor()
+        self._adapted = time.perf_counter()
+        self._opened = True
+        self._interrupted = False
+        self._thread = None
+
+    def isOpened(self):
+        return self._opened
+
+    def _ensure_backend(self):
+        # X connections must stay on the thread that uses them
+        if self.backend is None or self._thread is not threading.current_thread():
+            if self.backend is not None:
+                self.backend.close()
+            self.backend = create_backend(self.preferred_backend)
+            self._thread = threading.current_thread()
+
+    def read(self, image=None):
+        if not self._opened or self._interrupted:
+            return False, None
+        time.sleep(self.pacer.delay())
+
+        start = time.perf_counter()
+        if start - self._adapted >= 1.0:
+            self.pacer.adapt(self.cpu.sample())
+            self._adapted = start
+        try:
+            self._ensure_backend()
+            raw = self.backend.grab_raw(self.region())
+            grabbed = METRICS.record_since('grab', start)
+            change = self.detector.update(raw)
+            self.unchanged = not change.changed
+            if self.unchanged and self.skip_unchanged and self._last is not None:
+                self.skipped += 1
+                frame = self._repeat(image)
+            else:
+                if change.changed:
+                    self.last_change = time.time()
+                    self.changes.append((self.last_change, change.rects(), change.fraction))
+                frame = self.backend.convert(raw, image)
+                METRICS.record_since('screen_convert', grabbed)
+            self._last = frame
+            self.pacer.observe_work((time.perf_counter() - start) * 1000)
+            return True, frame
+        except Exception as e:
+            print(f"Error capturing window: {e}")
+            return False, None
+
+    def _repeat(self, image):
+        """The previous frame again, in ``image`` when it fits"""
+        last = self._last
+        if image is None or image is last:
+            return last
+        if image.shape != last.shape or image.dtype != last.dtype:
+            return last.copy()
+        np.copyto(image, last)
+        return image
+
+    def region(self):
+        """Region grabbed next: the window's live geometry when tracked, else where it was listed"""
+        if self.registry is None:
+            return window_region(self.window_info)
+        return self.registry.region(self.window_info)
+
+    def changes_since(self, timestamp):
+        """Changed regions, as (timestamp, rects, fraction), recorded after ``timestamp``"""
+        return [change for change in list(self.changes) if change[0] > timestamp]
+
+    def changed_since(self, timestamp):
+        """Whether the screen changed after ``timestamp`` (e.g. that of the last frame saved)"""
+        return self.last_change > timestamp
+
+    def interrupt(self):
+        """Make reads return False from now on (used when stopping)"""
+        self._interrupted = True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.pacer.target_fps)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FPS and value > 0:
+            self.fps = value
+            self.pacer = FramePacer(value, max_fps=value)
+            return True
+        return False
+
+    def release(self):
+        # Called once the reading thread has stopped, so the backend is idle
+        self._opened = False
+        if self.backend is not None:
+            self.backend.close()
+        self.backend = None
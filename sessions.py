@@ -0,0 +1,175 @@
+import re
+import threading
+import time
+
+import cv2
+
+from camera_modes import apply_mode, choose_mode
+from grabber import FrameGrabber
+from ip_source import IPCameraCapture, is_stream_url
+from mjpeg import MJPEGCapture, NotMJPEGStream
+
+
+def open_capture(source, mode=None):
+    """Open a USB index or stream URL and read a first frame.
+
+    HTTP URLs serving MJPEG get an MJPEGCapture, which only decodes frames
+    on demand; other stream URLs get an IPCameraCapture (low-latency options,
+    stale-frame flushing, reconnects). USB cameras are switched to ``mode``
+    (see camera_modes), by default the fastest native mode of at least
+    1280x720 at 30 FPS. Returns ``(cap, frame)``; raises if the source can't
+    be read.
+    """
+    if is_stream_url(source) and source.lower().startswith(("http://", "https://")):
+        try:
+            cap = MJPEGCapture(source)
+        except NotMJPEGStream:
+            # Some other format (e.g. an H.264 endpoint): let FFmpeg handle it
+            cap = IPCameraCapture(source)
+        except Exception as e:
+            raise Exception(f"Cannot connect to {source}: {e}")
+    elif is_stream_url(source):
+        cap = IPCameraCapture(source)
+    else:
+        cap = cv2.VideoCapture(source)
+
+    if isinstance(source, int):
+        # Without an explicit format many UVC cameras fall back to raw YUYV at a few FPS
+        apply_mode(cap, mode or choose_mode(source))
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer for lower latency
+
+    # Test if camera is accessible
+    ret, frame = cap.read()
+    if not ret:
+        cap.release()
+        raise Exception(f"Cannot read from camera {source}")
+    return cap, frame
+
+
+def source_name(source):
+    """Short, filename-safe label for a source.
+
+    Stream URLs keep their host, port, path and query, so the channels of
+    one recorder (``rtsp://nvr/ch1``, ``rtsp://nvr/ch2``) get different
+    names; credentials are left out.
+    """
+    if isinstance(source, int):
+        return f"usb{source}"
+    if isinstance(source, dict):
+        return "screen"
+    address = source.split("://", 1)[-1]
+    host, _, rest = address.partition("/")
+    name = host.rsplit("@", 1)[-1] + "/" + rest
+    name = "".join(c if c.isalnum() else "_" for c in name)
+    return "ip_" + re.sub("_+", "_", name).strip("_")
+
+
+class SourceHandle:
+    """One open source in a session: its grabber plus identifying info"""
+
+    def __init__(self, source, grabber, name=None):
+        self.source = source
+        self.name = name or source_name(source)
+        self.grabber = grabber
+
+    def stats(self):
+        """Return FPS and latency figures for this source"""
+        timestamp = self.grabber.last_timestamp
+        stats = {
+            'name': self.name,
+            'fps': self.grabber.fps,
+            'read_ms': self.grabber.read_ms,
+            'age_ms': (time.time() - timestamp) * 1000 if timestamp else None,
+            'frames': self.grabber.frames_read,
+            'running': self.grabber.is_running,
+        }
+        source_stats = getattr(self.grabber.cap, 'stats', None)
+        if source_stats is not None:
+            # Network sources also report reconnects and buffering lag
+            for key, value in source_stats().items():
+                stats.setdefault(key, value)
+        return stats
+
+
+class CaptureSession:
+    """Runs many sources at once, each on its own FrameGrabber thread"""
+
+    def __init__(self, slots=8):
+        self.slots = slots
+        self.sources = []
+        self._lock = threading.Lock()
+
+    def add_source(self, source):
+        """Open a source and start grabbing from it; returns its SourceHandle"""
+        with self._lock:
+            for handle in self.sources:
+                if handle.source == source:
+                    return handle
+        cap, frame = open_capture(source)
+        grabber = FrameGrabber(cap, slots=self.slots)
+        grabber.start(first_frame=frame)
+        with self._lock:
+            # Names key capture_all's frames and the saved file names, so they must not collide
+            taken = {h.name for h in self.sources}
+            name = base = source_name(source)
+            suffix = 1
+            while name in taken:
+                suffix += 1
+                name = f"{base}_{suffix}"
+            handle = SourceHandle(source, grabber, name)
+            self.sources.append(handle)
+        return handle
+
+    def open_all(self, sources):
+        """Open sources concurrently; returns {source: error} for the ones that failed"""
+        errors = {}
+
+        def run(source):
+            try:
+                self.add_source(source)
+            except Exception as e:
+                errors[source] = str(e)
+
+        threads = [threading.Thread(target=run, args=(s,), daemon=True) for s in sources]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # Keep the caller's ordering for the preview grid
+        order = {s: i for i, s in enumerate(sources)}
+        with self._lock:
+            self.sources.sort(key=lambda h: order.get(h.source, len(order)))
+        return errors
+
+    def remove_source(self, handle):
+        with self._lock:
+            if handle in self.sources:
+                self.sources.remove(handle)
+        handle.grabber.stop()
+
+    def capture_all(self, timestamp=None):
+        """Grab one frame per source, each the closest held frame to a common timestamp.
+
+        Returns ``(timestamp, {name: (frame_timestamp, frame)})``. Sources with
+        nothing to offer are left out.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        frames = {}
+        with self._lock:
+            sources = list(self.sources)
+        for handle in sources:
+            seq, frame_timestamp, frame = handle.grabber.frame_near(timestamp)
+            if frame is not None:
+                frames[handle.name] = (frame_timestamp, frame)
+        return timestamp, frames
+
+    def stats(self):
+        with self._lock:
+            return [handle.stats() for handle in self.sources]
+
+    def close(self):
+        with self._lock:
+            sources, self.sources = self.sources, []
+        for handle in sources:
+            handle.grabber.stop()
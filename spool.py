@@ -0,0 +1,466 @@
+"""Raw frame spool: lossless capture at the full grab rate, exported later.
+
+Encoding PNG per frame is far slower than a camera delivers, so a spool
+recording does no encoding at all. It preallocates one file and maps it
+into memory; every grabbed frame is copied once, straight from the
+grabber's ring into its slot in the file, and the kernel writes the pages
+back. The rate is limited by disk bandwidth only. The file holds:
+
+    header   magic, version, offsets, capacity, slot size and frame count
+    index    per frame: timestamp, grabber seq, height, width, channels, dtype
+    slots    the raw pixels, one page-aligned slot per frame
+
+The frame count in the header is updated after each frame's pixels and
+index entry, so a spool cut short by a crash still reads back up to its
+last complete frame. Export to JPEG/PNG runs on a process pool, each
+worker mapping the spool itself so frames are never pickled:
+
+    python spool.py info recording.spool
+    python spool.py export recording.spool -f png -o frames
+    python spool.py export recording.spool -f avi
+"""
+import mmap
+import os
+import shutil
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from metrics import METRICS
+
+MAGIC = b"SCSPOOL1"
+VERSION = 1
+
+# magic, version, index offset, data offset, capacity, slot bytes, frame count, created
+HEADER = struct.Struct("<8sIIQQQQd")
+COUNT_OFFSET = struct.calcsize("<8sIIQQQ")
+
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('seq', '<u8'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('channels', '<u4'),
+    ('dtype', 'S4'),
+])
+
+PAGE = mmap.PAGESIZE
+
+# Disk space left free when sizing a spool from the free space
+FREE_MARGIN = 256 * 1024 * 1024
+
+# Name of spool recording among the app's recording formats
+SPOOL_FORMAT = "Raw spool (lossless)"
+
+# Formats the exporter writes; video formats go through cv2.VideoWriter
+EXPORT_FORMATS = {
+    'jpg': None,
+    'png': None,
+    'webp': None,
+    'avi': 'MJPG',
+    'mp4': 'mp4v',
+}
+
+
+def _align(n, alignment=PAGE):
+    return (n + alignment - 1) // alignment * alignment
+
+
+class SpoolWriter:
+    """A preallocated, memory-mapped spool file that frames are copied into.
+
+    ``slot_shape`` and ``dtype`` size the slots; later frames may be
+    smaller (a resized window) but not bigger. ``capacity`` is the number
+    of frames, by default as many as ``max_bytes`` holds, capped by the
+    free disk space. An existing file is never overwritten: that raises
+    FileExistsError. Not thread-safe: one thread fills it.
+    """
+
+    def __init__(self, path, slot_shape, dtype=np.uint8, capacity=None, max_bytes=4 * 1024 ** 3):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.slot_bytes = _align(int(np.prod(slot_shape)) * self.dtype.itemsize)
+        if capacity is None:
+            free = shutil.disk_usage(os.path.dirname(os.path.abspath(path))).free - FREE_MARGIN
+            capacity = min(max_bytes, free) // self.slot_bytes
+        if capacity < 1:
+            raise OSError("Not enough disk space for a spool frame")
+        self.capacity = int(capacity)
+        self.index_offset = _align(HEADER.size, 64)
+        self.data_offset = _align(self.index_offset + self.capacity * INDEX_DTYPE.itemsize)
+        self.size = self.data_offset + self.capacity * self.slot_bytes
+        self.count = 0
+
+        self._file = open(path, "x+b")
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                # Reserve the blocks now, so the disk can't fill up mid-capture
+                os.posix_fallocate(self._file.fileno(), 0, self.size)
+            else:
+                self._file.truncate(self.size)
+            self._map = mmap.mmap(self._file.fileno(), self.size)
+        except Exception:
+            self._file.close()
+            os.remove(path)
+            raise
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.index_offset, self.data_offset, self.capacity,
+                         self.slot_bytes, 0, time.time())
+        self.index = np.frombuffer(self._map, INDEX_DTYPE, self.capacity, self.index_offset)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def slot(self, shape, dtype):
+        """Writable array over the next free slot, shaped ``shape``; None if full or it doesn't fit"""
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if self.full or nbytes > self.slot_bytes:
+            return None
+        offset = self.data_offset + self.count * self.slot_bytes
+        return np.frombuffer(self._map, dtype, int(np.prod(shape)), offset).reshape(shape)
+
+    def commit(self, frame, timestamp, seq=0):
+        """Record the frame just copied into ``slot()`` and publish it in the header"""
+        entry = self.index[self.count]
+        entry['timestamp'] = timestamp
+        entry['seq'] = seq
+        entry['height'] = frame.shape[0]
+        entry['width'] = frame.shape[1]
+        entry['channels'] = frame.shape[2] if frame.ndim == 3 else 1
+        entry['dtype'] = frame.dtype.str[1:].encode()
+        self.count += 1
+        struct.pack_into("<Q", self._map, COUNT_OFFSET, self.count)
+
+    def write(self, frame, timestamp, seq=0):
+        """Copy a frame into the next slot; returns False when the spool is full or the frame too big"""
+        out = self.slot(frame.shape, frame.dtype)
+        if out is None:
+            return False
+        np.copyto(out, frame)
+        self.commit(out, timestamp, seq)
+        return True
+
+    @property
+    def bytes_used(self):
+        return self.data_offset + self.count * self.slot_bytes
+
+    def close(self):
+        """Flush and give back the space of the slots that were never used"""
+        if self._map is None:
+            return
+        self.index = None
+        self._map.flush()
+        self._map.close()
+        self._map = None
+        self._file.truncate(self.bytes_used)
+        self._file.close()
+
+
+class SpoolReader:
+    """Reads a spool back: ``len(reader)`` frames, ``reader[i]`` is (timestamp, frame).
+
+    Frames are read-only views into the mapped file, valid until ``close``.
+    A spool that is still being written can be read up to the frames
+    committed when it was opened.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        (magic, version, self.index_offset, self.data_offset, self.capacity, self.slot_bytes, count,
+         self.created) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version > VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a frame spool")
+        # Only frames whose slots made it into the file count
+        self.count = min(count, max(0, (len(self._map) - self.data_offset) // self.slot_bytes))
+        self.index = np.frombuffer(self._map, INDEX_DTYPE, self.count, self.index_offset)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        entry = self.index[i]
+        dtype = np.dtype(entry['dtype'].decode())
+        shape = (int(entry['height']), int(entry['width']))
+        if entry['channels'] > 1:
+            shape += (int(entry['channels']),)
+        frame = np.frombuffer(self._map, dtype, int(np.prod(shape)), self.data_offset + i * self.slot_bytes)
+        return float(entry['timestamp']), frame.reshape(shape)
+
+    def timestamps(self):
+        return self.index['timestamp'].copy()
+
+    def fps(self):
+        """Average frame rate over the spool, or 0.0 for fewer than two frames"""
+        if self.count < 2:
+            return 0.0
+        duration = float(self.index['timestamp'][-1] - self.index['timestamp'][0])
+        return (self.count - 1) / duration if duration > 0 else 0.0
+
+    def info(self):
+        first = self[0][1] if self.count else None
+        return {
+            'frames': self.count,
+            'capacity': self.capacity,
+            'shape': first.shape if first is not None else None,
+            'dtype': str(first.dtype) if first is not None else None,
+            'fps': self.fps(),
+            'duration_s': float(self.index['timestamp'][-1] - self.index['timestamp'][0]) if self.count else 0.0,
+            'bytes': len(self._map),
+            'created': self.created,
+        }
+
+    def close(self):
+        self.index = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class SpoolRecorder:
+    """Copies every grabbed frame into a spool file until stopped or full.
+
+    Drop-in for VideoRecorder in the app (same start/stop/stats). A frame
+    that was overwritten in the grabber's ring before it could be copied,
+    because the disk couldn't keep up, counts as dropped.
+    """
+
+    def __init__(self, grabber, output_dir, max_bytes=4 * 1024 ** 3, max_frames=None, prefix="spool"):
+        self.grabber = grabber
+        self.output_dir = output_dir
+        self.max_bytes = max_bytes
+        self.max_frames = max_frames
+        # Milliseconds, and a suffix on collision in start(), so no spool is ever truncated
+        self.path = os.path.join(output_dir, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}.spool")
+
+        self.spool = None
+        self._stop_event = threading.Event()
+        self.is_running = False
+        self.thread = None
+
+        # Stats
+        self.recorded = 0
+        self.dropped = 0
+        self.oversize = 0  # frames bigger than the slots (the source grew)
+        self.copy_ms = 0.0
+        self.started = 0.0
+        self.finished = 0.0  # when the recording stopped
+        self.error = None
+
+    @property
+    def segments(self):
+        return [self.path] if self.spool is not None else []
+
+    def start(self):
+        shape, dtype = self.grabber.frame_format()
+        if shape is None:
+            raise Exception("No frames to record")
+        os.makedirs(self.output_dir, exist_ok=True)
+        base, suffix = os.path.splitext(self.path)[0], 0
+        while self.spool is None:
+            try:
+                self.spool = SpoolWriter(self.path, shape, dtype, capacity=self.max_frames, max_bytes=self.max_bytes)
+            except FileExistsError:
+                suffix += 1
+                self.path = f"{base}_{suffix}.spool"
+        self.is_running = True
+        self.started = time.time()
+        self.finished = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        spool = self.spool
+        last_seq = self.grabber.seq
+        out = None
+        try:
+            while not self._stop_event.is_set() and not spool.full:
+                seq = self.grabber.wait_for_frame(last_seq, timeout=0.5)
+                if seq == last_seq:
+                    if not self.grabber.is_running:
+                        break
+                    continue
+                shape, dtype = self.grabber.frame_format()
+                for s in range(last_seq + 1, seq + 1):
+                    out = spool.slot(shape, dtype)
+                    if out is None:
+                        if not spool.full:
+                            self.oversize += 1
+                        break
+                    start = time.perf_counter()
+                    timestamp = self.grabber.copy_frame(s, out)
+                    if timestamp is None:
+                        self.dropped += 1
+                        METRICS.count('record_dropped')
+                        continue
+                    spool.commit(out, timestamp, s)
+                    now = METRICS.record_since('spool_copy', start)
+                    self.copy_ms += ((now - start) * 1000 - self.copy_ms) * 0.1
+                    self.recorded += 1
+                    METRICS.count('recorded')
+                # The map can't be closed while a view into it is alive
+                out = None
+                last_seq = seq
+        except Exception as e:
+            # Drop every view into the map, including those held by the traceback
+            out = None
+            self.error = e.with_traceback(None)
+            print(f"Error spooling frames: {e}")
+        finally:
+            try:
+                spool.close()
+            except (OSError, BufferError) as e:
+                self.error = self.error or e
+            self.finished = time.time()
+            self.is_running = False
+
+    @property
+    def bytes_written(self):
+        return self.spool.bytes_used if self.spool is not None else 0
+
+    def stats(self):
+        elapsed = max(1e-6, (self.finished or time.time()) - self.started) if self.started else 0.0
+        return {
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'oversize': self.oversize,
+            'capacity': self.spool.capacity if self.spool is not None else 0,
+            'segments': len(self.segments),
+            'bytes_written': self.bytes_written,
+            'copy_ms': self.copy_ms,
+            'fps': self.recorded / elapsed if elapsed else 0.0,
+            'running': self.is_running,
+        }
+
+
+# --- Export -------------------------------------------------------------------
+
+def _init_worker():
+    # Each worker encodes one frame at a time; the processes are the parallelism
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def _export_range(path, start, stop, output_dir, extension, options):
+    """Write frames ``start``..``stop`` of a spool as images; runs in a worker process"""
+    from saver import encode_and_write
+    reader = SpoolReader(path)
+    try:
+        written = 0
+        for i in range(start, stop):
+            encode_and_write(reader[i][1], os.path.join(output_dir, f"frame_{i:06d}.{extension}"), options)
+            written += 1
+        return written
+    finally:
+        reader.close()
+
+
+def _export_video(reader, output_path, fourcc, fps):
+    import cv2
+    writer = None
+    try:
+        for i in range(len(reader)):
+            _, frame = reader[i]
+            if writer is None:
+                writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps,
+                                         (frame.shape[1], frame.shape[0]))
+                if not writer.isOpened():
+                    raise Exception(f"Cannot open video writer for {output_path}")
+            writer.write(frame)
+    finally:
+        if writer is not None:
+            writer.release()
+    return len(reader)
+
+
+def export(path, output=None, fmt='png', workers=None, options=None, chunk=32):
+    """Convert a spool to numbered images or one video; returns the output directory or file.
+
+    Images are encoded by ``workers`` processes (default: one per core)
+    in chunks of ``chunk`` frames, next to a ``timestamps.csv`` mapping
+    file names to capture times. A video can only be written in order, so
+    it is encoded in this process at the spool's average frame rate.
+    """
+    from saver import DEFAULT_OPTIONS
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    base = os.path.splitext(path)[0]
+    reader = SpoolReader(path)
+    try:
+        count = len(reader)
+        fourcc = EXPORT_FORMATS[fmt]
+        if fourcc is not None:
+            output = output or f"{base}.{fmt}"
+            _export_video(reader, output, fourcc, reader.fps() or 30.0)
+            return output
+        output = output or base
+        os.makedirs(output, exist_ok=True)
+        with open(os.path.join(output, "timestamps.csv"), "w") as f:
+            f.write("file,timestamp\n")
+            for i, timestamp in enumerate(reader.timestamps()):
+                f.write(f"frame_{i:06d}.{fmt},{timestamp:.6f}\n")
+    finally:
+        reader.close()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(_export_range, path, start, min(count, start + chunk), output, fmt, options)
+                   for start in range(0, count, chunk)]
+        for future in futures:
+            future.result()
+    return output
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect a raw frame spool or export it to images or video")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info_parser = commands.add_parser("info", help="show frame count, size and rate")
+    info_parser.add_argument("spool")
+    export_parser = commands.add_parser("export", help="convert to numbered images or a video")
+    export_parser.add_argument("spool")
+    export_parser.add_argument("-f", "--format", default="png", choices=sorted(EXPORT_FORMATS))
+    export_parser.add_argument("-o", "--output", default=None,
+                               help="output directory (images) or file (video); default next to the spool")
+    export_parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    export_parser.add_argument("-q", "--quality", type=int, default=None, help="JPEG/WebP quality (1-100)")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        reader = SpoolReader(args.spool)
+        info = reader.info()
+        reader.close()
+        print(f"{info['frames']} of {info['capacity']} frames, {info['shape']} {info['dtype']}, "
+              f"{info['duration_s']:.2f} s at {info['fps']:.1f} FPS, {info['bytes'] / 1e6:.1f} MB")
+        return 0
+
+    options = {}
+    if args.quality is not None:
+        quality = min(100, max(1, args.quality))
+        options = {'jpeg_quality': quality, 'webp_quality': quality}
+    start = time.perf_counter()
+    output = export(args.spool, args.output, args.format, args.jobs, options)
+    print(f"Exported to {output} in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
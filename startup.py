@@ -0,0 +1,139 @@
+"""Startup timeline of the app, and what its imports cost.
+
+The app marks each phase of coming up (its own imports, window shown,
+capture backend loaded, connect clicked, first preview frame) against
+process start. With ``CAPTURE_PROFILE_STARTUP=1`` every mark is printed to
+stderr as it happens, laid out like ``python -X importtime``:
+
+    startup time: self [ms] | cumulative [ms] | phase
+    startup time:      72.4 |            72.4 | imports
+    startup time:      41.9 |           114.3 | window
+
+The marks are also kept as ``startup_<phase>_ms`` gauges, so stats exports
+include them. Running this module breaks the imports of each phase down:
+
+    python startup.py            # slowest imports before the window, then of the backend
+    python startup.py --all      # every module, not just the ones each phase imports directly
+"""
+import os
+import subprocess
+import sys
+import time
+
+from metrics import METRICS
+
+# What PhoneCameraApp.load_backend imports once the window is up
+BACKEND_MODULES = ['camera_discovery', 'engine', 'frame_format', 'library', 'preview', 'recorder', 'saver', 'spool']
+
+
+def _process_start():
+    """perf_counter() reading at process start, where the OS tells us; else None"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the start time in clock ticks after boot; the name in
+            # field 2 may contain spaces, so count from its closing parenthesis
+            fields = f.read().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        return time.perf_counter() - (time.clock_gettime(time.CLOCK_BOOTTIME) - started)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupProfile:
+    """Times from process start (or from the first import of this module) to each phase"""
+
+    def __init__(self, origin=None, verbose=None):
+        self.origin = origin if origin is not None else (_process_start() or time.perf_counter())
+        if verbose is None:
+            verbose = os.environ.get('CAPTURE_PROFILE_STARTUP', '') not in ('', '0')
+        self.verbose = verbose
+        self.marks = {}  # phase -> ms since origin, in the order they happened
+
+    def mark(self, phase):
+        """Record that ``phase`` just finished; only its first completion counts"""
+        if phase in self.marks:
+            return
+        elapsed = (time.perf_counter() - self.origin) * 1000
+        previous = list(self.marks.values())[-1] if self.marks else 0.0
+        self.marks[phase] = elapsed
+        METRICS.gauge(f'startup_{phase}_ms', round(elapsed, 1))
+        if self.verbose:
+            if len(self.marks) == 1:
+                print("startup time: self [ms] | cumulative [ms] | phase", file=sys.stderr)
+            print(f"startup time: {elapsed - previous:>9.1f} | {elapsed:>15.1f} | {phase}", file=sys.stderr)
+
+    def elapsed(self, phase):
+        return self.marks.get(phase)
+
+    def report(self):
+        lines = ["startup time: self [ms] | cumulative [ms] | phase"]
+        previous = 0.0
+        for phase, elapsed in self.marks.items():
+            lines.append(f"startup time: {elapsed - previous:>9.1f} | {elapsed:>15.1f} | {phase}")
+            previous = elapsed
+        return "\n".join(lines)
+
+
+STARTUP = StartupProfile()
+
+
+def import_times(code):
+    """Run ``code`` in a fresh interpreter under -X importtime.
+
+    Returns ``[(module, self_ms, cumulative_ms, depth), ...]`` in import
+    order, where depth 0 is imported by ``code`` itself.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return entries
+
+
+def phase_imports():
+    """Import times of what loads before the window and of what the backend adds.
+
+    Returns ``{'window': entries, 'backend': entries}`` in the format of
+    ``import_times``. Both phases run in one interpreter, so the backend is
+    only charged for what the app hadn't already loaded.
+    """
+    marker = "import sys; sys.stderr.write('import time: 0 | 0 | --backend--\\n')"
+    code = f"import app; {marker}; " + "; ".join(f"import {module}" for module in BACKEND_MODULES)
+    phases = {'window': [], 'backend': []}
+    phase = 'window'
+    for entry in import_times(code):
+        if entry[0] == '--backend--':
+            phase = 'backend'
+        else:
+            phases[phase].append(entry)
+    return phases
+
+
+def main(argv=None):
+    import argparse  # the app imports this module first thing, so keep it light
+    parser = argparse.ArgumentParser(description="Show what the app imports before its window and for its backend")
+    parser.add_argument("--all", action="store_true", help="list every module, not just direct imports")
+    parser.add_argument("--top", type=int, default=15, help="modules to list per phase (default 15)")
+    args = parser.parse_args(argv)
+
+    for phase, entries in phase_imports().items():
+        total = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+        # Before the window, app's own imports are what matter
+        shown_depth = 1 if phase == 'window' else 0
+        shown = [entry for entry in entries if args.all or entry[3] == shown_depth]
+        print(f"{phase}: {total:.1f} ms of imports")
+        print("    self [ms] | cumulative [ms] | module")
+        for name, self_ms, cumulative_ms, _ in sorted(shown, key=lambda entry: -entry[2])[:args.top]:
+            print(f"    {self_ms:>9.1f} | {cumulative_ms:>15.1f} | {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import os
+import time
+
+import pytest
+
+from benchmark import SyntheticCapture, synthetic_frames
+from grabber import FrameGrabber
+
+
+@pytest.fixture
+def frames():
+    return synthetic_frames(160, 120, count=4)
+
+
+@pytest.fixture
+def grabber(frames):
+    """A running FrameGrabber over a 100 FPS synthetic camera"""
+    grabber = FrameGrabber(SyntheticCapture(frames, fps=100), slots=4)
+    grabber.start()
+    yield grabber
+    grabber.stop()
+
+
+
+@pytest.fixture
+def x_display():
+    """Skips unless an X server (e.g. Xvfb) is reachable"""
+    if not os.environ.get('DISPLAY'):
+        pytest.skip("no X display (run under xvfb-run)")
+    return os.environ['DISPLAY']
+
+
+@pytest.fixture
+def tk_window(x_display):
+    """A mapped 120x80 red Tk window at (50, 60), titled uniquely for this run"""
+    tkinter = pytest.importorskip("tkinter")
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError as e:
+        pytest.skip(f"Tk cannot open the display: {e}")
+    root.title(f"smart-capture-test-{os.getpid()}")
+    root.configure(background="#ff0000")
+    root.geometry("120x80+50+60")
+    root.update()
+    # Give the window manager, if any, time to map and place it
+    deadline = time.time() + 2.0
+    while time.time() < deadline and not root.winfo_viewable():
+        root.update()
+        time.sleep(0.02)
+    yield root
+    root.destroy()
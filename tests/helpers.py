@@ -0,0 +1,9 @@
+import time
+
+
+def wait_until(condition, timeout=5.0):
+    """Poll ``condition`` until it holds or ``timeout`` passes; returns its last value"""
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
@@ -0,0 +1,75 @@
+import camera_discovery
+from camera_discovery import CameraDiscovery
+
+
+def make_discovery(tmp_path, monkeypatch, working):
+    """A CameraDiscovery over fake nodes 0 and 1 where ``working`` decides what a probe finds"""
+    probed = []
+    nodes = {0: tmp_path / "video0", 1: tmp_path / "video1"}
+    for node in nodes.values():
+        if not node.exists():
+            node.touch()
+
+    def probe(index, backend):
+        probed.append(index)
+        ok = index in working
+        return {'index': index, 'ok': ok, 'backend': 'FAKE' if ok else None,
+                'width': 640 if ok else 0, 'height': 480 if ok else 0}
+
+    monkeypatch.setattr(camera_discovery, 'probe_camera', probe)
+    monkeypatch.setattr(camera_discovery, 'list_modes', lambda index: [])
+    discovery = CameraDiscovery(cache_path=str(tmp_path / "cameras.json"))
+    monkeypatch.setattr(discovery, 'candidates', lambda: [(i, str(n)) for i, n in nodes.items()])
+    return discovery, probed
+
+
+def indices(devices):
+    return [d['index'] for d in devices]
+
+
+def test_cached_verdicts_skip_probing(tmp_path, monkeypatch):
+    discovery, probed = make_discovery(tmp_path, monkeypatch, working={0})
+    assert indices(discovery.discover()) == [0]
+    assert sorted(probed) == [0, 1]
+
+    probed.clear()
+    assert indices(discovery.discover()) == [0]
+    assert probed == []
+
+
+def test_failed_verdict_expires(tmp_path, monkeypatch):
+    working = {0}
+    discovery, probed = make_discovery(tmp_path, monkeypatch, working)
+    discovery.discover()
+
+    # Camera 1 was busy; it frees up without its node changing
+    working.add(1)
+    probed.clear()
+    assert indices(discovery.discover()) == [0]
+    assert probed == []
+
+    for entry in discovery.cache.values():
+        entry['last_seen'] -= discovery.failed_ttl
+    assert indices(discovery.discover()) == [0, 1]
+    assert probed == [1]
+
+
+def test_retry_failed_reprobes_only_failures(tmp_path, monkeypatch):
+    working = {0}
+    discovery, probed = make_discovery(tmp_path, monkeypatch, working)
+    discovery.discover()
+
+    working.add(1)
+    probed.clear()
+    assert indices(discovery.discover(retry_failed=True)) == [0, 1]
+    assert probed == [1]
+
+
+def test_cache_survives_a_restart(tmp_path, monkeypatch):
+    discovery, probed = make_discovery(tmp_path, monkeypatch, working={1})
+    discovery.discover()
+
+    again, probed = make_discovery(tmp_path, monkeypatch, working={1})
+    assert indices(again.cached_devices()) == [1]
+    assert indices(again.discover()) == [1]
+    assert probed == []
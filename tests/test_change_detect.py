@@ -0,0 +1,80 @@
+import numpy as np
+
+from change_detect import ChangeDetector
+
+
+def blank(width=256, height=192):
+    return np.full((height, width, 3), 80, np.uint8)
+
+
+def test_first_frame_counts_as_changed():
+    result = ChangeDetector().update(blank())
+    assert result.changed
+    assert result.tiles.shape == (3, 4)
+    assert result.fraction == 1.0
+    assert result.rects() == [(0, 0, 256, 64), (0, 64, 256, 64), (0, 128, 256, 64)]
+
+
+def test_identical_frame_is_unchanged():
+    detector = ChangeDetector()
+    detector.update(blank())
+    result = detector.update(blank())
+    assert not result.changed
+    assert result.fraction == 0.0
+    assert result.rects() == []
+
+
+def test_small_noise_stays_below_threshold():
+    detector = ChangeDetector(threshold=6)
+    frame = blank()
+    detector.update(frame)
+    noisy = frame + np.random.default_rng(0).integers(0, 3, frame.shape, dtype=np.uint8)
+    assert not detector.update(noisy).changed
+
+
+def test_change_is_located_by_tile():
+    detector = ChangeDetector(tile_size=64)
+    frame = blank()
+    detector.update(frame)
+    changed = frame.copy()
+    changed[70:100, 140:180] = 255  # inside the tile at row 1, column 2
+    result = detector.update(changed)
+    assert result.tiles.sum() == 1 and result.tiles[1, 2]
+    assert result.rects() == [(128, 64, 64, 64)]
+
+
+def test_adjacent_tiles_merge_and_edges_clip():
+    detector = ChangeDetector(tile_size=64)
+    frame = blank(250, 100)
+    detector.update(frame)
+    changed = frame.copy()
+    changed[10:30, 100:250] = 0  # columns 1 to 3 of the first row; the last one is 58 px wide
+    result = detector.update(changed)
+    assert result.rects() == [(64, 0, 186, 64)]
+
+
+def test_compares_with_the_previous_frame_not_the_first():
+    detector = ChangeDetector()
+    first = blank()
+    second = first.copy()
+    second[:64, :64] = 200
+    detector.update(first)
+    assert detector.update(second).changed
+    assert not detector.update(second.copy()).changed
+
+
+def test_new_size_and_reset_count_as_changed():
+    detector = ChangeDetector()
+    detector.update(blank())
+    assert detector.update(blank(320, 240)).fraction == 1.0
+    detector.reset()
+    assert detector.update(blank(320, 240)).fraction == 1.0
+
+
+def test_grey_frames():
+    detector = ChangeDetector()
+    frame = np.zeros((128, 128), np.uint8)
+    detector.update(frame)
+    frame[0:10, 0:10] = 255
+    result = detector.update(frame)
+    assert result.rects() == [(0, 0, 64, 64)]
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from benchmark import SyntheticCapture
+from grabber import FrameGrabber
+
+from .helpers import wait_until
+
+
+def stopped_grabber(frames, count):
+    """A grabber that read exactly ``count`` frames and stopped"""
+    cap = SyntheticCapture(frames)
+    grabber = FrameGrabber(cap, slots=4)
+    grabber.start()
+    wait_until(lambda: grabber.seq >= count)
+    grabber.stop(release=False)
+    return grabber
+
+
+def test_slots_must_be_at_least_two(frames):
+    with pytest.raises(ValueError):
+        FrameGrabber(SyntheticCapture(frames), slots=1)
+
+
+def test_seq_counts_every_frame(grabber):
+    seq = grabber.wait_for_frame(0, timeout=2.0)
+    assert seq >= 1
+    newer = grabber.wait_for_frame(seq, timeout=2.0)
+    assert newer > seq
+    assert grabber.frames_read >= newer
+
+
+def test_latest_returns_a_private_copy(grabber, frames):
+    grabber.wait_for_frame(0, timeout=2.0)
+    seq, timestamp, frame = grabber.latest()
+    assert seq >= 1 and timestamp > 0
+    assert frame.shape == frames[0].shape
+    frame[:] = 0
+    _, _, again = grabber.latest()
+    assert again.any()
+
+
+def test_latest_reuses_out(grabber, frames):
+    grabber.wait_for_frame(0, timeout=2.0)
+    out = np.empty_like(frames[0])
+    _, _, frame = grabber.latest(out)
+    assert frame is out
+
+
+def test_frame_format(grabber, frames):
+    assert FrameGrabber(SyntheticCapture(frames)).frame_format() == (None, None)
+    grabber.wait_for_frame(0, timeout=2.0)
+    assert grabber.frame_format() == (frames[0].shape, frames[0].dtype)
+
+
+def test_copy_frame_returns_held_frames(frames):
+    grabber = stopped_grabber(frames, 10)
+    out = np.empty_like(frames[0])
+    newest = grabber.seq
+    # The slot after the newest is the one being decoded into, so slots - 1 frames are held
+    for seq in range(newest - grabber.slots + 2, newest + 1):
+        assert grabber.copy_frame(seq, out) is not None
+        # The synthetic camera cycles through its frames, one per seq
+        assert np.array_equal(out, frames[(seq - 1) % len(frames)])
+
+
+def test_copy_frame_refuses_overwritten_future_and_mismatched(frames):
+    grabber = stopped_grabber(frames, 10)
+    out = np.empty_like(frames[0])
+    newest = grabber.seq
+    assert grabber.copy_frame(newest - grabber.slots + 1, out) is None
+    assert grabber.copy_frame(newest + 1, out) is None
+    assert grabber.copy_frame(newest, np.empty((10, 10, 3), np.uint8)) is None
+
+
+def test_frames_since(frames):
+    grabber = stopped_grabber(frames, 10)
+    newest = grabber.seq
+    held = grabber.frames_since(newest - 2)
+    assert [seq for seq, _, _ in held] == [newest - 1, newest]
+    assert grabber.frames_since(newest) == []
+
+
+def test_wait_for_frame_returns_once_stopped(frames):
+    grabber = stopped_grabber(frames, 1)
+    assert grabber.wait_for_frame(grabber.seq, timeout=5.0) == grabber.seq
+
+
+def test_failed_source_stops_grabber(frames):
+    cap = SyntheticCapture(frames)
+    cap.release()
+    grabber = FrameGrabber(cap, max_failures=3)
+    grabber.start()
+    assert wait_until(lambda: not grabber.is_running)
+    assert grabber.failed
+    grabber.stop()
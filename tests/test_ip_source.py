@@ -0,0 +1,107 @@
+import threading
+
+import cv2
+import pytest
+
+from ip_source import IPCameraCapture, ffmpeg_options_string, is_stream_url
+from restream import RestreamServer
+
+from .helpers import wait_until
+
+pytestmark = pytest.mark.skipif(not cv2.videoio_registry.hasBackend(cv2.CAP_FFMPEG),
+                                reason="OpenCV built without FFmpeg")
+
+
+def test_is_stream_url():
+    assert is_stream_url("rtsp://camera/stream")
+    assert not is_stream_url(0)
+    assert not is_stream_url("video.avi")
+
+
+def test_rtsp_defaults_to_tcp():
+    assert ffmpeg_options_string("rtsp://camera", {'fflags': 'nobuffer'}) == "fflags;nobuffer|rtsp_transport;tcp"
+    assert ffmpeg_options_string("RTSP://camera", {'rtsp_transport': 'udp'}) == "rtsp_transport;udp"
+    assert ffmpeg_options_string("http://camera/video", {'flags': 'low_delay'}) == "flags;low_delay"
+
+
+def test_reads_and_reconnects(grabber, frames):
+    server = RestreamServer(port=0)
+    server.start()
+    server.set_source(grabber)
+    port = server.port
+    cap = IPCameraCapture(server.url + "video", initial_backoff=0.1, max_backoff=0.5,
+                          open_timeout_ms=3000, read_timeout_ms=1000)
+    try:
+        assert cap.isOpened()
+        ok, frame = cap.read()
+        assert ok and frame.shape == frames[0].shape
+        assert cap.stats()['state'] == 'connected'
+
+        # Take the server away; the read in flight rides out the drop-out
+        results = []
+        server.stop()
+
+        def read_through():
+            for _ in range(200):
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                if cap.reconnects:
+                    results.append(frame)
+                    break
+
+        reader = threading.Thread(target=read_through)
+        reader.start()
+        assert wait_until(lambda: cap.stats()['state'] == 'reconnecting', timeout=10.0)
+        server = RestreamServer(port=port)
+        server.start()
+        server.set_source(grabber)
+        reader.join(20.0)
+        assert not reader.is_alive()
+        assert results and results[0].shape == frames[0].shape
+        stats = cap.stats()
+        assert stats['reconnects'] >= 1 and stats['state'] == 'connected'
+        assert stats['last_error']
+    finally:
+        cap.release()
+        server.stop()
+
+
+def test_interrupt_ends_a_reconnecting_read(grabber):
+    server = RestreamServer(port=0)
+    server.start()
+    server.set_source(grabber)
+    cap = IPCameraCapture(server.url + "video", initial_backoff=0.1, max_backoff=0.2,
+                          open_timeout_ms=1000, read_timeout_ms=1000)
+    try:
+        assert cap.read()[0]
+        server.stop()
+
+        def read_until_failed():
+            while cap.read()[0]:
+                pass
+
+        reader = threading.Thread(target=read_until_failed)
+        reader.start()
+        assert wait_until(lambda: cap.stats()['state'] == 'reconnecting', timeout=10.0)
+        cap.interrupt()
+        reader.join(10.0)
+        assert not reader.is_alive()
+    finally:
+        cap.release()
+
+
+def test_gives_up_after_max_reconnects(grabber):
+    server = RestreamServer(port=0)
+    server.start()
+    server.set_source(grabber)
+    cap = IPCameraCapture(server.url + "video", initial_backoff=0.05, max_backoff=0.1, max_reconnects=2,
+                          open_timeout_ms=1000, read_timeout_ms=1000)
+    try:
+        assert cap.read()[0]
+        server.stop()
+        # Frames already buffered may still come through; then the reads fail
+        assert wait_until(lambda: not cap.read()[0], timeout=20.0)
+        assert cap.stats()['state'] == 'failed'
+    finally:
+        cap.release()
@@ -0,0 +1,155 @@
+import os
+import sqlite3
+
+import cv2
+import numpy as np
+import pytest
+
+from library import DUPLICATE_DISTANCE, CaptureLibrary, ThumbnailStore, hamming, perceptual_hash, thumbnail
+
+
+@pytest.fixture
+def library(tmp_path):
+    library = CaptureLibrary(str(tmp_path / "captures.db"), str(tmp_path / "thumbnails.bin"))
+    yield library
+    library.close()
+
+
+def save(frames, directory, name, index, quality=95):
+    path = os.path.join(directory, name)
+    cv2.imwrite(path, frames[index], [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return path
+
+
+def test_hash_ignores_reencoding_but_not_content(frames):
+    ok, data = cv2.imencode('.jpg', frames[0], [cv2.IMWRITE_JPEG_QUALITY, 50])
+    reencoded = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    assert hamming(perceptual_hash(frames[0]), perceptual_hash(reencoded)) <= DUPLICATE_DISTANCE
+    assert hamming(perceptual_hash(frames[0]), perceptual_hash(frames[1])) > DUPLICATE_DISTANCE
+
+
+def test_thumbnail_is_letterboxed_to_size():
+    wide = np.full((100, 400, 3), (255, 0, 0), np.uint8)  # blue in BGR
+    image = thumbnail(wide, (160, 120))
+    assert image.shape == (120, 160, 3)
+    assert (image[0] == 0).all()  # bars above and below
+    assert tuple(image[60, 80]) == (0, 0, 255)  # RGB
+
+
+def test_index_round_trips_hashes_with_the_top_bit_set(library, frames, tmp_path):
+    path = save(frames, str(tmp_path), "a.jpg", 0)
+    entry = library.add(path, frame=frames[0], source="usb0", timestamp=123.0)
+    phash = perceptual_hash(frames[0])
+    assert phash >= 1 << 63
+
+    assert entry['phash'] == phash
+    assert entry['path'] == path and entry['directory'] == str(tmp_path)
+    assert (entry['width'], entry['height'], entry['source'], entry['timestamp']) == (160, 120, "usb0", 123.0)
+    assert entry['bytes'] == os.path.getsize(path)
+
+    # Stored signed, as SQLite integers are 64-bit signed
+    db = sqlite3.connect(library.db_path)
+    stored = db.execute("SELECT phash FROM captures WHERE id = ?", (entry['id'],)).fetchone()[0]
+    db.close()
+    assert stored < 0 and stored + (1 << 64) == phash
+
+
+def test_near_duplicates_are_marked(library, frames, tmp_path):
+    first = library.add(save(frames, str(tmp_path), "a.jpg", 0), frame=frames[0], timestamp=1.0)
+    other = library.add(save(frames, str(tmp_path), "b.jpg", 1), frame=frames[1], timestamp=2.0)
+    again = library.add(save(frames, str(tmp_path), "c.jpg", 0, quality=50), timestamp=3.0)
+
+    assert first['duplicate_of'] is None and other['duplicate_of'] is None
+    assert again['duplicate_of'] == first['id']
+    assert [e['id'] for e in library.captures(str(tmp_path), duplicates_only=True)] == [again['id']]
+    assert [e['id'] for e in library.captures(str(tmp_path))] == [again['id'], other['id'], first['id']]
+
+    # Duplicates are only looked for within one directory
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    assert library.add(save(frames, str(elsewhere), "a.jpg", 0))['duplicate_of'] is None
+
+
+def test_duplicates_found_after_reopening(frames, tmp_path):
+    args = (str(tmp_path / "captures.db"), str(tmp_path / "thumbnails.bin"))
+    library = CaptureLibrary(*args)
+    first = library.add(save(frames, str(tmp_path), "a.jpg", 0))
+    library.close()
+
+    # Hashes are read back from the database, unsigned again
+    library = CaptureLibrary(*args)
+    try:
+        assert library.add(save(frames, str(tmp_path), "b.jpg", 0, quality=60))['duplicate_of'] == first['id']
+    finally:
+        library.close()
+
+
+def test_saving_over_a_file_replaces_its_entry(library, frames, tmp_path):
+    path = save(frames, str(tmp_path), "a.jpg", 0)
+    first = library.add(path)
+    duplicate = library.add(save(frames, str(tmp_path), "b.jpg", 0, quality=60))
+    replaced = library.add(save(frames, str(tmp_path), "a.jpg", 1))
+
+    assert replaced['id'] != first['id'] and library.get(first['id']) is None
+    assert len(library.captures(str(tmp_path))) == 2
+    # b.jpg now points at the replacement row
+    assert library.get(duplicate['id'])['duplicate_of'] == replaced['id']
+
+
+def test_scan_indexes_new_files_and_forgets_deleted_ones(library, frames, tmp_path):
+    for i in range(3):
+        save(frames, str(tmp_path), f"{i}.jpg", i)
+    (tmp_path / "notes.txt").write_text("not an image")
+    assert library.scan(str(tmp_path)) == 3
+    assert library.scan(str(tmp_path)) == 0
+
+    os.remove(tmp_path / "1.jpg")
+    library.scan(str(tmp_path))
+    entries = library.captures(str(tmp_path))
+    assert sorted(os.path.basename(e['path']) for e in entries) == ["0.jpg", "2.jpg"]
+    # Decoded at a reduced size, but the real size is recorded
+    assert all((e['width'], e['height']) == (160, 120) for e in entries)
+
+
+def test_thumbnails_are_stored_in_their_entry_slot(library, frames, tmp_path):
+    entry = library.add(save(frames, str(tmp_path), "a.jpg", 0), frame=frames[0])
+    assert entry['thumbnail'] == entry['id']
+    expected = thumbnail(frames[0], library.thumbnails.size)
+    assert np.array_equal(library.thumbnail(entry), expected)
+
+    # A missing thumbnail is regenerated from the file
+    entry['thumbnail'] = None
+    library.thumbnails._cache.clear()
+    assert library.thumbnail(entry).shape == (120, 160, 3)
+    assert entry['thumbnail'] == entry['id']
+
+
+def test_thumbnail_store_slots(tmp_path):
+    path = str(tmp_path / "thumbnails.bin")
+    store = ThumbnailStore(path, size=(8, 6), cache_size=2)
+    images = [np.full((6, 8, 3), i * 40, np.uint8) for i in range(4)]
+    try:
+        assert store.read(0) is None
+
+        # Slots are written at their offset, in any order, growing the file
+        store.write(3, images[3])
+        store.write(1, images[1])
+        assert os.path.getsize(path) == 4 * store.slot_bytes
+        assert np.array_equal(store.read(3), images[3])
+        assert np.array_equal(store.read(1), images[1])
+        assert not store.read(0).any()  # never written: a hole of zeros
+        assert store.read(4) is None
+
+        # Growing past the mapping remaps it; rewriting a slot drops the cached copy
+        store.write(9, images[2])
+        assert np.array_equal(store.read(9), images[2])
+        store.write(3, images[0])
+        assert np.array_equal(store.read(3), images[0])
+        assert len(store._cache) <= 2
+
+        # Another store over the same file sees the same slots
+        other = ThumbnailStore(path, size=(8, 6))
+        assert np.array_equal(other.read(9), images[2])
+        other.close()
+    finally:
+        store.close()
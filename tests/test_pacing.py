@@ -0,0 +1,94 @@
+import pytest
+
+from pacing import CpuMonitor, FramePacer
+
+
+def test_target_starts_at_nominal_rate_within_limits():
+    assert FramePacer(nominal_fps=30).target_fps == 30
+    assert FramePacer(nominal_fps=240, max_fps=60).target_fps == 60
+    assert FramePacer().target_fps == 60
+    assert FramePacer(nominal_fps=0).source_fps is None
+
+
+def test_delay_follows_absolute_deadlines():
+    pacer = FramePacer(nominal_fps=10)
+    assert pacer.delay(now=0.0) == pytest.approx(0.1)
+    # 30 ms of work: the next deadline is still 100 ms after the last one
+    assert pacer.delay(now=0.13) == pytest.approx(0.07)
+    assert pacer.delay(now=0.3) == pytest.approx(0.0)
+
+
+def test_delay_restarts_after_falling_a_frame_behind():
+    pacer = FramePacer(nominal_fps=10)
+    pacer.delay(now=0.0)
+    # Half a second late: no burst of zero delays to catch up
+    assert pacer.delay(now=0.6) == pytest.approx(0.1)
+
+
+def test_observe_frame_learns_the_source_rate():
+    pacer = FramePacer()
+    for i in range(50):
+        pacer.observe_frame(i / 20.0)
+    assert pacer.source_fps == pytest.approx(20.0)
+
+
+def test_observe_rate_smooths_towards_measurement():
+    pacer = FramePacer(nominal_fps=30)
+    pacer.observe_rate(10)
+    assert pacer.source_fps == pytest.approx(20.0)
+
+
+def test_backs_off_under_load_but_not_below_min():
+    pacer = FramePacer(nominal_fps=30, min_fps=5)
+    assert pacer.adapt(cpu_load=0.95) == pytest.approx(24.0)
+    for _ in range(50):
+        pacer.adapt(cpu_load=0.95)
+    assert pacer.target_fps == 5
+
+
+def test_backs_off_when_work_fills_the_frame_budget():
+    pacer = FramePacer(nominal_fps=30, smoothing=1.0)
+    pacer.observe_work(30.0)  # period is 33 ms
+    assert pacer.adapt(cpu_load=0.1) < 30
+
+
+def test_backs_off_when_falling_behind_offered_frames():
+    pacer = FramePacer(nominal_fps=30)
+    assert pacer.adapt(cpu_load=0.1, achieved_fps=12, offered_fps=30) < 30
+    # Fewer frames offered than the target is the source's doing, not ours
+    pacer = FramePacer(nominal_fps=30)
+    assert pacer.adapt(cpu_load=0.7, achieved_fps=10, offered_fps=10) == 30
+
+
+def test_recovers_up_to_the_source_rate():
+    pacer = FramePacer(nominal_fps=30, min_fps=5)
+    for _ in range(10):
+        pacer.adapt(cpu_load=0.95)
+    assert pacer.target_fps == 5
+    for _ in range(20):
+        pacer.adapt(cpu_load=0.1)
+    assert pacer.target_fps == 30
+    # Jumps straight to a rate the source is offering
+    pacer.target_fps = 5
+    assert pacer.adapt(cpu_load=0.1, achieved_fps=5, offered_fps=25) == 25
+
+
+def test_ceiling_tracks_source_within_limits():
+    pacer = FramePacer(nominal_fps=2, min_fps=5, max_fps=60)
+    assert pacer.ceiling() == 5
+    pacer = FramePacer(nominal_fps=100, max_fps=60)
+    assert pacer.ceiling() == 60
+    assert FramePacer().ceiling() == 60
+
+
+def test_stats():
+    stats = FramePacer(nominal_fps=25).stats()
+    assert stats == {'target_fps': 25, 'source_fps': 25, 'work_ms': 0.0}
+
+
+def test_cpu_monitor_sees_busy_work():
+    monitor = CpuMonitor()
+    sum(i * i for i in range(200000))
+    # Other threads count too, so only the lower bound is certain
+    assert monitor.sample() > 0.0
+    assert monitor.load > 0.0
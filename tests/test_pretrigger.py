@@ -0,0 +1,42 @@
+import threading
+import time
+
+from pretrigger import PreTriggerBuffer
+
+from .helpers import wait_until
+
+
+def test_trigger_collects_frames_before_and_after(grabber):
+    buffer = PreTriggerBuffer(grabber, seconds=1.0)
+    buffer.start()
+    try:
+        assert wait_until(lambda: buffer.stats()['frames'] >= 5)
+        done = threading.Event()
+        result = []
+        trigger_time = buffer.trigger(0.2, on_done=lambda t, frames: (result.extend(frames), done.set()))
+        assert done.wait(3.0)
+        assert any(f.timestamp < trigger_time for f in result)
+        assert any(f.timestamp > trigger_time for f in result)
+        seqs = [f.seq for f in result]
+        assert seqs == sorted(set(seqs))
+    finally:
+        buffer.stop()
+
+
+def test_failure_stops_the_buffer_and_releases_triggers(grabber, monkeypatch):
+    buffer = PreTriggerBuffer(grabber)
+    buffer.start()
+    assert wait_until(lambda: buffer.stats()['frames'] >= 2)
+    done = threading.Event()
+    start = time.time()
+    buffer.trigger(30.0, on_done=lambda t, frames: done.set())
+
+    def fail(frame, seq, timestamp):
+        raise ValueError("bad frame")
+
+    monkeypatch.setattr(buffer._scorer, 'score', fail)
+    assert wait_until(lambda: not buffer.is_running)
+    assert isinstance(buffer.error, ValueError)
+    # The trigger hands over what was held instead of waiting out its 30 s
+    assert done.wait(3.0)
+    assert time.time() - start < 5.0
@@ -0,0 +1,27 @@
+from quality import QualityMonitor
+
+from .helpers import wait_until
+
+
+def test_monitor_scores_grabbed_frames(grabber):
+    monitor = QualityMonitor(grabber, max_load=1.0)
+    monitor.start()
+    try:
+        assert wait_until(lambda: monitor.scored >= 3)
+        quality, frame = monitor.best()
+        assert quality is not None and frame.shape == (120, 160, 3)
+    finally:
+        monitor.stop()
+
+
+def test_scoring_failure_stops_the_monitor(grabber, monkeypatch):
+    monitor = QualityMonitor(grabber)
+
+    def fail(frame, seq, timestamp):
+        raise ValueError("bad frame")
+
+    monkeypatch.setattr(monitor.scorer, 'score', fail)
+    monitor.start()
+    assert wait_until(lambda: not monitor.is_running)
+    assert isinstance(monitor.error, ValueError)
+    assert wait_until(lambda: not monitor.thread.is_alive())
@@ -0,0 +1,84 @@
+import os
+import time
+
+import cv2
+import pytest
+
+from benchmark import SyntheticCapture
+from grabber import FrameGrabber
+from recorder import VideoRecorder
+
+from .helpers import wait_until
+
+
+def record(frames, tmp_path, source_fps, writer_fps, seconds=1.5, **kwargs):
+    grabber = FrameGrabber(SyntheticCapture(frames, fps=source_fps))
+    grabber.start()
+    try:
+        assert wait_until(lambda: grabber.seq > 0)
+        recorder = VideoRecorder(grabber, str(tmp_path), fps=writer_fps, **kwargs)
+        recorder.start()
+        time.sleep(seconds)
+        recorder.stop()
+        assert wait_until(lambda: not recorder.is_running)
+    finally:
+        grabber.stop()
+    assert recorder.error is None
+    return recorder
+
+
+def frame_count(path):
+    cap = cv2.VideoCapture(path)
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    cap.release()
+    return count
+
+
+def test_slow_source_is_padded_to_real_time(frames, tmp_path):
+    recorder = record(frames, tmp_path, source_fps=10, writer_fps=30)
+    stats = recorder.stats()
+    written = frame_count(recorder.segments[0])
+    # About 1.5 s at 30 FPS, not the ~15 frames the source delivered
+    assert 38 <= written <= 48
+    assert stats['recorded'] <= 17
+    assert stats['repeated'] == written - stats['recorded']
+
+
+def test_fast_source_is_thinned_to_the_writer_rate(frames, tmp_path):
+    recorder = record(frames, tmp_path, source_fps=100, writer_fps=10)
+    stats = recorder.stats()
+    written = frame_count(recorder.segments[0])
+    assert 13 <= written <= 17
+    assert stats['discarded'] >= 100
+    assert stats['recorded'] == written - stats['repeated']
+
+
+def test_segments_are_padded_to_their_length(frames, tmp_path):
+    recorder = record(frames, tmp_path, source_fps=10, writer_fps=20, seconds=1.6, segment_seconds=0.5)
+    assert len(recorder.segments) >= 3
+    # Every full segment holds 0.5 s of video
+    for path in recorder.segments[:-1]:
+        assert frame_count(path) == 10
+
+
+def test_jpeg_sequence_keeps_every_frame(frames, tmp_path):
+    recorder = record(frames, tmp_path, source_fps=20, writer_fps=30, seconds=0.5, record_format='JPEG sequence')
+    stats = recorder.stats()
+    assert stats['recorded'] == len(os.listdir(recorder.segments[0]))
+    assert stats['repeated'] == stats['discarded'] == 0
+
+
+def test_recordings_never_share_files(frames, tmp_path):
+    first = record(frames, tmp_path, source_fps=50, writer_fps=25, seconds=0.3)
+    second = record(frames, tmp_path, source_fps=50, writer_fps=25, seconds=0.3)
+    assert set(first.segments).isdisjoint(second.segments)
+
+
+def test_fps_stops_falling_once_stopped(frames, tmp_path):
+    recorder = record(frames, tmp_path, source_fps=50, writer_fps=50, seconds=0.5)
+    fps = recorder.stats()['fps']
+    assert fps == pytest.approx(50, rel=0.3)
+    time.sleep(0.5)
+    assert recorder.stats()['fps'] == fps
@@ -0,0 +1,168 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmark import SyntheticCapture
+from grabber import FrameGrabber
+from mjpeg import MJPEGCapture, NotMJPEGStream
+from restream import RestreamServer
+
+from .helpers import wait_until
+
+
+@pytest.fixture
+def server(grabber):
+    server = RestreamServer(port=0)
+    server.start()
+    server.set_source(grabber)
+    yield server
+    server.stop()
+
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.headers, response.read()
+
+
+def test_port_zero_picks_a_free_port(server):
+    assert server.port != 0
+    assert server.url == f"http://localhost:{server.port}/"
+
+
+def test_mjpeg_capture_reads_the_stream(server, frames):
+    cap = MJPEGCapture(server.url + "stream", timeout=5.0)
+    try:
+        images = []
+        for _ in range(5):
+            ok, frame = cap.read()
+            assert ok
+            images.append(frame)
+        assert all(image.shape == frames[0].shape for image in images)
+        # Lossy, but recognisably one of the source frames
+        error = min(np.abs(images[-1].astype(int) - f.astype(int)).mean() for f in frames)
+        assert error < 8
+        assert cap.stats()['state'] == 'connected'
+        assert cap.full_size == (160, 120)
+    finally:
+        cap.release()
+    stats = server.stats()
+    assert stats['connections'] == 1 and stats['sent'] >= 5 and stats['encoded'] >= 5
+
+
+def test_reduced_decoding(server):
+    cap = MJPEGCapture(server.url + "video", reduction=2)
+    try:
+        ok, frame = cap.read()
+        assert ok and frame.shape == (60, 80, 3)
+        _, data, full = cap.capture()
+        assert full.shape == (120, 160, 3)
+        assert data.startswith(b'\xff\xd8')
+    finally:
+        cap.release()
+
+
+def test_clients_share_one_encode(server, grabber):
+    caps = [MJPEGCapture(server.url + "stream") for _ in range(3)]
+    try:
+        for _ in range(10):
+            for cap in caps:
+                assert cap.read()[0]
+        assert wait_until(lambda: server.stats()['clients'] == 3)
+        stats = server.stats()
+        # Every client got every frame it read from the same encode
+        assert stats['encoded'] <= grabber.seq
+        assert stats['sent'] >= 30
+    finally:
+        for cap in caps:
+            cap.release()
+    assert wait_until(lambda: server.stats()['clients'] == 0)
+
+
+def test_fps_query_limits_the_rate(server):
+    cap = MJPEGCapture(server.url + "stream?fps=5")
+    try:
+        assert cap.read()[0]
+        start = cap.received
+        time.sleep(1.0)
+        # The grabber delivers 100 FPS; allow for the frame in flight
+        assert cap.received - start <= 7
+    finally:
+        cap.release()
+
+
+def test_snapshot_stats_and_index(server, frames):
+    headers, data = fetch(server.url + "snapshot")
+    assert headers['Content-Type'] == "image/jpeg"
+    assert float(headers['X-Timestamp']) > 0
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert image.shape == frames[0].shape
+
+    _, body = fetch(server.url + "stats")
+    assert json.loads(body)['snapshots'] == 1
+
+    headers, body = fetch(server.url)
+    assert headers['Content-Type'] == "text/html" and b'/stream' in body
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        fetch(server.url + "nothing")
+    assert error.value.code == 404
+
+
+def test_snapshot_without_source(server):
+    server.set_source(None)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        fetch(server.url + "shot.jpg")
+    assert error.value.code == 503
+
+
+def test_jpeg_pass_through(server, frames):
+    # Re-serve an MJPEG stream from a second server: the camera's JPEGs go out untouched
+    upstream = MJPEGCapture(server.url + "stream")
+    relay_grabber = FrameGrabber(upstream)
+    relay_grabber.start()
+    relay = RestreamServer(port=0)
+    relay.start()
+    relay.set_source(relay_grabber, jpeg_source=upstream)
+    try:
+        _, data = fetch(relay.url + "snapshot")
+        assert data.startswith(b'\xff\xd8')
+        assert relay.stats()['passed_through'] >= 1
+        assert relay.stats()['encoded'] == 0
+    finally:
+        relay.stop()
+        relay_grabber.stop()
+
+
+def test_not_an_mjpeg_stream(server):
+    with pytest.raises(NotMJPEGStream):
+        MJPEGCapture(server.url + "stats")
+
+
+def test_mjpeg_capture_reconnects(frames):
+    grabber = FrameGrabber(SyntheticCapture(frames, fps=50))
+    grabber.start()
+    server = RestreamServer(port=0)
+    server.start()
+    server.set_source(grabber)
+    port = server.port
+    cap = MJPEGCapture(server.url + "stream", initial_backoff=0.1)
+    try:
+        assert cap.read()[0]
+        server.stop()
+        assert wait_until(lambda: cap.stats()['state'] == 'reconnecting')
+        server = RestreamServer(port=port)
+        server.start()
+        server.set_source(grabber)
+        assert wait_until(lambda: cap.stats()['reconnects'] == 1)
+        received = cap.received
+        assert wait_until(lambda: cap.received > received)
+        assert cap.read()[0]
+    finally:
+        cap.release()
+        server.stop()
+        grabber.stop()
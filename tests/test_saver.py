@@ -0,0 +1,117 @@
+import os
+import threading
+
+import cv2
+import pytest
+
+import saver
+from saver import SaveQueue
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Holds every encode until set, so jobs pile up in the queue"""
+    gate = threading.Event()
+    encode_and_write = saver.encode_and_write
+
+    def held(frame, path, options):
+        gate.wait(5.0)
+        return encode_and_write(frame, path, options)
+
+    monkeypatch.setattr(saver, 'encode_and_write', held)
+    yield gate
+    gate.set()
+
+
+def test_saves_and_reports(tmp_path, frames):
+    queue = SaveQueue()
+    done = []
+    job = queue.submit(frames[0], str(tmp_path / "a.png"), on_done=done.append)
+    assert queue.wait(5.0)
+    queue.shutdown()
+    assert done == [job] and job.error is None and job.done
+    assert job.frame is None  # pixels released once written
+    saved = cv2.imread(job.path)
+    assert (saved == frames[0]).all()
+    stats = queue.stats()
+    assert stats['completed'] == 1 and stats['pending'] == 0 and stats['bytes_written'] == job.written
+
+
+def test_unsupported_format_fails_at_submit(tmp_path, frames):
+    queue = SaveQueue()
+    with pytest.raises(ValueError):
+        queue.submit(frames[0], str(tmp_path / "a.bmp"))
+    assert queue.stats()['pending'] == 0
+    queue.shutdown()
+
+
+def test_full_queue_rejects_without_blocking(tmp_path, frames, gate):
+    # Room for two frames' pixels
+    queue = SaveQueue(max_workers=1, max_pending_bytes=2 * frames[0].nbytes)
+    assert queue.submit(frames[0], str(tmp_path / "a.jpg"), block=False) is not None
+    assert queue.submit(frames[1], str(tmp_path / "b.jpg"), block=False) is not None
+    assert queue.submit(frames[2], str(tmp_path / "c.jpg"), block=False) is None
+    assert queue.submit(frames[2], str(tmp_path / "c.jpg"), timeout=0.1) is None
+    assert queue.stats()['pending_bytes'] == 2 * frames[0].nbytes
+    gate.set()
+    assert queue.wait(5.0)
+    assert queue.submit(frames[2], str(tmp_path / "c.jpg"), block=False) is not None
+    assert queue.wait(5.0)
+    queue.shutdown()
+    assert sorted(os.listdir(tmp_path)) == ["a.jpg", "b.jpg", "c.jpg"]
+
+
+def test_blocking_submit_waits_for_room(tmp_path, frames, gate):
+    queue = SaveQueue(max_workers=1, max_pending_bytes=frames[0].nbytes)
+    queue.submit(frames[0], str(tmp_path / "a.jpg"))
+    submitted = []
+    thread = threading.Thread(target=lambda: submitted.append(queue.submit(frames[1], str(tmp_path / "b.jpg"))))
+    thread.start()
+    thread.join(0.2)
+    assert thread.is_alive() and not submitted
+    gate.set()
+    thread.join(5.0)
+    assert submitted and submitted[0] is not None
+    assert queue.wait(5.0)
+    queue.shutdown()
+
+
+def test_oversized_frame_is_admitted_when_idle(tmp_path, frames):
+    queue = SaveQueue(max_pending_bytes=1)
+    assert queue.submit(frames[0], str(tmp_path / "a.jpg"), block=False) is not None
+    assert queue.wait(5.0)
+    queue.shutdown()
+
+
+def test_queued_paths_get_a_suffix(tmp_path, frames, gate):
+    queue = SaveQueue()
+    path = str(tmp_path / "shot.jpg")
+    jobs = [queue.submit(frame, path) for frame in frames[:3]]
+    assert [os.path.basename(job.path) for job in jobs] == ["shot.jpg", "shot_1.jpg", "shot_2.jpg"]
+    gate.set()
+    assert queue.wait(5.0)
+    queue.shutdown()
+    assert sorted(os.listdir(tmp_path)) == ["shot.jpg", "shot_1.jpg", "shot_2.jpg"]
+
+
+def test_existing_file_is_not_overwritten(tmp_path, frames):
+    path = tmp_path / "shot.jpg"
+    path.write_bytes(b"keep")
+    queue = SaveQueue()
+    job = queue.submit(frames[0], str(path))
+    assert queue.wait(5.0)
+    queue.shutdown()
+    assert os.path.basename(job.path) == "shot_1.jpg"
+    assert path.read_bytes() == b"keep"
+
+
+def test_written_path_can_be_claimed_again_once_free(tmp_path, frames):
+    queue = SaveQueue()
+    job = queue.submit_encoded(b"jpeg bytes", str(tmp_path / "raw.jpg"))
+    assert queue.wait(5.0)
+    os.remove(job.path)
+    again = queue.submit_encoded(b"jpeg bytes", str(tmp_path / "raw.jpg"))
+    assert queue.wait(5.0)
+    queue.shutdown()
+    assert again.path == job.path
+    assert (tmp_path / "raw.jpg").read_bytes() == b"jpeg bytes"
@@ -0,0 +1,158 @@
+import threading
+
+import numpy as np
+import pytest
+
+import screen_grab
+from benchmark import SyntheticScreenBackend
+from engine import CaptureEngine
+from screen_grab import FULL_SCREEN, ScreenCapture, XShmBackend, create_backend, window_region
+
+from .helpers import wait_until
+
+
+@pytest.fixture
+def xshm(x_display):
+    try:
+        backend = XShmBackend()
+    except OSError as e:
+        pytest.skip(f"XShm unavailable: {e}")
+    yield backend
+    backend.close()
+
+
+def test_window_region():
+    assert window_region(FULL_SCREEN) is None
+    assert window_region(None) is None
+    assert window_region({'id': 1, 'bbox': (1.0, 2.0, 30.0, 40.0)}) == (1, 2, 30, 40)
+    assert window_region({'id': 1, 'bbox': {'X': 5, 'Y': 6, 'Width': 7, 'Height': 8}}) == (5, 6, 7, 8)
+
+
+def test_create_backend_takes_a_factory(frames):
+    backend = create_backend(lambda: SyntheticScreenBackend(frames[0]))
+    assert backend.name == "synthetic"
+
+
+def test_screen_capture_reads_into_the_callers_buffer(frames):
+    cap = ScreenCapture(FULL_SCREEN, fps=200, backend=lambda: SyntheticScreenBackend(frames[0]))
+    try:
+        ok, first = cap.read()
+        assert ok and first.shape == frames[0].shape
+        ok, second = cap.read(first)
+        assert ok and second is first
+        assert len(cap.changes) == 2
+    finally:
+        cap.release()
+    assert not cap.isOpened()
+    assert cap.read() == (False, None)
+
+
+def static_backend(frame):
+    """A synthetic desktop that never changes"""
+    backend = SyntheticScreenBackend(frame)
+    backend.grab_raw = lambda region=None: backend.raw
+    return backend
+
+
+def test_unchanged_grabs_repeat_the_previous_frame(frames):
+    cap = ScreenCapture(FULL_SCREEN, fps=200, backend=lambda: static_backend(frames[0]))
+    try:
+        ok, first = cap.read()
+        assert ok and not cap.unchanged
+        out = np.zeros_like(first)
+        # Nothing changed: no conversion, but the frame still comes back
+        ok, second = cap.read(out)
+        assert ok and second is out and cap.unchanged
+        assert np.array_equal(second, first)
+        assert cap.skipped == 1
+        assert not cap.changed_since(cap.last_change)
+    finally:
+        cap.release()
+
+
+def test_unchanged_grabs_are_converted_when_not_skipping(frames):
+    backend = static_backend(frames[0])
+    converted = []
+    convert = backend.convert
+    backend.convert = lambda raw, out=None: converted.append(1) or convert(raw, out)
+    cap = ScreenCapture(FULL_SCREEN, fps=200, backend=lambda: backend, skip_unchanged=False)
+    try:
+        for _ in range(3):
+            assert cap.read()[0]
+        assert cap.unchanged and cap.skipped == 0
+        assert len(converted) == 3
+    finally:
+        cap.release()
+
+
+def test_interrupt_ends_reads(frames):
+    cap = ScreenCapture(FULL_SCREEN, fps=200, backend=lambda: static_backend(frames[0]))
+    assert cap.read()[0]
+    threading.Timer(0.05, cap.interrupt).start()
+    assert wait_until(lambda: cap.read() == (False, None), timeout=2.0)
+    cap.release()
+
+
+@pytest.fixture
+def static_screen(monkeypatch, frames, tmp_path):
+    """A CaptureEngine grabbing a static synthetic full screen"""
+    backend = static_backend(frames[0])
+    monkeypatch.setattr(screen_grab, 'create_backend', lambda preferred=None: backend)
+    engine = CaptureEngine(output_dir=str(tmp_path), screen_fps=100)
+    engine.open(FULL_SCREEN)
+    yield engine, backend
+    engine.shutdown()
+
+
+def test_burst_of_a_static_screen_finishes(static_screen):
+    engine, _ = static_screen
+    assert engine.cap.skip_unchanged
+    run = engine.capture_series(5)
+    # Frames keep coming although nothing changes, and the burst converts every one
+    assert not engine.cap.skip_unchanged
+    assert wait_until(lambda: not run.is_running, timeout=3.0)
+    assert engine.save_queue.wait(5.0)
+    assert run.stats()['written'] == 5
+
+
+def test_timelapse_skips_unchanged_screens(static_screen, frames):
+    engine, backend = static_screen
+    run = engine.capture_series(count=3, rate=20, skip_unchanged=True)
+    assert wait_until(lambda: run.stats()['unchanged'] >= 3, timeout=3.0)
+    assert run.captured == 1
+    # Change the screen: the next interval is saved
+    backend.raw[:40, :40] = (0, 0, 255, 255)
+    assert wait_until(lambda: run.captured == 2, timeout=3.0)
+    run.stop()
+
+
+def test_xshm_grabs_full_screen_and_regions(xshm):
+    width, height = xshm.screen_size
+    raw = xshm.grab_raw()
+    assert raw.shape == (height, width, 4)
+    assert xshm.grab().shape == (height, width, 3)
+
+    frame = xshm.grab((10, 20, 64, 48))
+    assert frame.shape == (48, 64, 3)
+    out = np.empty((48, 64, 3), np.uint8)
+    assert xshm.grab((0, 0, 64, 48), out) is out
+
+
+def test_xshm_clamps_regions_to_the_screen(xshm):
+    width, height = xshm.screen_size
+    assert xshm.grab((-10, -10, 100000, 100000)).shape == (height, width, 3)
+    assert xshm.grab((width - 10, height - 10, 50, 50)).shape == (10, 10, 3)
+
+
+def test_xshm_reuses_the_segment_until_the_size_changes(xshm):
+    first = xshm.grab_raw((0, 0, 32, 32))
+    assert xshm.grab_raw((5, 5, 32, 32)) is first
+    assert xshm.grab_raw((0, 0, 16, 16)).shape == (16, 16, 4)
+
+
+def test_xshm_sees_a_window(xshm, tk_window):
+    # Inside the red window, away from any border
+    left = tk_window.winfo_rootx()
+    top = tk_window.winfo_rooty()
+    frame = xshm.grab((left + 20, top + 20, 40, 30))
+    assert (np.abs(frame.astype(int) - (0, 0, 255)) <= 8).all()
@@ -0,0 +1,140 @@
+import csv
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from spool import SpoolReader, SpoolRecorder, SpoolWriter, export
+
+from .helpers import wait_until
+
+
+def write_spool(path, frames, capacity=None):
+    writer = SpoolWriter(str(path), frames[0].shape, frames[0].dtype, capacity=capacity or len(frames))
+    for i, frame in enumerate(frames):
+        assert writer.write(frame, 100.0 + i * 0.1, seq=i + 1)
+    return writer
+
+
+def test_round_trip_keeps_shape_dtype_and_timestamps(frames, tmp_path):
+    path = tmp_path / "a.spool"
+    write_spool(path, frames).close()
+
+    reader = SpoolReader(str(path))
+    try:
+        assert len(reader) == len(frames)
+        for i, frame in enumerate(frames):
+            timestamp, read = reader[i]
+            read = read.copy()
+            assert timestamp == 100.0 + i * 0.1
+            assert read.shape == frame.shape and read.dtype == frame.dtype
+            assert np.array_equal(read, frame)
+        assert reader.fps() == pytest.approx(10.0)
+        assert list(reader.index['seq']) == [1, 2, 3, 4]
+    finally:
+        reader.close()
+
+
+def test_smaller_frames_and_other_dtypes_fit_the_slots(tmp_path):
+    path = tmp_path / "a.spool"
+    writer = SpoolWriter(str(path), (120, 160, 3), np.uint8, capacity=3)
+    depth = np.arange(60 * 80, dtype=np.uint16).reshape(60, 80)
+    assert writer.write(depth, 1.0)
+    assert not writer.write(np.zeros((240, 320, 3), np.uint8), 2.0)
+    writer.close()
+
+    reader = SpoolReader(str(path))
+    try:
+        assert len(reader) == 1
+        read = reader[0][1].copy()
+        assert read.dtype == np.uint16 and np.array_equal(read, depth)
+    finally:
+        reader.close()
+
+
+def test_partially_filled_spool_reads_committed_frames(frames, tmp_path):
+    path = tmp_path / "a.spool"
+    writer = write_spool(path, frames[:2], capacity=10)
+    try:
+        # Still open and mostly empty: only the committed frames are visible
+        reader = SpoolReader(str(path))
+        assert len(reader) == 2 and reader.capacity == 10
+        assert np.array_equal(reader[1][1], frames[1])
+        reader.close()
+    finally:
+        writer.close()
+    # Closing gives back the unused slots
+    assert os.path.getsize(path) == writer.bytes_used
+    reader = SpoolReader(str(path))
+    assert len(reader) == 2
+    reader.close()
+
+
+def test_export_writes_images_and_timestamps(frames, tmp_path):
+    path = tmp_path / "a.spool"
+    write_spool(path, frames).close()
+
+    output = export(str(path), str(tmp_path / "out"), fmt='png', workers=2, chunk=3)
+    names = sorted(n for n in os.listdir(output) if n.endswith('.png'))
+    assert names == [f"frame_{i:06d}.png" for i in range(len(frames))]
+    assert np.array_equal(cv2.imread(os.path.join(output, names[2])), frames[2])
+    with open(os.path.join(output, "timestamps.csv")) as f:
+        rows = list(csv.DictReader(f))
+    assert [r['file'] for r in rows] == names
+    assert float(rows[1]['timestamp']) == 100.1
+
+
+def test_export_video(frames, tmp_path):
+    path = tmp_path / "a.spool"
+    write_spool(path, frames).close()
+
+    output = export(str(path), fmt='avi')
+    assert output == str(tmp_path / "a.avi")
+    cap = cv2.VideoCapture(output)
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    cap.release()
+    assert count == len(frames)
+
+
+def test_recorder_spools_grabbed_frames(grabber, tmp_path):
+    assert wait_until(lambda: grabber.seq > 0)
+    recorder = SpoolRecorder(grabber, str(tmp_path), max_frames=10)
+    recorder.start()
+    assert wait_until(lambda: not recorder.is_running)
+    assert recorder.error is None and recorder.recorded == 10
+
+    reader = SpoolReader(recorder.path)
+    try:
+        assert len(reader) == 10
+        timestamps = reader.timestamps()
+        assert (np.diff(timestamps) > 0).all()
+    finally:
+        reader.close()
+
+
+def test_recorder_failure_stops_and_closes_the_spool(grabber, tmp_path, monkeypatch):
+    assert wait_until(lambda: grabber.seq > 0)
+    recorder = SpoolRecorder(grabber, str(tmp_path), max_frames=50)
+    copy_frame = grabber.copy_frame
+    copied = []
+
+    def failing_copy(seq, out):
+        if copied:
+            raise OSError("disk gone")
+        copied.append(seq)
+        return copy_frame(seq, out)
+
+    monkeypatch.setattr(grabber, 'copy_frame', failing_copy)
+    recorder.start()
+    assert wait_until(lambda: not recorder.is_running)
+    assert isinstance(recorder.error, OSError)
+    assert recorder.spool._map is None and recorder.spool._file.closed
+    # Truncated to the one frame that made it
+    assert os.path.getsize(recorder.path) == recorder.spool.bytes_used
+    fps = recorder.stats()['fps']
+    time.sleep(0.2)
+    assert recorder.stats()['fps'] == fps
@@ -0,0 +1,188 @@
+import pytest
+
+import screen_grab
+from screen_grab import FULL_SCREEN, WindowRegistry, X11Windows
+
+from .helpers import wait_until
+
+
+class FakeWindows:
+    """Window source whose windows the test moves around"""
+
+    def __init__(self, windows):
+        self.windows = dict(windows)  # id -> [title, bbox]
+        self.listed_known = []
+        self.geometry_calls = 0
+        self.closed = False
+        self.error = None
+
+    def list(self, known=()):
+        if self.error:
+            raise self.error
+        self.listed_known.append(set(known))
+        return [(window_id, title, None if window_id in known else bbox)
+                for window_id, (title, bbox) in self.windows.items()]
+
+    def geometry(self, window_id):
+        self.geometry_calls += 1
+        window = self.windows.get(window_id)
+        return window[1] if window else None
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def source():
+    return FakeWindows({1: ["Editor", (0, 0, 800, 600)], 2: ["Terminal", (100, 100, 640, 480)]})
+
+
+@pytest.fixture
+def registry(source):
+    registry = WindowRegistry(source, max_age=60.0)
+    registry.refresh()
+    yield registry
+    registry.close()
+
+
+def test_lists_windows_then_full_screen(registry):
+    windows = registry.windows()
+    assert [w['title'] for w in windows] == ["Editor", "Terminal", FULL_SCREEN['title']]
+    assert windows[0] == {'title': "Editor", 'id': 1, 'bbox': (0, 0, 800, 600)}
+
+
+def test_refresh_only_queries_new_windows(registry, source):
+    assert not registry.refresh()
+    # Known ids are passed back, so the source can skip their geometry
+    assert source.listed_known[-1] == {1, 2}
+    assert registry.get(1)['bbox'] == (0, 0, 800, 600)
+
+
+def test_version_moves_on_changes_only(registry, source):
+    version = registry.version
+    registry.refresh()
+    assert registry.version == version
+
+    source.windows[3] = ["Browser", (5, 5, 300, 200)]
+    assert registry.refresh()
+    assert registry.get(3)['title'] == "Browser"
+
+    source.windows[1][0] = "Editor - file.py"
+    assert registry.refresh()
+    assert registry.get(1)['title'] == "Editor - file.py"
+
+    del source.windows[2]
+    assert registry.refresh()
+    assert registry.get(2) is None
+    assert registry.version == version + 3
+
+
+def test_get_and_find(registry):
+    assert registry.get(FULL_SCREEN['id']) == FULL_SCREEN
+    assert registry.get(99) is None
+    assert registry.find()['id'] == FULL_SCREEN['id']
+    assert registry.find("Terminal")['id'] == 2
+    assert registry.find("edit")['id'] == 1
+    assert registry.find("nothing") is None
+
+
+def test_returned_entries_are_copies(registry):
+    registry.get(1)['title'] = "changed"
+    registry.windows()[0]['title'] = "changed"
+    assert registry.get(1)['title'] == "Editor"
+
+
+def test_region_follows_a_moved_window(registry, source):
+    entry = registry.get(1)
+    assert registry.region(entry) == (0, 0, 800, 600)
+    assert source.geometry_calls == 0  # fresh from the listing
+
+    source.windows[1][1] = (50, 60, 800, 600)
+    assert registry.region(entry) == (0, 0, 800, 600)
+    assert registry.region(entry, max_age=0) == (50, 60, 800, 600)
+    assert registry.get(1)['bbox'] == (50, 60, 800, 600)
+    assert registry.stats()['geometry_queries'] == 1
+
+
+def test_region_of_full_screen_and_vanished_windows(registry, source):
+    assert registry.region(registry.get(FULL_SCREEN['id'])) is None
+    entry = registry.get(2)
+    del source.windows[2]
+    registry.refresh()
+    # Gone from the listing: keep grabbing where it was last seen
+    assert registry.region(entry, max_age=0) == (100, 100, 640, 480)
+
+
+def test_source_errors_leave_full_screen(source):
+    source.error = OSError("no window system")
+    registry = WindowRegistry(source)
+    registry.refresh()
+    assert registry.error is source.error
+    assert registry.windows() == [FULL_SCREEN]
+
+
+def test_background_refresh(source):
+    registry = WindowRegistry(source, interval=0.05)
+    registry.start()
+    try:
+        source.windows[3] = ["Browser", (5, 5, 300, 200)]
+        assert wait_until(lambda: registry.get(3) is not None)
+        assert registry.stats()['refreshes'] >= 2
+    finally:
+        registry.close()
+    assert source.closed
+
+
+def test_list_windows_uses_the_shared_registry(monkeypatch, source):
+    monkeypatch.setattr(screen_grab, '_registry', WindowRegistry(source))
+    assert [w['title'] for w in screen_grab.list_windows()][:2] == ["Editor", "Terminal"]
+    assert screen_grab.find_window("Term")['id'] == 2
+    assert screen_grab.window_registry() is screen_grab._registry
+
+
+# --- A real X server ---------------------------------------------------------
+
+
+@pytest.fixture
+def x11(x_display):
+    windows = X11Windows()
+    yield windows
+    windows.close()
+
+
+def test_x11_lists_a_window(x11, tk_window):
+    title = tk_window.title()
+    assert wait_until(lambda: any(t == title for _, t, _ in x11.list()), timeout=2.0)
+    window_id, _, bbox = next(w for w in x11.list() if w[1] == title)
+    assert x11.title(window_id) == title
+    assert bbox[2:] == (120, 80)
+    assert x11.geometry(window_id) == bbox
+    # Known ids come back without geometry
+    assert next(w for w in x11.list(known={window_id}) if w[1] == title)[2] is None
+
+
+def test_x11_registry_tracks_a_moved_window(x11, tk_window):
+    registry = WindowRegistry(x11)
+    registry.refresh()
+    entry = registry.find(tk_window.title())
+    assert entry is not None
+    tk_window.geometry("+200+150")
+    tk_window.update()
+    assert wait_until(lambda: registry.region(entry, max_age=0)[:2] != entry['bbox'][:2], timeout=2.0)
+    assert registry.region(entry, max_age=0)[2:] == (120, 80)
+
+
+def test_x11_errors_for_missing_windows_are_trapped(x11):
+    # An id nothing owns: Xlib reports BadWindow, which must not end the process
+    missing = 0x7ffffff0
+    assert x11.geometry(missing) is None
+    assert x11.title(missing) is None
+
+
+def test_x11_error_handler_is_restored(x11):
+    x11_lib = x11.x11
+    previous = x11_lib.XSetErrorHandler(None)
+    x11_lib.XSetErrorHandler(previous)
+    x11.geometry(0x7ffffff0)
+    x11.ids()
+    assert x11_lib.XSetErrorHandler(previous) == previous